@@ -0,0 +1,690 @@
+#!/usr/bin/env python3
+from pylisp import *
+import pylisp.insts as insts
+import pylisp.tiering as tiering
+from pylisp.builtins import cdr, build
+from time import perf_counter
+from tempfile import TemporaryDirectory
+from tracemalloc import start, stop, take_snapshot, get_traced_memory
+from io import StringIO
+from copy import deepcopy
+from random import Random
+from argparse import ArgumentParser
+from logging import getLogger, basicConfig, DEBUG, INFO, ERROR
+logger = getLogger(__name__)
+
+FIB = r'''
+    (set fib (lambda (n) (
+        (if (< n 2)
+            (ret n)
+            (ret (+ (fib (- n 1)) (fib (- n 2))))
+        )
+    )))
+    (set rv (fib {n}))
+'''
+
+LOOP = r'''
+    (set x 0)
+    (set acc 0)
+    (while (< x {n}) (
+        (set acc (+ acc (* x 2)))
+        (set x (+ x 1))
+    ))
+'''
+
+COUNT = r'''
+    (set count (lambda (n) (
+        (set x 0)
+        (set acc 0)
+        (while (< x n) (
+            (set acc (+ acc (* x 2)))
+            (set x (+ x 1))
+        ))
+        (ret acc)
+    )))
+    (set rv (count {n}))
+'''
+
+CLOSURES = r'''
+    (set make (lambda (a) (
+        (set b (* a 2))
+        (set c (list a b))
+        (lambda (x) (
+            (set d (+ x 1))
+            (lambda (y) (+ y a))
+        ))
+    )))
+    (set fs nil)
+    (set i 0)
+    (while (< i {n}) (
+        (set g (make i))
+        (set h (g i))
+        (set fs (cons h fs))
+        (set i (+ i 1))
+    ))
+'''
+
+CALL_CLOSURES = r'''
+    (set acc 0)
+    (while (<> fs nil) (
+        (set h (car fs))
+        (set acc (+ acc (h 1)))
+        (set fs (cdr fs))
+    ))
+'''
+
+HELPERS = r'''
+    (set square (lambda (x) (* x x)))
+    (set norm (lambda (x y) (+ (square x) (square y))))
+    (set run (lambda (n) (
+        (set i 0)
+        (set acc 0)
+        (while (< i n) (
+            (set acc (+ acc (norm i 2)))
+            (set i (+ i 1))
+        ))
+        (ret acc)
+    )))
+    (set rv (run {n}))
+'''
+
+WALK = r'''
+    (set n 0)
+    (while (<> xs nil) (
+        (set n (+ n 1))
+        (set xs (cdr xs))
+    ))
+'''
+
+# NOTE: a list-processing script with map, filter and fold written as
+#       recursive lambdas, and the same script with the builtin forms
+RECURSIVE_SEQUENCES = r'''
+    (set my-range (lambda (i n acc) (if (< n i) acc (my-range i (- n 1) (cons n acc)))))
+    (set my-map (lambda (f xs) (if (== xs nil) nil (cons (f (car xs)) (my-map f (cdr xs))))))
+    (set my-filter (lambda (f xs) (
+        (if (== xs nil)
+            (ret nil))
+        (if (f (car xs))
+            (ret (cons (car xs) (my-filter f (cdr xs)))))
+        (my-filter f (cdr xs))
+    )))
+    (set my-fold (lambda (f acc xs) (if (== xs nil) acc (my-fold f (f acc (car xs)) (cdr xs)))))
+    (set square (lambda (x) (* x x)))
+    (set odd (lambda (x) (== (% x 2) 1)))
+    (set add (lambda (acc x) (+ acc x)))
+    (set rv (my-fold add 0 (my-filter odd (my-map square (my-range 0 {n} nil)))))
+'''
+
+SEQUENCES = r'''
+    (set square (lambda (x) (* x x)))
+    (set odd (lambda (x) (== (% x 2) 1)))
+    (set add (lambda (acc x) (+ acc x)))
+    (set rv (fold add 0 (filter odd (map square (range {n})))))
+'''
+
+# NOTE: the same batch computation on a list and on a vector
+LIST_BATCH = r'''
+    (set xs (range {n}))
+    (set ys (map (lambda (x) (+ (* x 2) 1)) xs))
+    (set rv (fold (lambda (acc y) (+ acc y)) 0 ys))
+'''
+
+VECTOR_BATCH = r'''
+    (set xs (list->vector (range {n})))
+    (set ys (+ (* xs 2) 1))
+    (set rv (vector-sum ys))
+'''
+
+# NOTE: lookups in a table of n keys, as an association list scanned by a
+#       recursive function and as a hash map
+ALIST_LOOKUPS = r'''
+    (set table (map (lambda (k) (cons k (* k k))) (range {n})))
+    (set assoc (lambda (key alist) (
+        (if (== (car (car alist)) key)
+            (ret (cdr (car alist))))
+        (assoc key (cdr alist))
+    )))
+    (set rv (fold (lambda (acc k) (+ acc (assoc (% k {n}) table))) 0 (range {lookups})))
+'''
+
+DICT_LOOKUPS = r'''
+    (set table (dict-new))
+    (map (lambda (k) (dict-set table k (* k k))) (range {n}))
+    (set rv (fold (lambda (acc k) (+ acc (dict-get table (% k {n})))) 0 (range {lookups})))
+'''
+
+PROGRAMS = {
+    'fib':  (FIB,  18),
+    'loop': (LOOP, 20_000),
+}
+
+def timed(func, *args, repeat=3, **kwargs):
+    best = float('inf')
+    for _ in range(repeat):
+        before = perf_counter()
+        func(*args, **kwargs)
+        best = min(best, perf_counter() - before)
+    return best
+
+def allocated(func, *args, **kwargs):
+    start()
+    rv = func(*args, **kwargs)
+    size = sum(stat.size for stat in take_snapshot().statistics('filename'))
+    stop()
+    return rv, size
+
+def report(title, rows, unit, fmt='.4f'):
+    print(title)
+    print('-' * len(title))
+    width = max(len(name) for name, _ in rows)
+    baseline = rows[0][1]
+    for name, value in rows:
+        print(f'\t{name:<{width}} = {value:>12{fmt}}{unit}  ({baseline / value:5.2f}x)')
+
+def bench_engines():
+    for name, (code, n) in PROGRAMS.items():
+        bytecode = list(parse(code.format(n=n)))
+        rows = [(mode, timed(evaluate, bytecode, mode=mode)) for mode in ENGINES
+                if mode != 'debug']
+        report(f'{name} ({n}): wall time', rows, 's')
+
+def bench_compact():
+    # NOTE: both formats share the Profiles of the functions, so tiering
+    #       is disabled to time each engine on its own baseline code
+    saved, tiering.THRESHOLD = tiering.THRESHOLD, None
+    try:
+        for name, (code, n) in PROGRAMS.items():
+            suite = parse(code.format(n=n))
+            bytecode, insts_size = allocated(list, suite)
+            code, code_size = allocated(assemble, bytecode)
+            report(f'{name}: bytecode size', [('insts', insts_size), ('compact', code_size)], 'B', ',.0f')
+            rows = [('insts', timed(evaluate, bytecode, mode='fast')),
+                    ('compact', timed(evaluate, code, mode='compact'))]
+            report(f'{name} ({n}): wall time', rows, 's')
+    finally:
+        tiering.THRESHOLD = saved
+
+def bench_locals():
+    for name, n in [('fib', 18), ('count', 20_000)]:
+        code = {'fib': FIB, 'count': COUNT}[name]
+        suite = parse(code.format(n=n))
+        for mode in 'fast', 'compact':
+            rows = [('dict', timed(evaluate, list(suite), mode=mode)),
+                    ('slots', timed(evaluate, list(resolve_scopes(suite)), mode=mode))]
+            report(f'{name} ({n}, {mode}): wall time', rows, 's')
+
+def bench_closures():
+    n = 5_000
+    build = parse(CLOSURES.format(n=n))
+    suite = parse(CLOSURES.format(n=n) + CALL_CLOSURES)
+    rows, times = [], []
+    for name, resolve in [('chainmap', False), ('cells', True)]:
+        tree = resolve_scopes(build) if resolve else build
+        # NOTE: the env keeps the closures alive
+        _, size = allocated(evaluate, list(tree), {}, mode='fast')
+        rows.append((name, size))
+        tree = resolve_scopes(suite) if resolve else suite
+        times.append((name, timed(evaluate, list(tree), mode='fast')))
+    report(f'closures ({n}): retained memory', rows, 'B', ',.0f')
+    report(f'closures ({n}): wall time', times, 's')
+
+def uncached_lookup(self, frame):
+    env = frame.globals if isinstance(self, PushGlobalVar) else frame.env
+    return env[self.name]
+
+def bench_globals():
+    n = 5_000
+    bytecode = list(resolve_scopes(parse(HELPERS.format(n=n))))
+    rows = []
+    for name in 'uncached', 'cached':
+        saved = PushVar.lookup, PushGlobalVar.lookup, PushFunc.lookup
+        if name == 'uncached':
+            PushVar.lookup = PushGlobalVar.lookup = PushFunc.lookup = uncached_lookup
+        try:
+            rows.append((name, timed(evaluate, bytecode, mode='fast')))
+        finally:
+            PushVar.lookup, PushGlobalVar.lookup, PushFunc.lookup = saved
+    report(f'helpers ({n}): wall time', rows, 's')
+
+def bench_quickening():
+    for name, n in [('fib', 18), ('count', 20_000)]:
+        code = {'fib': FIB, 'count': COUNT}[name]
+        suite = resolve_scopes(parse(code.format(n=n)))
+        rows = []
+        for label, warmup in [('generic', 0), ('quickened', insts.WARMUP)]:
+            # NOTE: with a warmup of 0, the countdown never reaches 0 again
+            saved, insts.WARMUP = insts.WARMUP, warmup
+            try:
+                rows.append((label, timed(lambda: evaluate(list(suite), mode='fast'))))
+            finally:
+                insts.WARMUP = saved
+        report(f'{name} ({n}): wall time', rows, 's')
+        stats = evaluate(list(suite), mode='fast')
+        print(f'\tquickened = {stats.quickened}, hit rate = {stats.quicken_hit_rate():.2%}')
+
+def bench_superinstructions():
+    for name, n in [('loop', 20_000), ('count', 20_000), ('helpers', 5_000)]:
+        code = {'loop': LOOP, 'count': COUNT, 'helpers': HELPERS}[name]
+        bytecode = list(resolve_scopes(parse(code.format(n=n))))
+        fusions = choose_fusions(evaluate(bytecode).pairs)
+        fused = fuse_superinstructions(bytecode, fusions)
+        rows = [('plain', timed(evaluate, bytecode, mode='fast')),
+                ('fused', timed(evaluate, fused, mode='fast'))]
+        report(f'{name} ({n}): wall time', rows, 's')
+        rows = [('plain', evaluate(bytecode, mode='fast').num_insts),
+                ('fused', evaluate(fused, mode='fast').num_insts)]
+        report(f'{name} ({n}): dispatches', rows, '', ',.0f')
+
+def bench_numeric():
+    for name, (code, n) in PROGRAMS.items():
+        rows = []
+        for numeric in NUMERIC:
+            suite = resolve_scopes(parse(code.format(n=n), numeric=numeric))
+            rows.append((numeric, timed(evaluate, list(suite), mode='fast', numeric=numeric)))
+        report(f'{name} ({n}): wall time', rows, 's')
+
+def count_python(n):
+    x, acc = 0, 0
+    while x < n:
+        acc = acc + x * 2
+        x = x + 1
+    return acc
+
+def bench_codegen():
+    for name, n in [('count', 200_000), ('loop', 200_000), ('fib', 18)]:
+        code = {'count': COUNT, 'loop': LOOP, 'fib': FIB}[name]
+        suite = resolve_scopes(identify_tail_calls(parse(code.format(n=n), numeric='fast')))
+        bytecode, native = list(suite), list(compile_native(suite))
+        rows = [('vm', timed(evaluate, bytecode, mode='fast')),
+                ('native', timed(evaluate, native, mode='fast'))]
+        if name == 'count':
+            rows.append(('python', timed(count_python, n)))
+        report(f'{name} ({n}, fast numbers): wall time', rows, 's')
+
+def bench_tiering():
+    for name, n in [('fib', 20), ('helpers', 20_000)]:
+        code = {'fib': FIB, 'helpers': HELPERS}[name].format(n=n)
+        rows = []
+        for label, threshold in [('baseline', None), ('tiered', tiering.THRESHOLD)]:
+            saved, tiering.THRESHOLD = tiering.THRESHOLD, threshold
+            try:
+                # NOTE: parse every time, the profiles live in the bytecode
+                rows.append((label, timed(lambda: evaluate(list(parse(code)), mode='fast'))))
+                stats = evaluate(list(parse(code)), mode='fast')
+            finally:
+                tiering.THRESHOLD = saved
+        report(f'{name} ({n}): wall time', rows, 's')
+        for func, before, after, seconds in stats.transitions:
+            print(f'\t{func}: {before} -> {after} in {seconds * 1e3:.3f}ms')
+
+def bench_cache():
+    # NOTE: a large script, the startup of which is dominated by the front end
+    code = ''.join(src.format(n=10) for src in (FIB, HELPERS, CLOSURES + CALL_CLOSURES, COUNT)) * 50
+    with TemporaryDirectory() as cache_dir:
+        cached_compile(code, cache_dir)
+        rows = [('compile', timed(compile_source, code)),
+                ('cached', timed(cached_compile, code, cache_dir))]
+    report(f'startup ({len(code):,} chars): compile time', rows, 's')
+
+def peak(func, *args, **kwargs):
+    start()
+    func(*args, **kwargs)
+    _, size = get_traced_memory()
+    stop()
+    return size
+
+def first_form(code):
+    return next(iter(parse_forms(StringIO(code))))
+
+def drain_forms(code):
+    for _ in parse_forms(StringIO(code)):
+        pass
+
+def bench_streaming():
+    code = LOOP.format(n=10) * 5_000
+    rows = [('parse', timed(parse, code, repeat=1)),
+            ('forms', timed(first_form, code, repeat=1))]
+    report(f'source ({len(code):,} chars): time to the first form', rows, 's')
+    # NOTE: forms includes the copy of the text in its StringIO
+    rows = [('parse', peak(parse, code)),
+            ('forms', peak(drain_forms, code))]
+    report(f'source ({len(code):,} chars): peak memory', rows, 'B', ',.0f')
+
+def synthetic(forms, depth=5, seed=0):
+    '''
+    a large generated program of nested special forms, calls and atoms
+    '''
+    rng = Random(seed)
+    heads = ['+', '-', '*', '<', '==', 'and', 'cons', 'format', 'f', 'g']
+    def expr(depth):
+        if not depth or rng.random() < .3:
+            return rng.choice(['x', 'y', '1', '2.5', '"s"', 'nil', 'true'])
+        if rng.random() < .1:
+            return f'(if {expr(depth - 1)} {expr(depth - 1)} {expr(depth - 1)})'
+        return f'({rng.choice(heads)} {expr(depth - 1)} {expr(depth - 1)})'
+    return '\n'.join(f'(set v{i} {expr(depth)})' for i in range(forms))
+
+def bench_parse():
+    from pylisp.parser import tokenize, build_tree, build_nodes
+    for forms in 1_000, 10_000:
+        code = synthetic(forms)
+        tokens = list(tokenize(code))
+        tree = build_tree(tokens)
+        rows = [('tokenize', timed(lambda: list(tokenize(code)))),
+                ('tree', timed(build_tree, tokens)),
+                ('nodes', timed(build_nodes, tree))]
+        report(f'synthetic ({len(code):,} chars, {len(tokens):,} tokens): parse time by stage', rows, 's')
+        seconds = timed(parse, code)
+        print(f'\tthroughput = {len(code) / seconds / 1e6:.2f}M chars/s, {len(tokens) / seconds / 1e6:.2f}M tokens/s')
+
+RULES = r'''
+    (set rules (list {rules}))
+    (set i 0)
+    (while (< i {n}) (
+        (set x i)
+        (set rs rules)
+        (while (<> rs nil) (
+            (set x (eval (parse (car rs))))
+            (set rs (cdr rs))
+        ))
+        (set i (+ i 1))
+    ))
+'''
+
+def bench_memo():
+    n = 500
+    rules = ' '.join(f'"(+ (* x {k}) (- {k} (% x 7)))"' for k in range(20))
+    bytecode = list(parse(RULES.format(rules=rules, n=n)))
+    rows = []
+    for name, maxsize in [('uncached', 0), ('cached', 512)]:
+        saved = PARSE_CACHE.maxsize, COMPILE_CACHE.maxsize
+        PARSE_CACHE.clear()
+        COMPILE_CACHE.clear()
+        PARSE_CACHE.resize(maxsize)
+        COMPILE_CACHE.resize(maxsize)
+        try:
+            rows.append((name, timed(evaluate, bytecode, mode='fast')))
+        finally:
+            PARSE_CACHE.resize(saved[0])
+            COMPILE_CACHE.resize(saved[1])
+    report(f'rules (20 x {n} evals): wall time', rows, 's')
+    print(f'\t{PARSE_CACHE!r}\n\t{COMPILE_CACHE!r}')
+
+def fixpoint_folding(tree):
+    # NOTE: the constant folding this replaced, for comparison
+    tree = deepcopy(tree)
+    while True:
+        did_optimization = False
+        for node in traverse_nodes(tree):
+            if isinstance(node, UNOPS) and not isinstance(node.arg, Var):
+                node.replace(node(env={}))
+                did_optimization = True
+        for node in traverse_nodes(tree):
+            if isinstance(node, BINOPS) \
+                and not isinstance(node.left, Var) and not isinstance(node.right, Var):
+                node.replace(node(env={}))
+                did_optimization = True
+        if not did_optimization:
+            return tree
+
+def traverse_nodes(tree):
+    if isinstance(tree, Node):
+        yield tree
+        for child in tree.children:
+            yield from traverse_nodes(child)
+
+def constant_program(statements, depth=4, seed=0):
+    '''
+    a generated program of constant subexpressions, next to variables
+    '''
+    rng = Random(seed)
+    def const(depth):
+        if not depth or rng.random() < .2:
+            return str(rng.randint(1, 9))
+        return f'({rng.choice("+-*")} {const(depth - 1)} {const(depth - 1)})'
+    lines = []
+    for i in range(statements):
+        if i % 4:
+            lines.append(f'(set v{i} (+ x {const(depth)}))')
+        else:
+            lines.append(f'(if (< {const(2)} {const(2)}) (set v{i} x) (set v{i} {const(depth)}))')
+    return '\n'.join(lines)
+
+def bench_folding():
+    for statements in 1_000, 4_500:
+        tree = parse(constant_program(statements))
+        nodes = sum(1 for _ in traverse_nodes(tree))
+        # NOTE: folding in place needs a fresh tree every time
+        trees = [parse(constant_program(statements)) for _ in range(3)]
+        rows = [('fixpoint', timed(fixpoint_folding, tree, repeat=1)),
+                ('copy', timed(constant_folding, tree)),
+                ('inplace', timed(lambda: constant_folding(trees.pop(), inplace=True)))]
+        report(f'constants ({nodes:,} nodes): folding time', rows, 's')
+
+def fixpoint_stack_ops(bytecodes):
+    # NOTE: the redundant stack op removal the peephole pass replaced
+    from pylisp.optimizer import STORES, window
+    bytecodes = deepcopy(bytecodes)
+    while True:
+        replacements = {}
+        for idx, (inst, next_inst) in enumerate(window(bytecodes, 2)):
+            store = STORES.get((type(inst), type(next_inst)))
+            if store is not None and inst.children == next_inst.children:
+                replacements[idx, idx+2] = [store(*inst.children)]
+        for (from_idx, to_idx), insts in sorted(replacements.items(), reverse=True):
+            bytecodes[from_idx:to_idx] = insts
+        if not replacements:
+            return bytecodes
+
+BRANCHES = r'''
+    (set x 0)
+    (set y 0)
+    (while true (
+        (if (== (% x 3) 0) (set y (+ y x)) (set y y))
+        (if (< x {n}) () (ret y))
+        (set x (+ x 1))
+        (if (> x {n}) (set x 0))
+    ))
+'''
+
+def bench_peephole():
+    code = ''.join(src.format(n=10) for src in (LOOP, HELPERS, BRANCHES)) * 200
+    bytecode = list(resolve_scopes(parse(code)))
+    rows = [('fixpoint', timed(fixpoint_stack_ops, bytecode, repeat=1)),
+            ('peephole', timed(peephole, bytecode))]
+    report(f'generated ({len(bytecode):,} insts): optimization time', rows, 's')
+    for name, n in [('loop', 20_000), ('branches', 20_000)]:
+        code = {'loop': LOOP, 'branches': BRANCHES}[name].format(n=n)
+        bytecode = list(resolve_scopes(parse(code)))
+        PEEPHOLE_HITS.clear()
+        rows = [('stores', evaluate(remove_redundant_stack_ops(bytecode), mode='fast').num_insts),
+                ('rules', evaluate(peephole(bytecode), mode='fast').num_insts)]
+        report(f'{name} ({n}): dispatches', rows, '', ',.0f')
+        print(f'\thits = {dict(PEEPHOLE_HITS)}')
+
+SCRATCH = r'''
+    (set scratch (lambda (n) (
+        (set i 0)
+        (set acc 0)
+        (while (< i n) (
+            (set sq (* i i))
+            (set acc (+ acc i))
+            (set i (+ i 1))
+        ))
+        (ret acc)
+    )))
+    (scratch {n})
+'''
+
+def bench_dataflow():
+    code = ''.join(src.format(n=10) for src in (LOOP, HELPERS, BRANCHES, SCRATCH)) * 200
+    bytecode = peephole(list(resolve_scopes(parse(code))))
+    rows = [('unreachable', timed(remove_unreachable, bytecode)),
+            ('dead stores', timed(remove_dead_stores, bytecode))]
+    report(f'generated ({len(bytecode):,} insts): optimization time', rows, 's')
+    n = 20_000
+    bytecode = peephole(list(resolve_scopes(parse(SCRATCH.format(n=n)))))
+    # NOTE: both versions share the profile of the function, so the first
+    #       run must not promote it
+    saved, tiering.THRESHOLD = tiering.THRESHOLD, None
+    try:
+        rows = [('peephole', evaluate(bytecode, mode='fast').num_insts),
+                ('dead stores', evaluate(remove_dead_stores(bytecode), mode='fast').num_insts)]
+    finally:
+        tiering.THRESHOLD = saved
+    report(f'scratch ({n}): dispatches', rows, '', ',.0f')
+
+def bench_inlining():
+    n = 20_000
+    code = HELPERS.format(n=n)
+    for label, threshold in [('baseline', None), ('tiered', tiering.THRESHOLD)]:
+        saved, tiering.THRESHOLD = tiering.THRESHOLD, threshold
+        try:
+            rows, calls = [], []
+            for name, passes in [('calls', (identify_tail_calls, resolve_scopes)),
+                                 ('inlined', (inline_functions, identify_tail_calls, resolve_scopes))]:
+                # NOTE: compile every time, the profiles live in the bytecode
+                compiled = lambda: optimize_bytecodes(list(optimize_ast(parse(code), passes)))
+                rows.append((name, timed(lambda: evaluate(compiled(), mode='fast'))))
+                calls.append((name, evaluate(compiled(), mode='fast').func_calls))
+        finally:
+            tiering.THRESHOLD = saved
+        report(f'helpers ({n}, {label}): wall time', rows, 's')
+        report(f'helpers ({n}, {label}): function calls', calls, '', ',.0f')
+
+STATES = r'''
+    (set ping (lambda (n) (
+        (set n (- n 1))
+        (if (> n 0) (pong n) n)
+    )))
+    (set pong (lambda (n) (
+        (set n (- n 1))
+        (if (> n 0) (ping n) n)
+    )))
+    (ping {n})
+'''
+
+def bench_tail_calls():
+    for n in 10_000, 100_000:
+        code = STATES.format(n=n)
+        rows, depths, memory = [], [], []
+        for name, passes in [('calls', (resolve_scopes,)), ('tail calls', (identify_tail_calls, resolve_scopes))]:
+            bytecode = optimize_bytecodes(list(optimize_ast(parse(code), passes)))
+            saved, tiering.THRESHOLD = tiering.THRESHOLD, None
+            try:
+                rows.append((name, timed(evaluate, bytecode, mode='fast')))
+                stats = evaluate(bytecode, mode='fast')
+                memory.append((name, peak(evaluate, bytecode, mode='fast')))
+            finally:
+                tiering.THRESHOLD = saved
+            depths.append((name, stats.max_frame_depth))
+            print(f'\t{name}: frames saved = {stats.frames_saved:,}')
+        report(f'ping/pong ({n}): wall time', rows, 's')
+        report(f'ping/pong ({n}): max frame depth', depths, '', ',.0f')
+        report(f'ping/pong ({n}): peak memory', memory, 'B', ',.0f')
+
+def tuple_list(values):
+    # NOTE: the bare tuples that were the bytecode cons cells
+    rv = None
+    for value in reversed(values):
+        rv = value, rv
+    return rv
+
+def bench_lists():
+    n = 1_000_000
+    values = list(range(n))
+    memory = [(name, allocated(func, values)[1] / n)
+              for name, func in [('tuples', tuple_list), ('pairs', lambda values: build(*values))]]
+    report(f'list ({n:,}): memory per cell', memory, 'B', '.1f')
+    xs = build(*values)
+    walk = optimize_bytecodes(list(resolve_scopes(parse(WALK))))
+    # NOTE: the call of the cdr function that PairCdr replaced
+    calls = [CallPyFunc(cdr, 1) if isinstance(inst, PairCdr) else inst for inst in walk]
+    native = list(resolve_scopes(parse('(set n (length xs))')))
+    rows = [(name, timed(evaluate, insts, env={'xs': xs}, mode='fast', repeat=1))
+            for name, insts in [('CallPyFunc cdr', calls), ('PairCdr', walk), ('length', native)]]
+    report(f'list ({n:,}): traversal time', rows, 's')
+
+def bench_sequences():
+    n = 20_000
+    rows, frames = [], []
+    for name, code in [('recursive lambdas', RECURSIVE_SEQUENCES), ('builtins', SEQUENCES)]:
+        bytecode = compile_source(code.format(n=n))
+        saved, tiering.THRESHOLD = tiering.THRESHOLD, None
+        try:
+            rows.append((name, timed(evaluate, bytecode, mode='fast')))
+            stats = evaluate(bytecode, env=(env := {}), mode='fast')
+        finally:
+            tiering.THRESHOLD = saved
+        frames.append((name, stats.num_frames))
+        print(f'\t{name}: rv = {env["rv"]}, max frame depth = {stats.max_frame_depth:,}')
+    report(f'sequences ({n:,}): wall time', rows, 's')
+    report(f'sequences ({n:,}): frames', frames, '', ',.0f')
+
+def bench_vectors():
+    n = 100_000
+    rows = []
+    for name, code in [('list', LIST_BATCH), ('vector', VECTOR_BATCH)]:
+        bytecode = compile_source(code.format(n=n), numeric='fast')
+        rows.append((name, timed(evaluate, bytecode, mode='fast', numeric='fast')))
+        stats = evaluate(bytecode, env=(env := {}), mode='fast', numeric='fast')
+        print(f'\t{name}: rv = {env["rv"]}, instructions = {stats.num_insts:,}')
+    report(f'2x+1 and sum ({n:,}, {BACKEND}): wall time', rows, 's')
+
+def bench_hash_maps():
+    lookups = 10_000
+    for n in 100, 1_000:
+        rows = []
+        for name, code in [('association list', ALIST_LOOKUPS), ('hash map', DICT_LOOKUPS)]:
+            bytecode = compile_source(code.format(n=n, lookups=lookups))
+            rows.append((name, timed(evaluate, bytecode, mode='fast')))
+        report(f'{lookups:,} lookups in {n:,} keys: wall time', rows, 's')
+
+def bench_closure_compiler():
+    for name, (code, n) in PROGRAMS.items():
+        suite = parse(code.format(n=n))
+        # NOTE: the compilation of the closures is counted in their time
+        rows = [('tree-walker', timed(suite, env={})),
+                ('closures', timed(lambda: compile_closure(suite)({}))),
+                ('fast', timed(evaluate, list(suite), mode='fast'))]
+        report(f'{name} ({n}): wall time', rows, 's')
+
+BENCHMARKS = {
+    'engines':  bench_engines,
+    'compact':  bench_compact,
+    'locals':   bench_locals,
+    'closures': bench_closures,
+    'globals':  bench_globals,
+    'quickening': bench_quickening,
+    'superinstructions': bench_superinstructions,
+    'numeric':  bench_numeric,
+    'codegen':  bench_codegen,
+    'tiering':  bench_tiering,
+    'cache':    bench_cache,
+    'streaming': bench_streaming,
+    'parse':    bench_parse,
+    'memo':     bench_memo,
+    'folding':  bench_folding,
+    'peephole': bench_peephole,
+    'dataflow': bench_dataflow,
+    'inlining': bench_inlining,
+    'tail_calls': bench_tail_calls,
+    'lists':    bench_lists,
+    'sequences': bench_sequences,
+    'vectors':  bench_vectors,
+    'hash_maps': bench_hash_maps,
+    'closure_compiler': bench_closure_compiler,
+}
+
+parser = ArgumentParser()
+parser.add_argument('-v', '--verbose', action='count')
+parser.add_argument('benchmarks', nargs='*')
+
+if __name__ == '__main__':
+    args = parser.parse_args()
+    basicConfig(level={2: DEBUG, 1: INFO}.get(args.verbose, ERROR))
+
+    for name, bench in BENCHMARKS.items():
+        if name in args.benchmarks or not args.benchmarks:
+            bench()
+            print()
@@ -1,6 +1,14 @@
+from .assembler import *
+from .cache import *
+from .cfg import *
+from .closures import *
+from .codegen import *
 from .evaluator import *
 from .frame import *
 from .insts import *
 from .nodes import *
+from .numeric import *
 from .optimizer import *
 from .parser import *
+from .tiering import *
+from .vector import *
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+from .insts import *
+
+from array import array
+from copy import copy
+from decimal import Decimal
+from logging import getLogger
+logger = getLogger(__name__)
+
+# NOTE: the position of an instruction class in this list is its opcode;
+#       instructions without an opcode of their own are stored in the pool
+#       as-is and are run via GENERIC
+OPCODES = [
+    None,   # GENERIC
+    Noop,
+    PushImm,
+    PushVar,
+    PushGlobalVar,
+    PopVar,
+    PopGlobalVar,
+    StoreVar,
+    JumpAlways,
+    JumpIfTrue,
+    JumpIfFalse,
+    CallPyFunc,
+    PushLocalVar,
+    PopLocalVar,
+    StoreLocalVar,
+    PushCellVar,
+    PopCellVar,
+    StoreCellVar,
+    PushClosureVar,
+    PopClosureVar,
+    StoreClosureVar,
+    MakePair,
+    MakeList,
+    PairCar,
+    PairCdr,
+    IsNil,
+    ListLength,
+    ListReverse,
+    ListAppend,
+    ListNth,
+    MakeHashMap,
+    HashMapGet,
+    HashMapSet,
+    HashMapHas,
+    HashMapKeys,
+    CreateFunc,
+    PushFunc,
+    PushTailFunc,
+    PushStackFunc,
+    PushStackTailFunc,
+    PopFunc,
+    CallNative,
+]
+GENERIC = 0
+OPCODE = {cls: op for op, cls in enumerate(OPCODES) if cls is not None}
+LOCALS = (PushLocalVar, PopLocalVar, StoreLocalVar,
+          PushCellVar, PopCellVar, StoreCellVar,
+          PushClosureVar, PopClosureVar, StoreClosureVar)
+CLOSURES = PushClosureVar, PopClosureVar, StoreClosureVar
+# NOTE: pooled as the instruction itself, which holds an inline cache
+#       or quickens in place
+POOLED = (PushVar, PushGlobalVar, CallPyFunc, PushFunc, PushTailFunc,
+          PushStackFunc, PushStackTailFunc, CallNative)
+ATOMS = str, int, float, Decimal, bool, type(None)
+
+class Code:
+    def __init__(self, ops, args, consts):
+        self.ops    = ops
+        self.args   = args
+        self.consts = consts
+    def __len__(self):
+        return len(self.ops)
+    def __repr__(self):
+        return f'Code(ops={self.ops!r}, args={self.args!r}, consts={self.consts!r})'
+    def nbytes(self):
+        ops, args = self.ops, self.args
+        return len(ops) * ops.itemsize + len(args) * args.itemsize
+
+class Pool:
+    def __init__(self):
+        self.consts = []
+        self.index = {}
+    def add(self, value, key=None):
+        if key is None:
+            if type(value) not in ATOMS:
+                self.consts.append(value)
+                return len(self.consts) - 1
+            key = type(value), repr(value)
+        if key not in self.index:
+            self.consts.append(value)
+            self.index[key] = len(self.consts) - 1
+        return self.index[key]
+
+def is_insts(value):
+    return isinstance(value, list) and value \
+        and all(isinstance(x, Inst) for x in value)
+
+def assemble_generic(inst):
+    if not any(is_insts(x) for x in inst.children):
+        return inst
+    # NOTE: copy rather than call __init__, which may rewrite its
+    #       arguments, e.g. CreateFunc appends a PopFunc to the body
+    new_inst = copy(inst)
+    new_inst.children = tuple(assemble(x) if is_insts(x) else x
+                              for x in inst.children)
+    return new_inst
+
+def assemble(insts):
+    ops, args, pool = array('H'), array('I'), Pool()
+    for inst in link(insts):
+        op = OPCODE.get(type(inst), GENERIC)
+        if isinstance(inst, CallPyFunc):
+            op = OPCODE[CallPyFunc]
+        if isinstance(inst, CLOSURES) and inst.index is None:
+            # NOTE: closure variables of unresolved functions live in ChainMaps
+            op = GENERIC
+        if op == GENERIC or isinstance(inst, CreateFunc):
+            arg = pool.add(assemble_generic(inst))
+        elif isinstance(inst, JUMPS):
+            arg = inst.label
+        elif isinstance(inst, (MakeList, MakeHashMap)):
+            arg = inst.count
+        elif isinstance(inst, CallPyFunc) or type(inst) in POOLED:
+            arg = pool.add(inst)
+        elif isinstance(inst, LOCALS):
+            arg = pool.add(inst.children, key=(LOCALS, *inst.children))
+        elif isinstance(inst, PushImm):
+            arg = pool.add(inst.value)
+        elif isinstance(inst, (PopVar, StoreVar, PopFunc)):
+            arg = pool.add(inst.name)
+        else:
+            arg = 0
+        ops.append(op)
+        args.append(arg)
+    return Code(ops, args, pool.consts)
+
+def disassemble(code):
+    insts = []
+    for op, arg in zip(code.ops, code.args):
+        cls = OPCODES[op]
+        if op == GENERIC or cls is CreateFunc:
+            insts.append(code.consts[arg])
+        elif cls in JUMPS or cls in (MakeList, MakeHashMap):
+            insts.append(cls(arg))
+        elif cls in LOCALS:
+            insts.append(cls(*code.consts[arg]))
+        elif cls in POOLED:
+            insts.append(code.consts[arg])
+        elif cls is Noop or cls in LIST_INSTS or cls in HASH_MAP_INSTS:
+            insts.append(cls())
+        else:
+            insts.append(cls(code.consts[arg]))
+    return insts
+
+__all__ = [
+    'Code',
+    'assemble',
+    'disassemble',
+    'OPCODES',
+]
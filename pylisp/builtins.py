@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+from logging import getLogger
+logger = getLogger(__name__)
+
+# NOTE: the Python functions called by CallPyFunc, by name; the bytecode
+#       cache stores a function by its name rather than by reference, so
+#       that lambdas and the functions of generated classes survive
+BUILTINS = {}
+
+def builtin(name, func=None):
+    '''
+    register func as the builtin name, e.g. builtin('car', car) or
+    @builtin('car') as a decorator
+    '''
+    if func is None:
+        return lambda func: builtin(name, func)
+    if BUILTINS.setdefault(name, func) is not func:
+        raise ValueError(f'builtin {name!r} is already registered')
+    return func
+
+class Pair:
+    '''
+    a cons cell, shared by the tree-walker and the bytecode; a list is a
+    chain of pairs ending in nil, which is None in the bytecode and the
+    Nil node in the tree-walker
+    '''
+    __slots__ = 'car', 'cdr'
+    def __init__(self, car, cdr):
+        self.car = car
+        self.cdr = cdr
+    def __iter__(self):
+        xs = self
+        while xs.__class__ is Pair:
+            yield xs.car
+            xs = xs.cdr
+    def tail(self):
+        '''
+        the nil (or the atom, for an improper list) ending the list
+        '''
+        xs = self
+        while xs.__class__ is Pair:
+            xs = xs.cdr
+        return xs
+    def __eq__(self, other):
+        # NOTE: a loop rather than recursion, for lists of any length
+        xs, ys = self, other
+        while xs.__class__ is Pair:
+            if ys.__class__ is not Pair or xs.car != ys.car:
+                return False
+            xs, ys = xs.cdr, ys.cdr
+        return xs == ys
+    __hash__ = None
+    def __repr__(self):
+        tail = self.tail()
+        items = ' '.join(repr(x) for x in self)
+        from .nodes import Nil
+        if tail is None or isinstance(tail, type(Nil)):
+            return f'({items})'
+        return f'({items} . {tail!r})'
+    # NOTE: in the tree-walker a pair is a value node: it evaluates to
+    #       itself and unwraps to the pair of the values of its nodes
+    def __call__(self, env):
+        return self
+    @property
+    def value(self):
+        return build(*(x.value for x in self), tail=self.tail().value)
+
+@builtin('car')
+def car(cell):
+    return cell.car
+
+@builtin('cdr')
+def cdr(cell):
+    return cell.cdr
+
+@builtin('cons')
+def cons(car, cdr):
+    return Pair(car, cdr)
+
+@builtin('nil?')
+def is_nil(xs):
+    return xs.__class__ is not Pair
+
+@builtin('list')
+def build(*vals, tail=None):
+    rv = tail
+    for v in reversed(vals):
+        rv = Pair(v, rv)
+    return rv
+
+# NOTE: the native list functions walk the list in one Python loop and end
+#       at the first non-pair, so they work on the lists of both paths
+
+@builtin('length')
+def length(xs):
+    n = 0
+    while xs.__class__ is Pair:
+        n += 1
+        xs = xs.cdr
+    return n
+
+@builtin('append')
+def append(xs, ys):
+    if xs.__class__ is not Pair:
+        return ys
+    head = last = Pair(xs.car, ys)
+    xs = xs.cdr
+    while xs.__class__ is Pair:
+        last.cdr = last = Pair(xs.car, ys)
+        xs = xs.cdr
+    return head
+
+@builtin('reverse')
+def reverse(xs):
+    # NOTE: the reversed list ends in the nil of xs
+    rv = xs.tail() if xs.__class__ is Pair else xs
+    while xs.__class__ is Pair:
+        rv = Pair(xs.car, rv)
+        xs = xs.cdr
+    return rv
+
+@builtin('nth')
+def nth(xs, n):
+    i = int(n)
+    while i > 0 and xs.__class__ is Pair:
+        xs, i = xs.cdr, i - 1
+    if n < 0 or xs.__class__ is not Pair:
+        raise IndexError(f'nth: index {n} out of range')
+    return xs.car
+
+class HashMap(dict):
+    '''
+    a mutable hash map; like a Pair, a value node of the tree-walker too,
+    whose keys are unwrapped values and whose values are nodes
+    '''
+    __slots__ = ()
+    def __call__(self, env):
+        return self
+    @property
+    def value(self):
+        return HashMap((k, v.value) for k, v in self.items())
+
+@builtin('dict-new')
+def dict_new(*items):
+    # NOTE: items are the keys and the values, alternating
+    return HashMap(zip(items[::2], items[1::2]))
+
+@builtin('dict-get')
+def dict_get(d, key):
+    return d.get(key)
+
+@builtin('dict-set')
+def dict_set(d, key, value):
+    d[key] = value
+    return value
+
+@builtin('dict-has')
+def dict_has(d, key):
+    return key in d
+
+@builtin('dict-keys')
+def dict_keys(d):
+    return build(*d)
+
+@builtin('range')
+def make_range(start, stop=None, step=1):
+    '''
+    the list of the numbers from start up to, but excluding, stop, by step;
+    with one argument, from zero to it
+    '''
+    if stop is None:
+        # NOTE: a zero of the numeric type of stop
+        start, stop = start - start, start
+    if not step:
+        raise ValueError('range step must not be zero')
+    values, x = [], start
+    if step > 0:
+        while x < stop:
+            values.append(x)
+            x += step
+    else:
+        while x > stop:
+            values.append(x)
+            x += step
+    return build(*values)
+
+__all__ = [
+    'Pair',
+    'car',
+    'cdr',
+    'cons',
+    'is_nil',
+    'build',
+    'length',
+    'append',
+    'reverse',
+    'nth',
+    'make_range',
+    'HashMap',
+    'dict_new',
+    'dict_get',
+    'dict_set',
+    'dict_has',
+    'dict_keys',
+    'builtin',
+    'BUILTINS',
+]
@@ -0,0 +1,181 @@
+#!/usr/bin/env python3
+from .insts import Inst
+from .nodes import Node, Nil, True_, False_
+from .frame import Unbound
+from .builtins import BUILTINS
+from .numeric import get_numeric, current_numeric
+from .parser import parse
+from .optimizer import inline_functions, constant_folding, identify_tail_calls, resolve_scopes, optimize_ast
+from .optimizer import peephole, remove_unreachable, remove_dead_stores, fuse_superinstructions, optimize_bytecodes
+from .codegen import build_native
+
+from os import makedirs, replace, getpid
+from os.path import join, dirname
+from io import BytesIO
+from glob import glob
+from sys import version
+from hashlib import sha256
+from pickle import Pickler, Unpickler, PicklingError, UnpicklingError, HIGHEST_PROTOCOL
+from logging import getLogger
+logger = getLogger(__name__)
+
+# NOTE: the header of every cache file; the cache key also covers the
+#       Python version and the sources of this package, so editing an
+#       instruction invalidates the cached programs
+MAGIC = b'PYLISP\x00\x01'
+CACHE_DIR = '__pylispcache__'
+PASSES = inline_functions, constant_folding, identify_tail_calls, resolve_scopes
+BYTECODE_PASSES = peephole, remove_unreachable, remove_dead_stores, peephole, fuse_superinstructions
+SINGLETONS = {'Nil': Nil, 'True_': True_, 'False_': False_, 'Unbound': Unbound}
+
+class CacheError(Exception):
+    '''
+    raised for a cache file that cannot be loaded, e.g. one written by a
+    different version of pylisp or naming an unknown builtin
+    '''
+
+def subclasses(cls):
+    for sub in cls.__subclasses__():
+        yield sub
+        yield from subclasses(sub)
+
+# NOTE: the generated instructions and nodes (superinstructions,
+#       specializations, binops) cannot be pickled by reference, so
+#       they are stored by their class name
+CLASSES = {}
+
+def rebuild(base, name):
+    key = base, name
+    if key not in CLASSES:
+        for base_, cls in ('inst', Inst), ('node', Node):
+            CLASSES.update(((base_, sub.__name__), sub) for sub in subclasses(cls))
+        if key not in CLASSES:
+            raise CacheError(f'unknown {base} {name!r}')
+    cls = CLASSES[key]
+    return cls.__new__(cls)
+
+class CachePickler(Pickler):
+    def __init__(self, file):
+        super().__init__(file, HIGHEST_PROTOCOL)
+        self.names = {id(func): ('builtin', name) for name, func in BUILTINS.items()}
+        self.names.update((id(x), ('singleton', name)) for name, x in SINGLETONS.items())
+    def persistent_id(self, obj):
+        return self.names.get(id(obj))
+    def reducer_override(self, obj):
+        # NOTE: an instruction or a node is its class name and its attributes;
+        #       __init__ is not run again, since e.g. CreateFunc rewrites its body
+        if isinstance(obj, Inst):
+            return rebuild, ('inst', type(obj).__name__), obj.__dict__
+        if isinstance(obj, Node):
+            return rebuild, ('node', type(obj).__name__), obj.__dict__
+        if hasattr(obj, 'source') and hasattr(obj, 'consts') and callable(obj):
+            # NOTE: a function compiled by codegen is compiled again on load
+            return build_native, (obj.__name__, obj.source, obj.consts)
+        return NotImplemented
+
+class CacheUnpickler(Unpickler):
+    def persistent_load(self, pid):
+        kind, name = pid
+        try:
+            return {'builtin': BUILTINS, 'singleton': SINGLETONS}[kind][name]
+        except KeyError as e:
+            raise CacheError(f'unknown {kind} {name!r}') from e
+
+def dump(insts, file):
+    file.write(MAGIC)
+    CachePickler(file).dump(insts)
+
+def load(file):
+    if file.read(len(MAGIC)) != MAGIC:
+        raise CacheError('not a pylisp cache file')
+    try:
+        return CacheUnpickler(file).load()
+    except (UnpicklingError, EOFError, AttributeError, ImportError) as e:
+        raise CacheError(f'corrupt cache file: {e}') from e
+
+def dumps(insts):
+    file = BytesIO()
+    dump(insts, file)
+    return file.getvalue()
+
+def loads(data):
+    return load(BytesIO(data))
+
+# NOT thread-safe!!
+__fingerprint__ = None
+
+def fingerprint():
+    '''
+    a digest of the Python version and the sources of this package
+    '''
+    global __fingerprint__
+    if __fingerprint__ is None:
+        h = sha256(MAGIC + version.encode())
+        for path in sorted(glob(join(dirname(__file__), '*.py'))):
+            with open(path, 'rb') as f:
+                h.update(f.read())
+        __fingerprint__ = h.digest()
+    return __fingerprint__
+
+def qualname(func):
+    return f'{func.__module__}.{func.__qualname__}'
+
+def cache_key(source, optimizations, bytecode_optimizations, numeric):
+    h = sha256(fingerprint())
+    h.update(source.encode())
+    for opt in (*optimizations, None, *bytecode_optimizations):
+        h.update(b'\x00' if opt is None else qualname(opt).encode() + b'\x00')
+    h.update(f'{numeric.name} {numeric.context!r}'.encode())
+    return h.hexdigest()
+
+def compile_source(source, optimizations=PASSES, bytecode_optimizations=BYTECODE_PASSES, numeric=None):
+    '''
+    parse source and run the AST and the bytecode optimizations on it
+    '''
+    tree = optimize_ast(parse(source, numeric=numeric), optimizations, numeric=numeric)
+    return optimize_bytecodes(list(tree), bytecode_optimizations)
+
+def cached_compile(source, cache_dir=CACHE_DIR, optimizations=PASSES, bytecode_optimizations=BYTECODE_PASSES, numeric=None):
+    '''
+    compile_source(source, ...), loaded from cache_dir if the same source
+    has been compiled with the same settings before; programs that cannot
+    be stored, e.g. those calling unregistered Python functions, are
+    compiled every time
+    '''
+    numeric = get_numeric(numeric) if numeric is not None else current_numeric()
+    key = cache_key(source, optimizations, bytecode_optimizations, numeric)
+    path = join(cache_dir, f'{key}.plc')
+    try:
+        with open(path, 'rb') as f:
+            insts = load(f)
+        logger.info('loaded %s', path)
+        return insts
+    except FileNotFoundError:
+        pass
+    except CacheError as e:
+        logger.warning('ignoring %s: %s', path, e)
+
+    insts = compile_source(source, optimizations, bytecode_optimizations, numeric)
+    try:
+        data = dumps(insts)
+    except (PicklingError, TypeError, AttributeError) as e:
+        logger.info('not caching %s: %s', path, e)
+        return insts
+    # NOTE: write and rename, so a concurrent run never reads half a file
+    makedirs(cache_dir, exist_ok=True)
+    tmp = f'{path}.{getpid()}.tmp'
+    with open(tmp, 'wb') as f:
+        f.write(data)
+    replace(tmp, path)
+    logger.info('cached %s', path)
+    return insts
+
+__all__ = [
+    'CacheError',
+    'dump',
+    'load',
+    'dumps',
+    'loads',
+    'compile_source',
+    'cached_compile',
+]
@@ -0,0 +1,165 @@
+#!/usr/bin/env python3
+from .insts import *
+
+from logging import getLogger
+logger = getLogger(__name__)
+
+# NOTE: the instructions after which control never reaches the next one:
+#       a return, a halt and a tail call, which reuses or pops the frame
+EXITS = PopFunc, Halt, PushTailFunc
+# NOTE: only slot locals are tracked; the other variables live in envs and
+#       cells, which callees, closures and eval may read
+USES = PushLocalVar,
+DEFS = PopLocalVar, StoreLocalVar
+
+def jump_of(inst):
+    if isinstance(inst, Superinst):
+        inst = inst.parts[-1]
+    return inst if isinstance(inst, JUMPS) else None
+
+NONE = frozenset()
+
+def effects(inst):
+    '''
+    the slots inst reads and the slots it assigns
+    '''
+    if isinstance(inst, USES):
+        return frozenset((inst.slot,)), NONE
+    if isinstance(inst, DEFS):
+        return NONE, frozenset((inst.slot,))
+    if isinstance(inst, Superinst):
+        return (frozenset(x.slot for x in inst.parts if isinstance(x, USES)),
+                frozenset(x.slot for x in inst.parts if isinstance(x, DEFS)))
+    return NONE, NONE
+
+def transfer(inst, live):
+    '''
+    the slots live before inst, given those live after it; the operands
+    of a superinstruction are read before its result is stored
+    '''
+    used, defined = effects(inst)
+    if not used and not defined:
+        return live
+    return used | (live - defined)
+
+class Block:
+    '''
+    a basic block, the instructions [start, end) of its CFG: control only
+    enters at start and only leaves after the last instruction
+    '''
+    def __init__(self, start, end):
+        self.start = start
+        self.end   = end
+        self.succs = []
+        self.preds = []
+    def __repr__(self):
+        return f'Block({self.start}, {self.end}, succs={[b.start for b in self.succs]!r})'
+
+class CFG:
+    '''
+    the control-flow graph of a list of instructions, which are linked
+    first; the first block is the entry, and jumping or falling past the
+    last instruction leaves the frame like a PopFunc
+    '''
+    def __init__(self, insts):
+        self.insts = insts = link(list(insts))
+        leaders = {0}
+        for pc, inst in enumerate(insts):
+            jump = jump_of(inst)
+            if jump is not None:
+                leaders.add(jump.label)
+            if jump is not None or isinstance(inst, EXITS):
+                leaders.add(pc + 1)
+        starts = sorted(pc for pc in leaders if pc < len(insts))
+        self.blocks = [Block(start, end) for start, end in zip(starts, [*starts[1:], len(insts)])]
+        self.block_at = {block.start: block for block in self.blocks}
+        for block in self.blocks:
+            last = insts[block.end - 1]
+            jump = jump_of(last)
+            pcs = []
+            if jump is not None:
+                pcs.append(jump.label)
+            if not isinstance(jump, JumpAlways) and not isinstance(last, EXITS):
+                pcs.append(block.end)
+            for pc in pcs:
+                succ = self.block_at.get(pc)
+                if succ is not None and succ not in block.succs:
+                    block.succs.append(succ)
+                    succ.preds.append(block)
+    def __repr__(self):
+        return f'CFG({self.blocks!r})'
+    def __iter__(self):
+        return iter(self.blocks)
+    def block_insts(self, block):
+        return self.insts[block.start:block.end]
+    def reachable(self):
+        '''
+        the blocks on some path from the entry
+        '''
+        seen, todo = set(), self.blocks[:1]
+        while todo:
+            block = todo.pop()
+            if block not in seen:
+                seen.add(block)
+                todo.extend(block.succs)
+        return seen
+
+def liveness(cfg):
+    '''
+    the slots live at the start and at the end of every block, i.e. read by
+    a PushLocalVar on some path before they are assigned again
+    '''
+    gen, kill = {}, {}
+    for block in cfg:
+        gen[block], kill[block] = set(), set()
+        for inst in reversed(cfg.block_insts(block)):
+            gen[block] = transfer(inst, gen[block])
+            kill[block] |= effects(inst)[1]
+    live_in  = {block: set() for block in cfg}
+    live_out = {block: set() for block in cfg}
+    # NOTE: a backward problem converges fastest from the last block
+    work = list(cfg)
+    while work:
+        block = work.pop()
+        live_out[block] = set().union(*(live_in[succ] for succ in block.succs))
+        new = gen[block] | (live_out[block] - kill[block])
+        if new != live_in[block]:
+            live_in[block] = new
+            work.extend(pred for pred in block.preds if pred not in work)
+    return live_in, live_out
+
+def reaching_definitions(cfg, entry=()):
+    '''
+    the definitions reaching the start of every block, as (slot, pc) of
+    the PopLocalVar or StoreLocalVar at pc; entry are the definitions
+    reaching the entry, e.g. (slot, None) for every parameter
+    '''
+    gen, kill = {}, {}
+    for block in cfg:
+        last = {}
+        for pc in range(block.start, block.end):
+            for slot in effects(cfg.insts[pc])[1]:
+                last[slot] = pc
+        gen[block], kill[block] = set(last.items()), set(last)
+    reach_in  = {block: set() for block in cfg}
+    reach_out = {block: set(gen[block]) for block in cfg}
+    if cfg.blocks:
+        reach_in[cfg.blocks[0]] = set(entry)
+    work = list(reversed(cfg.blocks))
+    while work:
+        block = work.pop()
+        new = set(entry) if block is cfg.blocks[0] else set()
+        new = new.union(*(reach_out[pred] for pred in block.preds))
+        reach_in[block] = new
+        out = gen[block] | {(slot, pc) for slot, pc in new if slot not in kill[block]}
+        if out != reach_out[block]:
+            reach_out[block] = out
+            work.extend(succ for succ in block.succs if succ not in work)
+    return reach_in
+
+__all__ = [
+    'CFG',
+    'Block',
+    'liveness',
+    'reaching_definitions',
+]
@@ -0,0 +1,357 @@
+#!/usr/bin/env python3
+from .nodes import *
+from .nodes import VectorToList, elements
+from .frame import LRU
+from .insts import enclosing
+from .builtins import Pair, HashMap, build, is_nil, length, append, reverse, nth, make_range
+from .vector import vector_to_list
+from .parser import cached_parse
+import pylisp.nodes as nodes
+
+from collections import ChainMap
+from sys import stdin
+from logging import getLogger
+logger = getLogger(__name__)
+
+class Uncompilable(Exception):
+    '''
+    raised for a node no closure is registered for
+    '''
+
+# NOTE: the closure compiler of every node class, by class; a node is
+#       compiled by the first class of its MRO found here, so e.g. the
+#       resolved SetLocal and LocalVar compile like Set and Var
+COMPILERS = {}
+
+def compiles(*classes):
+    '''
+    register the decorated function of (node, compile) as the compiler
+    of classes, returning the closure of env evaluating the node
+    '''
+    def register(func):
+        for cls in classes:
+            COMPILERS[cls] = func
+        return func
+    return register
+
+@compiles(Atom)
+def compile_atom(node, compile):
+    value = node.value
+    return lambda env: value
+
+@compiles(type(Nil), type(True_), type(False_), Comment)
+def compile_constant(node, compile):
+    # NOTE: like in the bytecode, nil is None and a comment pushes nothing
+    value = None if isinstance(node, Comment) else node.value
+    return lambda env: value
+
+@compiles(Suite)
+def compile_suite(node, compile):
+    children = [compile(x) for x in node.children]
+    if not children:
+        return lambda env: None
+    if len(children) == 1:
+        return children[0]
+    *init, last = children
+    def suite(env):
+        for child in init:
+            child(env)
+        return last(env)
+    return suite
+
+@compiles(Ret, Native)
+def compile_ret(node, compile):
+    # NOTE: the tree-walker evaluates the original statements of a Native
+    return compile(node.value if isinstance(node, Ret) else node.node)
+
+@compiles(Var)
+def compile_var(node, compile):
+    name = node.name
+    def var(env):
+        try:
+            return env[name]
+        except KeyError as e:
+            raise ProgramError(f'unknown name {name!r}') from e
+    return var
+
+@compiles(Set)
+def compile_set(node, compile):
+    name, value = node.name.value, compile(node.value)
+    def set_(env):
+        env[name] = rv = value(env)
+        return rv
+    return set_
+
+@compiles(Setg, Setc)
+def compile_set_outer(node, compile):
+    name, value = node.name.value, compile(node.value)
+    outer = (lambda env: env.maps[-1]) if isinstance(node, Setg) else (lambda env: enclosing(env, name))
+    def set_outer(env):
+        rv = value(env)
+        if isinstance(env, ChainMap):
+            outer(env)[name] = rv
+        else:
+            env[name] = rv
+        return rv
+    return set_outer
+
+@compiles(IfElse)
+def compile_ifelse(node, compile):
+    cond, ifbody = compile(node.cond), compile(node.ifbody)
+    elsebody = compile(node.elsebody) if node.elsebody else (lambda env: None)
+    def ifelse(env):
+        if cond(env):
+            return ifbody(env)
+        return elsebody(env)
+    return ifelse
+
+@compiles(While)
+def compile_while(node, compile):
+    cond, body = compile(node.cond), compile(node.body)
+    def while_(env):
+        rv = None
+        while cond(env):
+            rv = body(env)
+        return rv
+    return while_
+
+@compiles(Lambda)
+def compile_lambda(node, compile):
+    # NOTE: the body is compiled once, here, and evaluating the lambda
+    #       only closes a Python function over its defining environment
+    params, body = node.params.value, compile(node.body)
+    def lambda_(env):
+        closures = env.maps[:-1] if isinstance(env, ChainMap) else []
+        def ufunc(env, *args):
+            local_env = dict(zip(params, args))
+            if isinstance(env, ChainMap) and nodes.__scoping__ is Scoping.LEXICAL:
+                return body(ChainMap(local_env, *closures, env.maps[-1]))
+            return body(ChainMap(local_env, *closures, env))
+        return ufunc
+    return lambda_
+
+@compiles(Call, StackCall)
+def compile_call(node, compile):
+    name = node.name.name if isinstance(node, StackCall) else node.name.value
+    args = [compile(x) for x in node.args]
+    ufunc_calls = compile.stats['ufunc-calls'] if compile.stats is not None else None
+    def call(env):
+        values = [arg(env) for arg in args]
+        try:
+            func = env[name]
+        except KeyError as e:
+            raise ProgramError(f'unknown name {name!r}') from e
+        if ufunc_calls is not None:
+            ufunc_calls[name] += 1
+        return func(env, *values)
+    return call
+
+@compiles(Inline)
+def compile_inline(node, compile):
+    bindings, body = [compile(x) for x in reversed(node.bindings)], compile(node.body)
+    def inline(env):
+        for binding in bindings:
+            binding(env)
+        return body(env)
+    return inline
+
+@compiles(Assert)
+def compile_assert(node, compile):
+    cond, msg = compile(node.cond), compile(node.msg)
+    def assert_(env):
+        if not cond(env):
+            raise ProgramError(msg(env))
+    return assert_
+
+@compiles(List)
+def compile_list(node, compile):
+    values = [compile(x) for x in node.values]
+    return lambda env: build(*[value(env) for value in values])
+
+@compiles(Cons)
+def compile_cons(node, compile):
+    car, cdr = compile(node.car), compile(node.cdr)
+    return lambda env: Pair(car(env), cdr(env))
+
+@compiles(Car)
+def compile_car(node, compile):
+    cons = compile(node.cons)
+    return lambda env: cons(env).car
+
+@compiles(Cdr)
+def compile_cdr(node, compile):
+    cons = compile(node.cons)
+    return lambda env: cons(env).cdr
+
+@compiles(Null, Length, Reverse)
+def compile_list_func(node, compile):
+    func = {Null: is_nil, Length: length, Reverse: reverse}[type(node)]
+    xs = compile(node.list)
+    return lambda env: func(xs(env))
+
+@compiles(Append)
+def compile_append(node, compile):
+    left, right = compile(node.left), compile(node.right)
+    return lambda env: append(left(env), right(env))
+
+@compiles(Nth)
+def compile_nth(node, compile):
+    xs, index = compile(node.list), compile(node.index)
+    return lambda env: nth(xs(env), index(env))
+
+@compiles(Map)
+def compile_map(node, compile):
+    func, xs = compile(node.func), compile(node.list)
+    def map_(env):
+        f = func(env)
+        return build(*[f(env, x) for x in elements(xs(env))])
+    return map_
+
+@compiles(Filter)
+def compile_filter(node, compile):
+    func, xs = compile(node.func), compile(node.list)
+    def filter_(env):
+        f = func(env)
+        return build(*[x for x in elements(xs(env)) if f(env, x)])
+    return filter_
+
+@compiles(Fold)
+def compile_fold(node, compile):
+    func, init, xs = compile(node.func), compile(node.init), compile(node.list)
+    def fold(env):
+        f, acc = func(env), init(env)
+        for x in elements(xs(env)):
+            acc = f(env, acc, x)
+        return acc
+    return fold
+
+@compiles(Range)
+def compile_range(node, compile):
+    args = [compile(x) for x in node.args]
+    return lambda env: make_range(*[arg(env) for arg in args])
+
+@compiles(DictNew)
+def compile_dict_new(node, compile):
+    items = [compile(x) for x in node.items]
+    def dict_new(env):
+        values = [item(env) for item in items]
+        return HashMap(zip(values[::2], values[1::2]))
+    return dict_new
+
+@compiles(DictGet)
+def compile_dict_get(node, compile):
+    d, key = compile(node.dict), compile(node.key)
+    return lambda env: d(env).get(key(env))
+
+@compiles(DictHas)
+def compile_dict_has(node, compile):
+    d, key = compile(node.dict), compile(node.key)
+    def dict_has(env):
+        rv = d(env)
+        return key(env) in rv
+    return dict_has
+
+@compiles(DictSet)
+def compile_dict_set(node, compile):
+    d, key, value = compile(node.dict), compile(node.key), compile(node.value)
+    def dict_set(env):
+        rv, k = d(env), key(env)
+        rv[k] = v = value(env)
+        return v
+    return dict_set
+
+@compiles(DictKeys)
+def compile_dict_keys(node, compile):
+    d = compile(node.dict)
+    return lambda env: build(*d(env))
+
+@compiles(VectorToList)
+def compile_vector_to_list(node, compile):
+    vector = compile(node.vector)
+    return lambda env: vector_to_list(vector(env))
+
+@compiles(Read)
+def compile_read(node, compile):
+    def read(env):
+        if '--stdin' in env:
+            return env['--stdin']()
+        return next(stdin)
+    return read
+
+@compiles(Parse)
+def compile_parse(node, compile):
+    expr = compile(node.expr)
+    return lambda env: cached_parse(expr(env))
+
+# NOTE: the closures of the ASTs run by (eval x), by the identity of the
+#       AST, which the entry keeps alive, like insts.COMPILE_CACHE
+CLOSURE_CACHE = LRU()
+
+@compiles(Eval)
+def compile_eval(node, compile):
+    expr = compile(node.expr)
+    def eval_(env):
+        tree = expr(env)
+        _, run = CLOSURE_CACHE.lookup(id(tree), lambda: (tree, compile_closure(tree, compile.stats)))
+        return run(env)
+    return eval_
+
+def compile_function(node, compile):
+    '''
+    the closure of an operator or a create_pyfunc node, which calls the
+    Python function of its class on the values of its children
+    '''
+    func, args = type(node).function, [compile(x) for x in node.children]
+    if len(args) == 1:
+        arg, = args
+        return lambda env: func(arg(env))
+    if len(args) == 2:
+        left, right = args
+        return lambda env: func(left(env), right(env))
+    return lambda env: func(*[arg(env) for arg in args])
+
+class Compiler:
+    '''
+    the compiler of a tree: compiles every node with the registered
+    compiler of its class, counting its evaluations in stats if given
+    '''
+    def __init__(self, stats=None):
+        self.stats = stats
+    def __call__(self, node):
+        for cls in type(node).__mro__:
+            compiler = COMPILERS.get(cls)
+            if compiler is not None:
+                break
+        else:
+            if not hasattr(type(node), 'function'):
+                raise Uncompilable(node)
+            compiler = compile_function
+        closure = compiler(node, self)
+        if self.stats is None:
+            return closure
+        return counted(self.stats['func-calls'], type(node).__name__, closure)
+
+def counted(calls, name, closure):
+    def inner(env):
+        calls[name] += 1
+        return closure(env)
+    return inner
+
+def compile_closure(tree, stats=None):
+    '''
+    the Python closure of env evaluating tree, compiled once: a nested
+    closure per node, called without the debug decorator of the tree-walker;
+    values are unwrapped like in the bytecode, nil being None, and functions
+    are Python functions of the calling environment and the arguments;
+    stats, e.g. nodes.stats, counts the evaluations of every node class and
+    the calls of every function name
+    '''
+    return Compiler(stats)(tree)
+
+__all__ = [
+    'Uncompilable',
+    'COMPILERS',
+    'CLOSURE_CACHE',
+    'compiles',
+    'compile_closure',
+]
@@ -0,0 +1,351 @@
+#!/usr/bin/env python3
+from .nodes import *
+from .nodes import check_assert
+from .builtins import length, append, reverse, nth, dict_new, dict_keys
+from .frame import Unbound
+from .parser import cached_parse
+
+from re import sub
+from math import isfinite
+from copy import deepcopy
+from itertools import count
+from operator import eq, ne, lt, gt, le, ge, add, sub as sub_, mul, truediv, mod, pow, and_, or_, not_, xor, pos, neg
+from logging import getLogger
+logger = getLogger(__name__)
+
+class Unsupported(Exception):
+    '''
+    raised for a node the code generator does not translate; the function
+    or statements containing it stay on the frame-stack evaluator
+    '''
+
+BINARY = {eq: '==', ne: '!=', lt: '<', gt: '>', le: '<=', ge: '>=',
+          add: '+', sub_: '-', mul: '*', truediv: '/', mod: '%', pow: '**',
+          and_: '&', or_: '|', xor: '^'}
+UNARY = {pos: '+', neg: '-', not_: 'not '}
+CONSTANTS = Atom, type(Nil), type(True_), type(False_)
+LIST_FUNCTIONS = {Length: length, Reverse: reverse}
+SIDE_EFFECTS = Set, Setg, Setc, Assert, Print, Printf, Printfs, DictSet
+
+def setitem(env, name, value):
+    env[name] = value
+    return value
+
+def setcell(cell, value):
+    cell.value = value
+    return value
+
+def nodes_of(tree):
+    yield tree
+    for child in tree.children:
+        if isinstance(child, Node):
+            yield from nodes_of(child)
+
+def is_pure(node):
+    if isinstance(node, Inline):
+        # NOTE: binding the fresh names of the parameters is no side effect
+        return all(is_pure(x) for x in (node.body, *(x.value for x in node.bindings)))
+    return not isinstance(node, SIDE_EFFECTS) \
+        and all(is_pure(x) for x in node.children if isinstance(x, Node))
+
+def build_native(name, source, consts):
+    '''
+    the Python function name defined by source, with consts as its globals
+    '''
+    ns = dict(consts)
+    exec(compile(source, f'<pylisp {name}>', 'exec'), ns)
+    func = ns[name]
+    # NOTE: kept so the bytecode cache can rebuild the function
+    func.source, func.consts = source, consts
+    return func
+
+def maybe_unbound(body, layout):
+    '''
+    the slots of the locals that may be read before they are assigned:
+    only parameters, the parameters of inlined calls and locals set by an
+    earlier top-level statement of the body, whose value does not read
+    them, are surely bound
+    '''
+    bound = set(layout.param_slots)
+    # NOTE: the parameters of an inlined call are only read after binding
+    bound.update(x.slot for node in nodes_of(body) if isinstance(node, Inline)
+                 for x in node.bindings)
+    rv = set()
+    statements = body.children if isinstance(body, Suite) else (body,)
+    for statement in statements:
+        for node in nodes_of(statement):
+            if isinstance(node, LocalVar) and node.slot not in bound:
+                rv.add(node.slot)
+        if isinstance(statement, SetLocal):
+            bound.add(statement.slot)
+    return rv
+
+class CodeGen:
+    '''
+    translate a Lambda or top-level statements into the source of a Python
+    function taking the closure cells and the globals of the running frame;
+    slot locals become Python locals and self tail calls become a loop
+    '''
+    def __init__(self, layout=None, self_name=None):
+        self.layout = layout
+        self.self_name = self_name
+        self.consts = {'Unbound': Unbound, '_setitem': setitem, '_setcell': setcell}
+        self.lines = []
+        self.temps = count()
+        self.unbound = set()
+
+    def const(self, value):
+        if type(value) in (int, str, bool, type(None)) \
+            or type(value) is float and isfinite(value):
+            return repr(value)
+        name = f'_k{len(self.consts)}'
+        self.consts[name] = value
+        return name
+
+    def emit(self, line, level):
+        self.lines.append('    ' * level + line)
+
+    def local(self, node):
+        if node.slot in self.unbound:
+            return f'(G[{node.name!r}] if _{node.slot} is Unbound else _{node.slot})'
+        return f'_{node.slot}'
+
+    def operands(self, *nodes):
+        # NOTE: the bytecode evaluates operands from right to left, Python
+        #       from left to right; only translate when the order cannot matter
+        impure = [x for x in nodes if not is_pure(x)]
+        if impure and len(nodes) > 1 \
+            and not all(isinstance(x, CONSTANTS) for x in nodes if x not in impure):
+            raise Unsupported('side effects in operands')
+        return [self.expr(x) for x in nodes]
+
+    def expr(self, node):
+        if isinstance(node, Atom):
+            return self.const(node.value)
+        # NOTE: the passes that copy a tree also copy these singletons
+        if isinstance(node, type(Nil)):
+            return 'None'
+        if isinstance(node, type(True_)):
+            return 'True'
+        if isinstance(node, type(False_)):
+            return 'False'
+        if isinstance(node, LocalVar):
+            return self.local(node)
+        if isinstance(node, ClosureVar):
+            if self.layout is None or node.index is None:
+                raise Unsupported(node)
+            temp = f'_t{next(self.temps)}'
+            return f'(G[{node.name!r}] if ({temp} := closure[{node.index}].value) is Unbound else {temp})'
+        if isinstance(node, (GlobalVar, Var)) and not isinstance(node, CellVar):
+            if self.layout is not None and type(node) is Var:
+                # NOTE: only resolved lambdas are translated
+                raise Unsupported(node)
+            return f'G[{node.name!r}]'
+        if isinstance(node, SetLocal):
+            value = self.expr(node.value)
+            return f'(_{node.slot} := {value})'
+        if isinstance(node, SetClosure):
+            if node.index is None:
+                raise Unsupported(node)
+            return f'_setcell(closure[{node.index}], {self.expr(node.value)})'
+        if type(node) in (Set, Setg):
+            if type(node) is Set and self.layout is not None:
+                raise Unsupported(node)
+            return f'_setitem(G, {node.name.value!r}, {self.expr(node.value)})'
+        if isinstance(node, BINOPS):
+            left, right = self.operands(node.left, node.right)
+            op = type(node).function
+            if op in BINARY:
+                return f'({left} {BINARY[op]} {right})'
+            return f'{self.const(op)}({left}, {right})'
+        if isinstance(node, UNOPS):
+            arg, = self.operands(node.arg)
+            return f'({UNARY[type(node).function]}{arg})'
+        if isinstance(node, Cons):
+            car, cdr = self.operands(node.car, node.cdr)
+            return f'{self.const(Pair)}({car}, {cdr})'
+        if isinstance(node, Car):
+            return f'{self.expr(node.cons)}.car'
+        if isinstance(node, Cdr):
+            return f'{self.expr(node.cons)}.cdr'
+        if isinstance(node, Null):
+            return f'({self.expr(node.list)}.__class__ is not {self.const(Pair)})'
+        if isinstance(node, (Length, Reverse)):
+            return f'{self.const(LIST_FUNCTIONS[type(node)])}({self.expr(node.list)})'
+        if isinstance(node, Append):
+            left, right = self.operands(node.left, node.right)
+            return f'{self.const(append)}({left}, {right})'
+        if isinstance(node, Nth):
+            xs, index = self.operands(node.list, node.index)
+            return f'{self.const(nth)}({xs}, {index})'
+        if isinstance(node, DictNew):
+            return f'{self.const(dict_new)}({", ".join(self.operands(*node.items))})'
+        if isinstance(node, (DictGet, DictHas)):
+            d, key = self.operands(node.dict, node.key)
+            return f'{d}.get({key})' if type(node) is DictGet else f'({key} in {d})'
+        if isinstance(node, DictSet):
+            d, key, value = self.operands(node.dict, node.key, node.value)
+            return f'_setitem({d}, {key}, {value})'
+        if isinstance(node, DictKeys):
+            return f'{self.const(dict_keys)}({self.expr(node.dict)})'
+        if isinstance(node, List):
+            return f'{self.const(List.build)}({", ".join(self.operands(*node.values))})'
+        if isinstance(node, Assert):
+            cond, msg = self.operands(node.cond, node.msg)
+            return f'{self.const(check_assert)}({cond}, {msg})'
+        if isinstance(node, Parse):
+            return f'{self.const(cached_parse)}({self.expr(node.expr)})'
+        if isinstance(node, (Print, Printf, Printfs, Format, *VECTOR_FUNCS)):
+            return f'{self.const(type(node).function)}({", ".join(self.operands(*node.args))})'
+        if isinstance(node, Inline):
+            # NOTE: the arguments are bound from right to left, like for a call
+            values = [self.expr(x) for x in reversed(node.bindings)]
+            return f'({", ".join(values)}, {self.expr(node.body)})[-1]'
+        # NOTE: an if without else, an empty suite and a comment push no
+        #       value, so their value is whatever is below on the stack
+        if isinstance(node, IfElse) and node.elsebody:
+            cond, ifbody = self.expr(node.cond), self.expr(node.ifbody)
+            return f'({ifbody} if {cond} else {self.expr(node.elsebody)})'
+        if isinstance(node, Suite) and len(node.children) == 1:
+            return self.expr(node.children[0])
+        raise Unsupported(node)
+
+    def stmt(self, node, target, level, in_loop=False):
+        # NOTE: like the top of the stack, target holds the value of the
+        #       last statement that pushed one, so every statement sets it
+        #       and a statement pushing nothing leaves it as it is
+        if isinstance(node, Suite):
+            if not node.children:
+                self.emit('pass', level)
+            for child in node.children:
+                self.stmt(child, target, level, in_loop)
+        elif isinstance(node, Comment):
+            self.emit('pass', level)
+        elif isinstance(node, Ret) and isinstance(node.value, TailCall):
+            self.tail_call(node.value, level, in_loop)
+        elif isinstance(node, Ret):
+            if self.layout is None:
+                raise Unsupported(node)
+            self.emit(f'return {self.expr(node.value)}', level)
+        elif isinstance(node, TailCall):
+            self.tail_call(node, level, in_loop)
+        elif isinstance(node, While):
+            self.emit(f'while {self.expr(node.cond)}:', level)
+            self.stmt(node.body, target, level + 1, True)
+        elif isinstance(node, IfElse):
+            self.emit(f'if {self.expr(node.cond)}:', level)
+            self.stmt(node.ifbody, target, level + 1, in_loop)
+            if node.elsebody:
+                self.emit('else:', level)
+                self.stmt(node.elsebody, target, level + 1, in_loop)
+        elif isinstance(node, SetLocal):
+            value = self.expr(node.value)
+            self.emit(f'{target} = _{node.slot} = {value}' if target else f'_{node.slot} = {value}', level)
+        elif type(node) in (Set, Setg) and self.layout is None:
+            value = self.expr(node.value)
+            name = f'G[{node.name.value!r}]'
+            self.emit(f'{target} = {name} = {value}' if target else f'{name} = {value}', level)
+        else:
+            value = self.expr(node)
+            self.emit(f'{target} = {value}' if target else value, level)
+
+    def tail_call(self, node, level, in_loop):
+        # NOTE: a self tail call restarts the body with new arguments; like
+        #       PushTailFunc, it assumes the name still refers to the function
+        if type(node) is not TailCall or self.layout is None \
+            or node.name.value != self.self_name or in_loop \
+            or len(node.args) != len(self.layout.params):
+            raise Unsupported(node)
+        slots = [f'_{slot}' for slot in self.layout.param_slots]
+        self.emit(f'{", ".join(slots)}, = {", ".join(self.operands(*node.args))},', level)
+        for slot in sorted(self.unbound):
+            self.emit(f'_{slot} = Unbound', level)
+        self.emit('continue', level)
+
+    def function(self, name, body):
+        params = ''
+        if self.layout is not None:
+            self.unbound = maybe_unbound(body, self.layout)
+            params = ''.join(f', _{slot}' for slot in self.layout.param_slots)
+        self.emit(f'def {name}(closure, G{params}):', 0)
+        for slot in sorted(self.unbound):
+            self.emit(f'_{slot} = Unbound', 1)
+        loop = any(isinstance(x, TailCall) for x in nodes_of(body))
+        level = 1
+        if loop:
+            self.emit('while True:', 1)
+            level = 2
+        # NOTE: a self tail call drops the values left on the stack
+        self.emit('_rv = None', level)
+        self.stmt(body, '_rv', level)
+        # NOTE: only a return or a continue at the level of the body exits
+        if not self.lines[-1].startswith(tuple('    ' * level + x for x in ('return ', 'continue'))):
+            self.emit('return _rv', level)
+        return '\n'.join(self.lines)
+
+    def compile(self, name, body):
+        name = sub(r'\W', '_', f'native_{name}')
+        source = self.function(name, body)
+        logger.debug('native source:\n%s', source)
+        return build_native(name, source, self.consts)
+
+def compile_lambda(node, self_name=None):
+    '''
+    the Python function for a resolved Lambda, or None if it stays on the
+    frame-stack evaluator, e.g. because it makes non-tail calls
+    '''
+    if node.layout is None:
+        return None
+    try:
+        return CodeGen(node.layout, self_name).compile(self_name or 'lambda', node.body)
+    except Unsupported as e:
+        logger.info('not compiling %s: unsupported %r', self_name or 'lambda', e)
+        return None
+
+def compile_statements(statements):
+    try:
+        return CodeGen().compile('toplevel', Suite(*statements))
+    except Unsupported as e:
+        logger.info('not compiling top-level statements: unsupported %r', e)
+        return None
+
+def compile_native(tree):
+    '''
+    compile lambdas and top-level loops to Python functions: every Lambda
+    whose body can be translated gets a native function, which PushFunc
+    calls in place of a frame, and every run of translatable top-level
+    statements containing a While is replaced by a Native node; the rest,
+    in particular non-tail recursion, stays on the frame stack
+    '''
+    tree = deepcopy(tree)
+    names = {id(node.value): node.name.value for node in nodes_of(tree)
+             if type(node) in (Set, Setg) and isinstance(node.value, Lambda)}
+    for node in nodes_of(tree):
+        if isinstance(node, Lambda):
+            node.children = (*node.children[:3], compile_lambda(node, names.get(id(node))))
+    if not isinstance(tree, Suite):
+        return tree
+
+    children, run = [], []
+    def flush():
+        func = None
+        if any(isinstance(x, While) for statement in run for x in nodes_of(statement)):
+            func = compile_statements(run)
+        if func is not None:
+            children.append(Native(func, Suite(*run)))
+        else:
+            children.extend(run)
+        run.clear()
+    for statement in tree.children:
+        if any(isinstance(x, (Lambda, Call, Eval, Read, Native)) for x in nodes_of(statement)):
+            flush()
+            children.append(statement)
+        else:
+            run.append(statement)
+    flush()
+    return Suite(*children)
+
+__all__ = [
+    'compile_lambda',
+    'compile_native',
+]
@@ -1,18 +1,19 @@
 #!/usr/bin/env python3
-from .frame import Frame, Stats
+from .frame import Frame, Stats, Unbound, Namespace
+from .assembler import Code, assemble
+from .insts import link
+from .builtins import Pair, HashMap, build, length, append, reverse, nth
+from .numeric import use_numeric
 
 from itertools import count
 from logging import getLogger
 logger = getLogger(__name__)
 
-def evaluate(insts, env=None):
-    if env is None:
-        env = {}
-
-    stats = Stats()
+def evaluate_debug(insts, env, stats):
     frames = [Frame(insts, env=env, stats=stats)]
     stats.num_frames += 1
     stats.max_frame_depth = max(stats.max_frame_depth, len(frames))
+    last_frame, last_inst = None, None
     for step in count(start=1):
         if not frames:
             break
@@ -25,6 +26,9 @@ def evaluate(insts, env=None):
 
         try:
             f = frames[-1]
+            if f is last_frame:
+                f.stats.pairs[type(last_inst), type(inst)] += 1
+            last_frame, last_inst = f, inst
             logger.debug('step             = %r', step)
             logger.debug('frame            = %s', hex(id(f)))
             logger.debug('pc               = %r', f.pc)
@@ -41,6 +45,340 @@ def evaluate(insts, env=None):
             raise
     return stats
 
+def evaluate_fast(insts, env, stats):
+    frames = [Frame(insts, env=env, stats=stats)]
+    stats.num_frames += 1
+    stats.max_frame_depth = max(stats.max_frame_depth, len(frames))
+    num_insts = 0
+    try:
+        while frames:
+            # NOTE: the current frame and its instructions are only reloaded
+            #       when an instruction changes the frame stack, i.e. on
+            #       calls, returns and halts
+            frame = frames[-1]
+            insts = frame.insts
+            num = len(insts)
+            while True:
+                pc = frame.pc
+                if pc is None or not (0 <= pc < num):
+                    frames.pop()
+                    break
+                frame.pc = pc + 1
+                num_insts += 1
+                insts[pc](frames)
+                if not frames or frames[-1] is not frame:
+                    break
+    finally:
+        stats.num_insts += num_insts
+    return stats
+
+# NOTE: handlers are indexed by opcode (see assembler.OPCODES) and return
+#       a true value if they changed the frame stack
+def op_generic(frames, frame, arg, consts):
+    consts[arg](frames)
+    return not frames or frames[-1] is not frame
+
+def op_noop(frames, frame, arg, consts):
+    pass
+
+def op_push_imm(frames, frame, arg, consts):
+    frame.stack.append(consts[arg])
+
+# NOTE: the operand of variable loads is the instruction itself, which
+#       holds the inline cache
+def op_push_var(frames, frame, arg, consts):
+    frame.stack.append(consts[arg].lookup(frame))
+
+op_push_global_var = op_push_var
+
+def op_pop_var(frames, frame, arg, consts):
+    frame.env[consts[arg]] = frame.stack.pop()
+
+def op_pop_global_var(frames, frame, arg, consts):
+    frame.globals[consts[arg]] = frame.stack.pop()
+
+def op_store_var(frames, frame, arg, consts):
+    frame.env[consts[arg]] = frame.stack[-1]
+
+def op_jump_always(frames, frame, arg, consts):
+    frame.pc = arg
+
+def op_jump_if_true(frames, frame, arg, consts):
+    if frame.stack.pop():
+        frame.pc = arg
+
+def op_jump_if_false(frames, frame, arg, consts):
+    if not frame.stack.pop():
+        frame.pc = arg
+
+def op_call_py_func(frames, frame, arg, consts):
+    consts[arg](frames)
+
+def op_push_local_var(frames, frame, arg, consts):
+    name, slot = consts[arg]
+    value = frame.fastlocals[slot]
+    if value is Unbound:
+        value = frame.env[name]
+    frame.stack.append(value)
+
+def op_pop_local_var(frames, frame, arg, consts):
+    frame.fastlocals[consts[arg][1]] = frame.stack.pop()
+
+def op_store_local_var(frames, frame, arg, consts):
+    frame.fastlocals[consts[arg][1]] = frame.stack[-1]
+
+def op_push_cell_var(frames, frame, arg, consts):
+    name, slot = consts[arg]
+    value = frame.fastlocals[slot].value
+    if value is Unbound:
+        value = frame.env[name]
+    frame.stack.append(value)
+
+def op_pop_cell_var(frames, frame, arg, consts):
+    frame.fastlocals[consts[arg][1]].value = frame.stack.pop()
+
+def op_store_cell_var(frames, frame, arg, consts):
+    frame.fastlocals[consts[arg][1]].value = frame.stack[-1]
+
+def op_push_closure_var(frames, frame, arg, consts):
+    name, index = consts[arg]
+    value = frame.closure[index].value
+    if value is Unbound:
+        value = frame.env[name]
+    frame.stack.append(value)
+
+def op_pop_closure_var(frames, frame, arg, consts):
+    frame.closure[consts[arg][1]].value = frame.stack.pop()
+
+def op_store_closure_var(frames, frame, arg, consts):
+    frame.closure[consts[arg][1]].value = frame.stack[-1]
+
+def op_make_pair(frames, frame, arg, consts):
+    stack = frame.stack
+    car = stack.pop()
+    stack[-1] = Pair(car, stack[-1])
+
+# NOTE: the operand of MakeList is its count
+def op_make_list(frames, frame, arg, consts):
+    stack = frame.stack
+    rv = None
+    for value in stack[-arg:]:
+        rv = Pair(value, rv)
+    del stack[-arg:]
+    stack.append(rv)
+
+def op_pair_car(frames, frame, arg, consts):
+    stack = frame.stack
+    stack[-1] = stack[-1].car
+
+def op_pair_cdr(frames, frame, arg, consts):
+    stack = frame.stack
+    stack[-1] = stack[-1].cdr
+
+def op_is_nil(frames, frame, arg, consts):
+    stack = frame.stack
+    stack[-1] = stack[-1].__class__ is not Pair
+
+def op_list_length(frames, frame, arg, consts):
+    stack = frame.stack
+    stack[-1] = length(stack[-1])
+
+def op_list_reverse(frames, frame, arg, consts):
+    stack = frame.stack
+    stack[-1] = reverse(stack[-1])
+
+def op_list_append(frames, frame, arg, consts):
+    stack = frame.stack
+    left = stack.pop()
+    stack[-1] = append(left, stack[-1])
+
+def op_list_nth(frames, frame, arg, consts):
+    stack = frame.stack
+    xs = stack.pop()
+    stack[-1] = nth(xs, stack[-1])
+
+# NOTE: the operand of MakeHashMap is its count
+def op_make_hash_map(frames, frame, arg, consts):
+    stack = frame.stack
+    d = HashMap()
+    for _ in range(arg // 2):
+        key = stack.pop()
+        d[key] = stack.pop()
+    stack.append(d)
+
+def op_hash_map_get(frames, frame, arg, consts):
+    stack = frame.stack
+    d = stack.pop()
+    stack[-1] = d.get(stack[-1])
+
+def op_hash_map_set(frames, frame, arg, consts):
+    stack = frame.stack
+    d = stack.pop()
+    key = stack.pop()
+    d[key] = stack[-1]
+
+def op_hash_map_has(frames, frame, arg, consts):
+    stack = frame.stack
+    d = stack.pop()
+    stack[-1] = stack[-1] in d
+
+def op_hash_map_keys(frames, frame, arg, consts):
+    stack = frame.stack
+    stack[-1] = build(*stack[-1])
+
+def op_create_func(frames, frame, arg, consts):
+    consts[arg](frames)
+
+# NOTE: a call pushes the frame of the callee without going through the
+#       generic instruction, and always makes the loop reload the frame
+def op_push_func(frames, frame, arg, consts):
+    inst = consts[arg]
+    func = inst.lookup(frame)
+    if func.profile is not None:
+        func = func.profile.enter(func, frames, inst.name)
+    stats = frame.stats
+    if func.native is not None:
+        inst.call_native(frames, func)
+        return False
+    if func.layout is not None:
+        env, fastlocals = frame.globals, func.layout.bind(frame)
+    else:
+        _, env, fastlocals = inst.prepare(frames, func)
+    frames.append(Frame(func.body, env=env, stats=stats,
+                        fastlocals=fastlocals, closure=func.closures,
+                        globals=frame.globals))
+    stats.func_calls += 1
+    stats.num_frames += 1
+    if len(frames) > stats.max_frame_depth:
+        stats.max_frame_depth = len(frames)
+    return True
+
+def op_push_tail_func(frames, frame, arg, consts):
+    # NOTE: a tail call of the running function reuses the frame with pc 0,
+    #       which the loop only picks up on reload
+    consts[arg](frames)
+    return True
+
+op_push_stack_func = op_push_func
+op_push_stack_tail_func = op_push_tail_func
+
+# NOTE: the operand of PopFunc is the name of its return variable, if any
+def op_pop_func(frames, frame, arg, consts):
+    name = consts[arg]
+    rv = frame.stack.pop() if name is None else frame.env[name]
+    frames.pop()
+    if frames: frames[-1].stack.append(rv)
+    return True
+
+def op_call_native(frames, frame, arg, consts):
+    frame.stack.append(consts[arg].func(frame.closure, frame.globals))
+
+HANDLERS = [
+    op_generic,
+    op_noop,
+    op_push_imm,
+    op_push_var,
+    op_push_global_var,
+    op_pop_var,
+    op_pop_global_var,
+    op_store_var,
+    op_jump_always,
+    op_jump_if_true,
+    op_jump_if_false,
+    op_call_py_func,
+    op_push_local_var,
+    op_pop_local_var,
+    op_store_local_var,
+    op_push_cell_var,
+    op_pop_cell_var,
+    op_store_cell_var,
+    op_push_closure_var,
+    op_pop_closure_var,
+    op_store_closure_var,
+    op_make_pair,
+    op_make_list,
+    op_pair_car,
+    op_pair_cdr,
+    op_is_nil,
+    op_list_length,
+    op_list_reverse,
+    op_list_append,
+    op_list_nth,
+    op_make_hash_map,
+    op_hash_map_get,
+    op_hash_map_set,
+    op_hash_map_has,
+    op_hash_map_keys,
+    op_create_func,
+    op_push_func,
+    op_push_tail_func,
+    op_push_stack_func,
+    op_push_stack_tail_func,
+    op_pop_func,
+    op_call_native,
+]
+
+def evaluate_compact(insts, env, stats):
+    if not isinstance(insts, Code):
+        insts = assemble(insts)
+    frames = [Frame(insts, env=env, stats=stats)]
+    stats.num_frames += 1
+    stats.max_frame_depth = max(stats.max_frame_depth, len(frames))
+    handlers = HANDLERS
+    num_insts = 0
+    try:
+        while frames:
+            frame = frames[-1]
+            code = frame.insts
+            if not isinstance(code, Code):
+                # NOTE: frames pushed with raw instructions, e.g. by Evaluate
+                code = frame.insts = assemble(code)
+            ops, args, consts = code.ops, code.args, code.consts
+            num = len(ops)
+            while True:
+                pc = frame.pc
+                if pc is None or not (0 <= pc < num):
+                    frames.pop()
+                    break
+                frame.pc = pc + 1
+                num_insts += 1
+                if handlers[ops[pc]](frames, frame, args[pc], consts):
+                    break
+    finally:
+        stats.num_insts += num_insts
+    return stats
+
+ENGINES = {
+    'debug':   evaluate_debug,
+    'fast':    evaluate_fast,
+    'compact': evaluate_compact,
+}
+
+def evaluate(insts, env=None, mode='debug', numeric=None):
+    if numeric is not None:
+        # NOTE: sets the decimal context and the mode of runtime parses
+        with use_numeric(numeric):
+            return evaluate(insts, env, mode)
+    try:
+        engine = ENGINES[mode]
+    except KeyError as e:
+        raise ValueError(f'unknown evaluation mode {mode!r}') from e
+    if not isinstance(insts, Code):
+        insts = link(insts)
+    if env is None or isinstance(env, Namespace):
+        return engine(insts, Namespace() if env is None else env, Stats())
+    # NOTE: a plain dict env is copied into a Namespace for the run; copy
+    #       the globals back, so the caller sees the program's writes
+    namespace = Namespace(env)
+    try:
+        return engine(insts, namespace, Stats())
+    finally:
+        env.update(namespace)
+
 __all__ = [
     'evaluate',
+    'evaluate_debug',
+    'evaluate_fast',
+    'evaluate_compact',
+    'ENGINES',
 ]
@@ -1,4 +1,6 @@
 #!/usr/bin/env python3
+from itertools import count
+from collections import ChainMap, Counter, OrderedDict
 from logging import getLogger
 logger = getLogger(__name__)
 
@@ -7,26 +9,233 @@ class Stats:
         self.func_calls = 0
         self.num_frames = 0
         self.max_frame_depth = 0
+        # NOTE: the frames not pushed thanks to tail calls
+        self.frames_saved = 0
         self.num_insts = 0
+        self.quickened = 0
+        self.quicken_hits = 0
+        self.quicken_misses = 0
+        # NOTE: (inst type, next inst type) histogram, only gathered by the
+        #       debug engine, see optimizer.choose_fusions
+        self.pairs = Counter()
+        # NOTE: (function name, from tier, to tier, seconds) of every
+        #       promotion, see tiering.promote
+        self.transitions = []
     def __repr__(self):
-        return f'Stats(func_calls={self.func_calls!r}, num_frames={self.num_frames!r}, max_frame_depth={self.max_frame_depth!r}, num_insts={self.num_insts!r})'
+        return f'Stats(func_calls={self.func_calls!r}, num_frames={self.num_frames!r}, max_frame_depth={self.max_frame_depth!r}, frames_saved={self.frames_saved!r}, num_insts={self.num_insts!r}, quickened={self.quickened!r}, quicken_hits={self.quicken_hits!r}, quicken_misses={self.quicken_misses!r})'
+    def quicken_hit_rate(self):
+        total = self.quicken_hits + self.quicken_misses
+        return self.quicken_hits / total if total else 0.0
+
+# NOTE: versions are unique across all namespaces, so an inline cache
+#       is valid iff its version equals the version of the namespace
+versions = count(1)
+
+class Namespace(dict):
+    '''
+    the global env, which gets a new version on every mutation
+    '''
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.version = next(versions)
+    def __setitem__(self, key, value):
+        dict.__setitem__(self, key, value)
+        self.version = next(versions)
+    def __delitem__(self, key):
+        dict.__delitem__(self, key)
+        self.version = next(versions)
+    def update(self, *args, **kwargs):
+        dict.update(self, *args, **kwargs)
+        self.version = next(versions)
+    def setdefault(self, key, default=None):
+        rv = dict.setdefault(self, key, default)
+        self.version = next(versions)
+        return rv
+    def pop(self, *args):
+        rv = dict.pop(self, *args)
+        self.version = next(versions)
+        return rv
+    def popitem(self):
+        rv = dict.popitem(self)
+        self.version = next(versions)
+        return rv
+    def clear(self):
+        dict.clear(self)
+        self.version = next(versions)
+
+class Unbound:
+    def __repr__(self):
+        return 'Unbound'
+Unbound = Unbound()
+
+class ClosureCell:
+    __slots__ = 'value',
+    def __init__(self, value=Unbound):
+        self.value = value
+    def __repr__(self):
+        return f'ClosureCell({self.value!r})'
+
+class Layout:
+    '''
+    the static layout of a function's frame, computed by optimizer.resolve_scopes:
+
+    - slots: names of the slot-indexed local variables
+    - cells: names of the locals captured by nested functions; their slots
+             hold a ClosureCell shared with those functions
+    - freevars: (name, from_closure, index) of every captured variable,
+                fetched from the creating frame's closure if from_closure
+                and from its fastlocals otherwise
+    '''
+    def __init__(self, params, slots, cells=(), freevars=()):
+        self.params = tuple(params)
+        self.slots = tuple(slots)
+        self.cells = tuple(cells)
+        self.freevars = tuple(freevars)
+        self.param_slots = tuple(self.slots.index(n) for n in self.params)
+        self.cell_slots = tuple(self.slots.index(n) for n in self.cells)
+    def __repr__(self):
+        return f'Layout(params={self.params!r}, slots={self.slots!r}, cells={self.cells!r}, freevars={self.freevars!r})'
+    def bind(self, frame):
+        '''
+        pop the arguments from the caller's frame into a new list of locals
+        '''
+        fastlocals = [Unbound] * len(self.slots)
+        for slot in self.param_slots:
+            fastlocals[slot] = frame.pop()
+        for slot in self.cell_slots:
+            fastlocals[slot] = ClosureCell(fastlocals[slot])
+        return fastlocals
+    def capture(self, frame):
+        '''
+        collect the cells of the free variables from the creating frame
+        '''
+        return tuple(frame.closure[index] if from_closure else frame.fastlocals[index]
+                     for _, from_closure, index in self.freevars)
+
+class Profile:
+    '''
+    the call and back-edge counters and the current tier of a function,
+    shared by every Ufunc created by the same CreateFunc; node is the
+    Lambda it was compiled from, for re-optimization
+    '''
+    def __init__(self, node):
+        self.node = node
+        self.name = None
+        self.toplevel = None
+        self.calls = 0
+        self.backedges = 0
+        self.tier = 'baseline'
+        # NOTE: the code of a promoted function, see tiering.promote; body
+        #       is linked instructions, assembled once for the compact engine
+        self.body, self.layout, self.native = None, None, None
+        self.assembled = None
+    def __repr__(self):
+        return f'Profile(name={self.name!r}, calls={self.calls!r}, backedges={self.backedges!r}, tier={self.tier!r})'
+    def hot(self):
+        from .tiering import THRESHOLD
+        return self.tier == 'baseline' and THRESHOLD is not None \
+            and self.calls + self.backedges >= THRESHOLD
+    def enter(self, func, frames, name):
+        '''
+        count a call of func, promote it when it got hot and return func
+        with the code of the current tier
+        '''
+        self.calls += 1
+        if self.name is None:
+            self.name = name
+        if self.hot():
+            from .tiering import promote
+            promote(self, frames)
+        body = self.code(frames)
+        if body is not None and func.body is not body:
+            # NOTE: only top-level functions get resolved on promotion,
+            #       so they have no closure cells
+            closures = () if func.layout is None and self.layout is not None else func.closures
+            func.children = (func.params, body, closures, self.layout, self.native, self)
+        return func
+    def code(self, frames):
+        '''
+        the promoted body in the format of the running engine: the profile
+        outlives an evaluate() call, so the next may run another engine
+        '''
+        from .assembler import Code, assemble
+        if self.body is None or not isinstance(frames[-1].insts, Code):
+            return self.body
+        if self.assembled is None:
+            self.assembled = assemble(self.body)
+        return self.assembled
+    def backedge(self, frames):
+        self.backedges += 1
+        if self.hot():
+            from .tiering import promote
+            promote(self, frames)
+
+class LRU:
+    '''
+    a bounded memo table that evicts its least recently used entry, with
+    hit and miss counters; a maxsize of 0 disables it and None makes it
+    unbounded
+    '''
+    def __init__(self, maxsize=512):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+    def __repr__(self):
+        return f'LRU(maxsize={self.maxsize!r}, size={len(self.entries)!r}, hits={self.hits!r}, misses={self.misses!r})'
+    def __len__(self):
+        return len(self.entries)
+    def lookup(self, key, compute):
+        '''
+        the value of key, calling compute() for it on a miss
+        '''
+        entries = self.entries
+        try:
+            value = entries[key]
+        except KeyError:
+            self.misses += 1
+            value = compute()
+            if self.maxsize != 0:
+                entries[key] = value
+                self.evict()
+            return value
+        self.hits += 1
+        entries.move_to_end(key)
+        return value
+    def evict(self):
+        if self.maxsize is not None:
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+    def resize(self, maxsize):
+        self.maxsize = maxsize
+        self.evict()
+    def clear(self):
+        self.entries.clear()
+        self.hits = self.misses = 0
 
 class Frame:
-    def __init__(self, insts, pc=0, stack=None, env=None, stats=None):
-        from .nodes import Label
+    def __init__(self, insts, pc=0, stack=None, env=None, stats=None, fastlocals=None, closure=None, globals=None):
+        # NOTE: insts must be linked (see insts.link), so that jumps
+        #       carry absolute PCs rather than label names
         self.insts = insts
-        self.labels = {inst.name: idx for idx, inst in enumerate(insts)
-                       if isinstance(inst, Label)}
         self.pc = pc
         if stack is None:
             stack = []
         self.stack = stack
         if env is None:
-            env = {}
+            env = Namespace()
         self.env = env
+        if globals is None:
+            globals = env.maps[-1] if isinstance(env, ChainMap) else env
+        self.globals = globals
         if stats is None:
             stats = Stats()
         self.stats = stats
+        # NOTE: slot-indexed local variables (see optimizer.resolve_scopes);
+        #       an Unbound slot falls back to a lookup by name in env
+        self.fastlocals = fastlocals
+        # NOTE: the cells of the free variables of the running function
+        self.closure = closure
     def __iter__(self):
         self.pc = 0
         return self
@@ -44,10 +253,16 @@ class Frame:
         self.stack.append(value)
     def pop(self):
         return self.stack.pop()
-    def jump(self, label):
-        self.pc = self.labels[label]
+    def jump(self, target):
+        self.pc = target
 
 __all__ = [
     'Frame',
     'Stats',
+    'Unbound',
+    'ClosureCell',
+    'Layout',
+    'Namespace',
+    'Profile',
+    'LRU',
 ]
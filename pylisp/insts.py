@@ -1,7 +1,13 @@
 #!/usr/bin/env python3
-from .frame import Frame
+from .frame import Frame, Unbound, Profile, LRU
+
+from .builtins import Pair, HashMap, build, length, append, reverse, nth, make_range
 
 from copy import deepcopy
+from decimal import Decimal
+from textwrap import dedent
+from itertools import product
+from operator import add, sub, mul, truediv, mod, eq, ne, lt, gt, le, ge
 from collections import ChainMap
 from logging import getLogger
 logger = getLogger(__name__)
@@ -15,7 +21,7 @@ class Inst:
         return type(self)(*deepcopy(self.children, memo))
 
 class Noop(Inst):
-    def __call__(self):
+    def __call__(self, frames):
         pass
 
 class Missing(Inst):
@@ -25,15 +31,86 @@ class Missing(Inst):
     def __call__(self, frames):
         raise NotImplementedError(f'unimplemented bytecode for {self.node}')
 
+# NOTE: quickening; a CallPyFunc specializes itself after WARMUP executions
+#       and waits BACKOFF executions after a failed attempt or a deopt
+WARMUP  = 8
+BACKOFF = 64
+
 class CallPyFunc(Inst):
     def __init__(self, func, args):
         super().__init__(func, args)
+        self.warmup = WARMUP
     func = property(lambda self: self.children[0])
     args = property(lambda self: self.children[1])
     def __call__(self, frames):
-        args = [frames[-1].pop() for _ in range(self.args)]
-        rv = self.func(*args)
-        frames[-1].push(rv)
+        frame = frames[-1]
+        func, nargs = self.children
+        args = [frame.stack.pop() for _ in range(nargs)]
+        frame.stack.append(func(*args))
+        self.warmup -= 1
+        if not self.warmup:
+            self.quicken(args, frame.stats)
+    def quicken(self, args, stats):
+        cls = SPECIALIZATIONS.get((self.children[0], *(type(x) for x in args)))
+        if cls is None:
+            self.warmup = BACKOFF
+            return
+        self.__class__ = cls
+        stats.quickened += 1
+    def deopt(self, frames):
+        self.__class__ = CallPyFunc
+        self.warmup = BACKOFF
+        frames[-1].stats.quicken_misses += 1
+        self(frames)
+
+SPECIALIZATIONS = {}
+
+def create_specialized_binop(name, func, expr, type_):
+    '''
+    create a CallPyFunc specialized for two arguments of the given type,
+    which evaluates expr inline and deopts when the type guard fails
+    '''
+    code = dedent(f'''
+    def create_inst(base, {type_.__name__}):
+        class {name}(base):
+            def __call__(self, frames):
+                frame = frames[-1]
+                stack = frame.stack
+                left, right = stack[-1], stack[-2]
+                if left.__class__ is {type_.__name__} and right.__class__ is {type_.__name__}:
+                    del stack[-1]
+                    stack[-1] = {expr}
+                    frame.stats.quicken_hits += 1
+                else:
+                    self.deopt(frames)
+        return {name}
+    ''')
+    ns = {}
+    exec(code, globals(), ns)
+    cls = ns['create_inst'](CallPyFunc, type_)
+    SPECIALIZATIONS[func, type_, type_] = cls
+    return cls
+
+def create_specialized_unop(name, func, expr, type_):
+    code = dedent(f'''
+    def create_inst(base, {type_.__name__}):
+        class {name}(base):
+            def __call__(self, frames):
+                frame = frames[-1]
+                stack = frame.stack
+                arg = stack[-1]
+                if arg.__class__ is {type_.__name__}:
+                    stack[-1] = {expr}
+                    frame.stats.quicken_hits += 1
+                else:
+                    self.deopt(frames)
+        return {name}
+    ''')
+    ns = {}
+    exec(code, globals(), ns)
+    cls = ns['create_inst'](CallPyFunc, type_)
+    SPECIALIZATIONS[func, type_] = cls
+    return cls
 
 class Halt(Inst):
     def __init__(self, catch_fire=False):
@@ -49,28 +126,215 @@ class PushImm(Inst):
     def __call__(self, frames):
         frames[-1].push(self.value)
 
+class Pop(Inst):
+    '''
+    discard the value on top of the stack, e.g. that of a dead PopLocalVar
+    '''
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        frames[-1].stack.pop()
+
+# NOTE: the list instructions work on Pairs in place on the stack; the
+#       walking ones run a single Python loop, without a frame per element
+class MakePair(Inst):
+    '''
+    pop the car and replace the cdr below it with their pair
+    '''
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        car = stack.pop()
+        stack[-1] = Pair(car, stack[-1])
+
+class MakeList(Inst):
+    '''
+    replace the top count values, the first element on top, with their list
+    '''
+    def __init__(self, count):
+        super().__init__(count)
+    count = property(lambda self: self.children[0])
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        count = self.children[0]
+        rv = None
+        for value in stack[-count:]:
+            rv = Pair(value, rv)
+        del stack[-count:]
+        stack.append(rv)
+
+class PairCar(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        stack[-1] = stack[-1].car
+
+class PairCdr(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        stack[-1] = stack[-1].cdr
+
+class IsNil(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        stack[-1] = stack[-1].__class__ is not Pair
+
+class ListLength(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        stack[-1] = length(stack[-1])
+
+class ListReverse(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        stack[-1] = reverse(stack[-1])
+
+class ListAppend(Inst):
+    '''
+    pop the left list and replace the right one below it with their
+    concatenation, which copies the left list and shares the right one
+    '''
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        left = stack.pop()
+        stack[-1] = append(left, stack[-1])
+
+class ListNth(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        xs = stack.pop()
+        stack[-1] = nth(xs, stack[-1])
+
+LIST_INSTS = MakePair, MakeList, PairCar, PairCdr, IsNil, ListLength, ListReverse, ListAppend, ListNth
+
+class MakeHashMap(Inst):
+    '''
+    replace the top count values, a key on top of its value, the first key
+    on top, with their HashMap
+    '''
+    def __init__(self, count):
+        super().__init__(count)
+    count = property(lambda self: self.children[0])
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        d = HashMap()
+        for _ in range(self.children[0] // 2):
+            key = stack.pop()
+            d[key] = stack.pop()
+        stack.append(d)
+
+class HashMapGet(Inst):
+    '''
+    pop the map and replace the key below it with its value, nil if missing
+    '''
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        d = stack.pop()
+        stack[-1] = d.get(stack[-1])
+
+class HashMapSet(Inst):
+    '''
+    pop the map and the key and set it to the value below them, which
+    stays on the stack
+    '''
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        d = stack.pop()
+        key = stack.pop()
+        d[key] = stack[-1]
+
+class HashMapHas(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        d = stack.pop()
+        stack[-1] = stack[-1] in d
+
+class HashMapKeys(Inst):
+    def __init__(self):
+        super().__init__()
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        stack[-1] = build(*stack[-1])
+
+HASH_MAP_INSTS = MakeHashMap, HashMapGet, HashMapSet, HashMapHas, HashMapKeys
+
 class PushVar(Inst):
     def __init__(self, name):
         super().__init__(name)
+        # NOTE: inline cache, see frame.Namespace
+        self.version, self.value = None, None
     name = property(lambda self: self.children[0])
+    def lookup(self, frame):
+        env = frame.env
+        if env is not frame.globals:
+            return env[self.children[0]]
+        if self.version == env.version:
+            return self.value
+        self.value = env[self.children[0]]
+        self.version = env.version
+        return self.value
     def __call__(self, frames):
-        frames[-1].push(frames[-1].env[self.name])
+        frame = frames[-1]
+        frame.stack.append(self.lookup(frame))
 
 class PushGlobalVar(PushVar):
-    def __call__(self, frames):
-        frame = frames[-1]
-        if isinstance(frame.env, ChainMap):
-            frame.push(frame.env.maps[-1][self.name])
-        else:
-            frame.push(frame.env[self.name])
+    def lookup(self, frame):
+        env = frame.globals
+        if self.version == env.version:
+            return self.value
+        self.value = env[self.children[0]]
+        self.version = env.version
+        return self.value
+
+def enclosing(env, name):
+    '''
+    the local env of the nearest enclosing function binding name, or of
+    the enclosing function if none does: the env (setc name ...) sets
+    '''
+    for scope in env.maps[1:-1]:
+        if name in scope:
+            return scope
+    return env.maps[1]
 
 class PushClosureVar(PushVar):
+    # NOTE: without an index, the variable is looked up in the local env
+    #       of the enclosing function, otherwise in the cell at that index
+    #       of the running function's closure
+    def __init__(self, name, index=None):
+        Inst.__init__(self, name, index)
+    index = property(lambda self: self.children[1])
     def __call__(self, frames):
+        name, index = self.children
         frame = frames[-1]
-        if isinstance(env, ChainMap):
-            frame.push(frame.env.maps[1][self.name])
+        if index is not None:
+            value = frame.closure[index].value
+            if value is Unbound:
+                value = frame.env[name]
+            frame.stack.append(value)
+        elif isinstance(frame.env, ChainMap):
+            frame.push(enclosing(frame.env, name)[name])
         else:
-            frame.push(frame.env[self.name])
+            frame.push(frame.env[name])
 
 class PopVar(Inst):
     def __init__(self, name):
@@ -82,18 +346,21 @@ class PopVar(Inst):
 class PopGlobalVar(PopVar):
     def __call__(self, frames):
         frame = frames[-1]
-        if isinstance(frame.env, ChainMap):
-            frame.env.maps[-1][self.name] = frame.pop()
-        else:
-            frame.env[self.name] = frame.pop()
+        frame.globals[self.name] = frame.pop()
 
 class PopClosureVar(PopVar):
+    def __init__(self, name, index=None):
+        Inst.__init__(self, name, index)
+    index = property(lambda self: self.children[1])
     def __call__(self, frames):
+        name, index = self.children
         frame = frames[-1]
-        if isinstance(frame.env, ChainMap):
-            frame.env.maps[1][self.name] = frame.pop()
+        if index is not None:
+            frame.closure[index].value = frame.stack.pop()
+        elif isinstance(frame.env, ChainMap):
+            enclosing(frame.env, name)[name] = frame.pop()
         else:
-            frame.env[self.name] = frame.pop()
+            frame.env[name] = frame.pop()
 
 class StoreVar(Inst):
     def __init__(self, name):
@@ -102,6 +369,76 @@ class StoreVar(Inst):
     def __call__(self, frames):
         frames[-1].env[self.name] = frames[-1].peek()
 
+class PushLocalVar(PushVar):
+    def __init__(self, name, slot):
+        Inst.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        name, slot = self.children
+        frame = frames[-1]
+        value = frame.fastlocals[slot]
+        if value is Unbound:
+            value = frame.env[name]
+        frame.stack.append(value)
+
+class PopLocalVar(PopVar):
+    def __init__(self, name, slot):
+        Inst.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        frame = frames[-1]
+        frame.fastlocals[self.children[1]] = frame.stack.pop()
+
+class StoreLocalVar(StoreVar):
+    def __init__(self, name, slot):
+        Inst.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        frame = frames[-1]
+        frame.fastlocals[self.children[1]] = frame.stack[-1]
+
+class PushCellVar(PushVar):
+    def __init__(self, name, slot):
+        Inst.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        name, slot = self.children
+        frame = frames[-1]
+        value = frame.fastlocals[slot].value
+        if value is Unbound:
+            value = frame.env[name]
+        frame.stack.append(value)
+
+class PopCellVar(PopVar):
+    def __init__(self, name, slot):
+        Inst.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        frame = frames[-1]
+        frame.fastlocals[self.children[1]].value = frame.stack.pop()
+
+class StoreCellVar(StoreVar):
+    def __init__(self, name, slot):
+        Inst.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        frame = frames[-1]
+        frame.fastlocals[self.children[1]].value = frame.stack[-1]
+
+class StoreClosureVar(StoreVar):
+    def __init__(self, name, index=None):
+        Inst.__init__(self, name, index)
+    index = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        name, index = self.children
+        frame = frames[-1]
+        if index is not None:
+            frame.closure[index].value = frame.stack[-1]
+        elif isinstance(frame.env, ChainMap):
+            enclosing(frame.env, name)[name] = frame.peek()
+        else:
+            frame.env[name] = frame.peek()
+
 class Label(Inst):
     def __init__(self, name):
         super().__init__(name)
@@ -134,47 +471,100 @@ class JumpIfFalse(Inst):
         if not val:
             frames[-1].jump(self.label)
 
+class ProfiledJump(JumpAlways):
+    '''
+    the back-edge of a loop in the baseline body of a function, which
+    counts its executions in the function's profile
+    '''
+    def __init__(self, label, profile):
+        Inst.__init__(self, label, profile)
+    profile = property(lambda self: self.children[1])
+    def __call__(self, frames):
+        label, profile = self.children
+        profile.backedge(frames)
+        frames[-1].jump(label)
+
 class Ufunc(Inst):
-    def __init__(self, params, body, closures):
-        super().__init__(params, body, closures)
+    def __init__(self, params, body, closures, layout=None, native=None, profile=None):
+        super().__init__(params, body, closures, layout, native, profile)
     params   = property(lambda self: self.children[0])
     body     = property(lambda self: self.children[1])
     closures = property(lambda self: self.children[2])
+    layout   = property(lambda self: self.children[3])
+    native   = property(lambda self: self.children[4])
+    profile  = property(lambda self: self.children[5])
     def __call__(self, frames):
         pass
 
 class CreateFunc(Inst):
-    def __init__(self, params, body):
-        super().__init__(params, [*body, PopFunc()])
-    params = property(lambda self: self.children[0])
-    body   = property(lambda self: self.children[1])
+    def __init__(self, params, body, layout=None, native=None, profile=None):
+        # NOTE: link once here, so every call of the function
+        #       shares the same linked body
+        body = list(body)
+        if not body or not isinstance(body[-1], PopFunc):
+            body.append(PopFunc())
+        body = link(body)
+        if profile is not None:
+            # NOTE: count the back-edges of the loops for tiering
+            body = [ProfiledJump(inst.label, profile)
+                    if type(inst) is JumpAlways and inst.label < pc else inst
+                    for pc, inst in enumerate(body)]
+        super().__init__(params, body, layout, native, profile)
+    params  = property(lambda self: self.children[0])
+    body    = property(lambda self: self.children[1])
+    layout  = property(lambda self: self.children[2])
+    native  = property(lambda self: self.children[3])
+    profile = property(lambda self: self.children[4])
     def __call__(self, frames):
-        if isinstance(frames[-1].env, ChainMap):
-            closures = frames[-1].env.maps[:-1]
+        frame = frames[-1]
+        if self.profile is not None and self.profile.toplevel is None:
+            self.profile.toplevel = frame.fastlocals is None and frame.env is frame.globals
+        if self.layout is not None:
+            closures = self.layout.capture(frame)
+        elif isinstance(frame.env, ChainMap):
+            closures = frame.env.maps[:-1]
         else:
             closures = []
-        func = Ufunc(self.params, self.body, closures)
-        frames[-1].push(func)
+        func = Ufunc(self.params, self.body, closures, self.layout, self.native, self.profile)
+        frame.push(func)
 
 class PushFunc(Inst):
     def __init__(self, name):
         super().__init__(name)
+        # NOTE: inline cache, see frame.Namespace
+        self.version, self.value = None, None
     name = property(lambda self: self.children[0])
-    def prepare(self, frames):
-        func = frames[-1].env[self.name]
+    lookup = PushVar.lookup
+    def call_native(self, frames, func):
+        '''
+        run a function compiled by codegen in place, without a frame
+        '''
+        frame = frames[-1]
+        args = [frame.pop() for _ in func.params]
+        frame.push(func.native(func.closures, frame.globals, *args))
+        frame.stats.func_calls += 1
+    @staticmethod
+    def prepare(frames, func):
+        frame = frames[-1]
+        outer_env = frame.globals
+        if func.layout is not None:
+            return func, outer_env, func.layout.bind(frame)
         local_env = {}
         for n in func.params:
-            local_env[n] = frames[-1].pop()
-        outer_env = frames[-1].env
-        if isinstance(outer_env, ChainMap):
-            env = ChainMap(local_env, *func.closures, outer_env.maps[-1])
-        else:
-            env = ChainMap(local_env, *func.closures, outer_env)
-        return func, env
+            local_env[n] = frame.pop()
+        env = ChainMap(local_env, *func.closures, outer_env)
+        return func, env, None
     def __call__(self, frames):
-        func, env = self.prepare(frames)
-
-        frame = Frame(func.body, env=env, stats=frames[-1].stats)
+        func = self.lookup(frames[-1])
+        if func.profile is not None:
+            func = func.profile.enter(func, frames, self.name)
+        if func.native is not None:
+            return self.call_native(frames, func)
+        func, env, fastlocals = self.prepare(frames, func)
+
+        frame = Frame(func.body, env=env, stats=frames[-1].stats,
+                      fastlocals=fastlocals, closure=func.closures,
+                      globals=frames[-1].globals)
         frames.append(frame)
 
         # stats
@@ -185,21 +575,191 @@ class PushFunc(Inst):
 
 class PushTailFunc(PushFunc):
     def __call__(self, frames):
-        func, env = self.prepare(frames)
+        func = self.lookup(frames[-1])
+        if func.profile is not None:
+            func = func.profile.enter(func, frames, self.name)
+        if func.native is not None:
+            # NOTE: return the result, like PopFunc
+            self.call_native(frames, func)
+            frame = frames.pop()
+            if frames: frames[-1].push(frame.pop())
+            return
+        func, env, fastlocals = self.prepare(frames, func)
 
         frame = frames[-1]
-        frame.pc = 0
-        frame.env = env
+        if frame.insts is func.body:
+            # NOTE: the values left by the statements of the body are dropped,
+            #       so a loop of tail calls runs in constant stack memory
+            frame.pc = 0
+            frame.stack.clear()
+            frame.env = env
+            frame.fastlocals = fastlocals
+            frame.closure = func.closures
+        else:
+            # NOTE: a tail call of another function replaces the frame, which
+            #       also makes the engines load the instructions of its body
+            frames[-1] = Frame(func.body, env=env, stats=frame.stats,
+                               fastlocals=fastlocals, closure=func.closures,
+                               globals=frame.globals)
 
         # stats
         stats = frames[-1].stats
         stats.func_calls += 1
-        stats.num_frames += 0
+        stats.frames_saved += 1
         stats.max_frame_depth = max(stats.max_frame_depth, len(frames))
 
+class PushStackFunc(PushFunc):
+    '''
+    calls the function on top of the stack; the name is only kept for
+    debugging
+    '''
+    def lookup(self, frame):
+        return frame.pop()
+
+class PushStackTailFunc(PushTailFunc):
+    lookup = PushStackFunc.lookup
+
+class Iteration:
+    '''
+    the state of a running map, filter or fold, kept on its frame's stack
+    below the value of the call in flight
+    '''
+    __slots__ = 'func', 'rest', 'item', 'head', 'last', 'acc', 'frame'
+    def __init__(self, func, rest, acc=None):
+        self.func = func
+        self.rest = rest
+        self.item = None
+        self.head = self.last = None
+        self.acc = acc
+        self.frame = None
+    def __repr__(self):
+        return f'Iteration({self.func!r})'
+
+# NOTE: returned by Iterate.call when the function runs in a frame
+PENDING = object()
+
+class Iterate(Inst):
+    '''
+    the loop of a higher-order list form, which calls a function on every
+    element of a list: the instruction runs again when a call returns, and
+    the calls share one frame, so neither the frame stack nor the Python
+    stack grows with the list; name is that of the function, if known
+    '''
+    def __init__(self, name=None):
+        super().__init__(name)
+    name = property(lambda self: self.children[0])
+    def __call__(self, frames):
+        frame = frames[-1]
+        stack = frame.stack
+        if stack[-2].__class__ is Iteration:
+            it = stack[-2]
+            self.collect(it, stack.pop())
+        else:
+            it = self.start(stack)
+            stack.append(it)
+        while it.rest.__class__ is Pair:
+            it.item, it.rest = it.rest.car, it.rest.cdr
+            rv = self.call(frames, it, self.args(it))
+            if rv is PENDING:
+                frame.pc -= 1
+                return
+            self.collect(it, rv)
+        stack[-1] = self.finish(it)
+    def call(self, frames, it, args):
+        '''
+        the value of the function on args, or PENDING after pushing its frame
+        '''
+        func = it.func
+        if func.__class__ is not Ufunc:
+            return func(*args)
+        if len(func.params) != len(args):
+            raise TypeError(f'{self.name or "lambda"} takes {len(func.params)} arguments, not {len(args)}')
+        if func.profile is not None:
+            func = func.profile.enter(func, frames, self.name)
+        frame = frames[-1]
+        stats = frame.stats
+        stats.func_calls += 1
+        if func.native is not None:
+            return func.native(func.closures, frame.globals, *args)
+        frame.stack.extend(reversed(args))
+        func, env, fastlocals = PushFunc.prepare(frames, func)
+        callee = it.frame
+        if callee is not None and callee.insts is func.body:
+            callee.pc = 0
+            callee.stack.clear()
+            callee.env = env
+            callee.fastlocals = fastlocals
+            callee.closure = func.closures
+            stats.frames_saved += 1
+        else:
+            callee = it.frame = Frame(func.body, env=env, stats=stats,
+                                      fastlocals=fastlocals, closure=func.closures,
+                                      globals=frame.globals)
+            stats.num_frames += 1
+        frames.append(callee)
+        stats.max_frame_depth = max(stats.max_frame_depth, len(frames))
+        return PENDING
+    def append(self, it, value):
+        cell = Pair(value, None)
+        if it.last is None:
+            it.head = cell
+        else:
+            it.last.cdr = cell
+        it.last = cell
+    def start(self, stack):
+        func = stack.pop()
+        return Iteration(func, stack.pop())
+    def args(self, it):
+        return it.item,
+    def finish(self, it):
+        return it.head
+
+class MapList(Iterate):
+    '''
+    (map f xs): the list of f of every element of xs
+    '''
+    def collect(self, it, rv):
+        self.append(it, rv)
+
+class FilterList(Iterate):
+    '''
+    (filter f xs): the list of the elements of xs for which f is true
+    '''
+    def collect(self, it, rv):
+        if rv:
+            self.append(it, it.item)
+
+class FoldList(Iterate):
+    '''
+    (fold f init xs): f of the result so far and every element of xs in
+    turn, starting with init
+    '''
+    def start(self, stack):
+        func, acc = stack.pop(), stack.pop()
+        return Iteration(func, stack.pop(), acc)
+    def args(self, it):
+        return it.acc, it.item
+    def collect(self, it, rv):
+        it.acc = rv
+    def finish(self, it):
+        return it.acc
+
+class ListRange(Inst):
+    '''
+    (range stop), (range start stop) or (range start stop step): pops the
+    count arguments, the first on top, and pushes their list of numbers
+    '''
+    def __init__(self, count):
+        super().__init__(count)
+    count = property(lambda self: self.children[0])
+    def __call__(self, frames):
+        stack = frames[-1].stack
+        args = [stack.pop() for _ in range(self.children[0])]
+        stack.append(make_range(*args))
+
 class PushRawFunc(Inst):
     def __init__(self, insts, names=(), pc=0, stack=None, env=None):
-        super().__init__(insts, names, pc, stack, env)
+        super().__init__(link(insts), names, pc, stack, env)
     insts = property(lambda self: self.children[0])
     names = property(lambda self: self.children[1])
     pc    = property(lambda self: self.children[2])
@@ -212,12 +772,10 @@ class PushRawFunc(Inst):
             local_env = self.env
         for n in self.names:
             local_env[n] = frames[-1].pop()
-        outer_env = frames[-1].env
-        if isinstance(outer_env, ChainMap):
-            env = ChainMap(local_env, outer_env.maps[-1])
-        else:
-            env = ChainMap(local_env, outer_env)
-        frame = Frame(self.insts, self.pc, self.stack, env, stats=frames[-1].stats)
+        outer_env = frames[-1].globals
+        env = ChainMap(local_env, outer_env)
+        frame = Frame(self.insts, self.pc, self.stack, env, stats=frames[-1].stats,
+                      globals=outer_env)
         frames.append(frame)
 
         # stats
@@ -226,6 +784,17 @@ class PushRawFunc(Inst):
         stats.num_frames += 1
         stats.max_frame_depth = max(stats.max_frame_depth, len(frames))
 
+class CallNative(Inst):
+    '''
+    run top-level statements compiled by codegen, pushing their value
+    '''
+    def __init__(self, func):
+        super().__init__(func)
+    func = property(lambda self: self.children[0])
+    def __call__(self, frames):
+        frame = frames[-1]
+        frame.push(self.func(frame.closure, frame.globals))
+
 class PopFunc(Inst):
     def __init__(self, name=None):
         super().__init__(name)
@@ -250,13 +819,21 @@ class ReadInput(Inst):
             rv = next(stdin)
         frame.push(rv)
 
+# NOTE: the linked bytecode of the ASTs run by (eval x), by the identity
+#       of the AST, which the entry keeps alive; see COMPILE_CACHE.resize
+COMPILE_CACHE = LRU()
+
+def compile_cached(suite):
+    _, insts = COMPILE_CACHE.lookup(id(suite), lambda: (suite, link(list(suite))))
+    return insts
+
 class Evaluate(Inst):
     def __init__(self):
         super().__init__()
     def __call__(self, frames):
         frame = frames[-1]
         suite = frame.pop()
-        insts = list(suite)
+        insts = compile_cached(suite)
         # NOTE: use PushRawFunc instead of recurisve call to evaluate
         #       otherwise we will blow up Python functional call stack
         #       evaluation of bytecode should only use frames object
@@ -265,11 +842,136 @@ class Evaluate(Inst):
         #       are visible from the outside
         PushRawFunc(insts, stack=frame.stack)(frames)
 
+JUMPS = JumpAlways, JumpIfTrue, JumpIfFalse
+
+for type_ in Decimal, int, float:
+    for op, func, expr in [('Add', add, 'left + right'), ('Sub', sub, 'left - right'),
+                           ('Mul', mul, 'left * right'), ('Mod', mod, 'left % right'),
+                           ('Eq',  eq,  'left == right'), ('Ne', ne, 'left != right'),
+                           ('Lt',  lt,  'left < right'),  ('Gt', gt, 'left > right'),
+                           ('Le',  le,  'left <= right'), ('Ge', ge, 'left >= right')]:
+        create_specialized_binop(f'{op}{type_.__name__.capitalize()}', func, expr, type_)
+    if type_ is not int:
+        create_specialized_binop(f'Div{type_.__name__.capitalize()}', truediv, 'left / right', type_)
+
+class Superinst(Inst):
+    '''
+    a sequence of instructions fused into one, see optimizer.fuse_superinstructions;
+    its children are the fused instructions
+    '''
+    parts = property(lambda self: self.children)
+
+SUPERINSTRUCTIONS = {}
+
+# NOTE: the instructions pushing an operand kind and how it is loaded;
+#       the first snippet runs in __init__ with the pushing instruction
+#       as part, the second in __call__
+OPERANDS = {
+    'Imm':   ((PushImm,), '''
+             self.{x} = part.value
+             ''', '''
+             {x} = self.{x}
+             '''),
+    'Local': ((PushLocalVar,), '''
+             self.{x} = part.children
+             ''', '''
+             name, slot = self.{x}
+             {x} = frame.fastlocals[slot]
+             if {x} is Unbound:
+                 {x} = frame.env[name]
+             '''),
+    'Var':   ((PushVar, PushGlobalVar), '''
+             self.{x} = part
+             ''', '''
+             {x} = self.{x}.lookup(frame)
+             '''),
+}
+
+# NOTE: what is done with the result of the call
+SINKS = {
+    None:        '''
+                   frame.stack.append(rv)
+                   ''',
+    JumpIfFalse: '''
+                   if not rv:
+                       frame.pc = self.sink.label
+                   ''',
+    JumpIfTrue:  '''
+                   if rv:
+                       frame.pc = self.sink.label
+                   ''',
+    PopLocalVar: '''
+                   frame.fastlocals[self.sink.slot] = rv
+                   ''',
+}
+
+def create_superinst(name, left, right, sink):
+    '''
+    create a Superinst for a push of the right and the left operand of a
+    binary CallPyFunc, the call itself and optionally the instruction
+    consuming its result
+    '''
+    def indent(snippet, x, level):
+        return dedent(snippet).strip().format(x=x).replace('\n', '\n' + ' ' * level)
+    code = dedent(f'''
+    def create_inst(base):
+        class {name}(base):
+            def __init__(self, *parts):
+                super().__init__(*parts)
+                part = parts[0]
+                {indent(OPERANDS[right][1], 'right', 16)}
+                part = parts[1]
+                {indent(OPERANDS[left][1], 'left', 16)}
+                self.func = parts[2].func
+                self.sink = parts[3] if len(parts) > 3 else None
+            def __call__(self, frames):
+                frame = frames[-1]
+                {indent(OPERANDS[left][2], 'left', 16)}
+                {indent(OPERANDS[right][2], 'right', 16)}
+                rv = self.func(left, right)
+                {indent(SINKS[sink], None, 16)}
+        return {name}
+    ''')
+    ns = {}
+    exec(code, globals(), ns)
+    return ns['create_inst'](Superinst)
+
+for left, right, sink in product(OPERANDS, OPERANDS, SINKS):
+    name = f'Binop{left}{right}{sink.__name__ if sink else ""}'
+    cls = create_superinst(name, left, right, sink)
+    for left_type, right_type in product(OPERANDS[left][0], OPERANDS[right][0]):
+        pattern = right_type, left_type, CallPyFunc, *([sink] if sink else [])
+        SUPERINSTRUCTIONS[pattern] = cls
+
+def link(insts):
+    '''
+    resolve label names to absolute PCs and drop the Label instructions;
+    linking linked instructions is a no-op
+    '''
+    labels, pc = {}, 0
+    for inst in insts:
+        if isinstance(inst, Label):
+            labels[inst.name] = pc
+        else:
+            pc += 1
+    if not labels:
+        return insts
+    return [type(inst)(labels[inst.label], *inst.children[1:]) if isinstance(inst, JUMPS) else inst
+            for inst in insts if not isinstance(inst, Label)]
+
 __all__ = [
     'Inst', 'Noop', 'Missing', 'CallPyFunc', 'Halt',
-    'PushImm', 'PushVar', 'PopVar', 'StoreVar', 'Label',
+    'PushImm', 'Pop', 'PushVar', 'PopVar', 'StoreVar', 'Label',
+    'MakePair', 'MakeList', 'PairCar', 'PairCdr', 'IsNil',
+    'ListLength', 'ListReverse', 'ListAppend', 'ListNth', 'LIST_INSTS',
+    'MakeHashMap', 'HashMapGet', 'HashMapSet', 'HashMapHas', 'HashMapKeys', 'HASH_MAP_INSTS',
     'PushClosureVar', 'PopClosureVar', 'PushGlobalVar', 'PopGlobalVar',
-    'JumpAlways', 'JumpIfTrue', 'JumpIfFalse', 'Ufunc',
-    'CreateFunc', 'PushFunc', 'PushTailFunc', 'PushRawFunc', 'PopFunc',
-    'ReadInput', 'Evaluate',
+    'PushLocalVar', 'PopLocalVar', 'StoreLocalVar',
+    'PushCellVar', 'PopCellVar', 'StoreCellVar', 'StoreClosureVar',
+    'JumpAlways', 'JumpIfTrue', 'JumpIfFalse', 'ProfiledJump', 'Ufunc',
+    'CreateFunc', 'PushFunc', 'PushTailFunc', 'PushStackFunc', 'PushStackTailFunc',
+    'PushRawFunc', 'CallNative', 'PopFunc',
+    'Iteration', 'Iterate', 'MapList', 'FilterList', 'FoldList', 'ListRange',
+    'ReadInput', 'Evaluate', 'COMPILE_CACHE', 'JUMPS', 'link',
+    'Superinst', 'SUPERINSTRUCTIONS',
 ]
@@ -1,11 +1,15 @@
 #!/usr/bin/env python3
 from .insts import *
-from .parser import parse
+from .insts import enclosing
+from .parser import parse, cached_parse
+from .builtins import Pair, HashMap, build, is_nil, length, append, reverse, nth, make_range, builtin
+from .numeric import current_numeric
+from .vector import Vector, make_vector, vector_fill, list_to_vector, vector_to_list, vector_ref, vector_slice, vector_length, vector_sum
+from .frame import Profile
 
 from re import compile, escape
-from decimal import Decimal
 from textwrap import indent, dedent
-from collections import defaultdict, Iterable, ChainMap
+from collections import defaultdict, ChainMap
 from functools import wraps
 from itertools import count
 from copy import deepcopy
@@ -81,79 +85,36 @@ class Node:
         yield Missing(self)
     @classmethod
     def parse(cls, tree):
-        NUM_RE = compile(r'(?:\+|-)?\d*\.?\d*')
         if not isinstance(tree, list):
-            if NUM_RE.fullmatch(tree):
-                return Atom(Decimal(tree))
-            if tree.startswith('"') and tree.endswith('"'):
-                return Atom(literal_eval(tree))
-            if tree == 'nil':
-                return Nil
-            if tree == 'true':
-                return True_
-            return Var(tree)
-            if tree == 'false':
-                return False_
-        if all(isinstance(x, list) for x in tree):
-            return Suite.parse(tree)
-        if tree[0] == 'set':
-            return Set.parse(tree)
-        if tree[0] == 'setg':
-            return Setg.parse(tree)
-        if tree[0] == 'setc':
-            return Setc.parse(tree)
-        if tree[0] == 'ret':
-            return Ret.parse(tree)
-        if tree[0] == 'lambda':
-            return Lambda.parse(tree)
-        comparisons = {'==': Eq, '<>': Ne, '<': Lt, '>': Gt, '<=': Le, '>=': Ge,}
-        if tree[0] in comparisons:
-            return comparisons[tree[0]].parse(tree)
-        ops = {'+': {1: Pos, 2: Add},
-               '-': {1: Neg, 2: Sub},
-               '*': {2: Mul}, '/': {2: Div}, '%': {2: Mod}, '**': {2: Pow},
-               'and': {2: And}, 'or': {2: Or}, 'not': {1: Not}, 'xor': {2: Xor}}
-        if tree[0] in ops:
-            return ops[tree[0]][len(tree[1:])].parse(tree)
-        pyfuncs = {'print': Print, 'printf': Printf, 'printfs': Printfs, 'format': Format}
-        if tree[0] in pyfuncs:
-            return pyfuncs[tree[0]].parse(tree)
-        if tree[0] == 'assert':
-            return Assert.parse(tree)
-        if tree[0] == 'list':
-            return List.parse(tree)
-        if tree[0] == 'cons':
-            return Cons.parse(tree)
-        if tree[0] == 'car':
-            return Car.parse(tree)
-        if tree[0] == 'cdr':
-            return Cdr.parse(tree)
-        if tree[0] == 'if':
-            return IfElse.parse(tree)
-        if tree[0] == 'while':
-            return While.parse(tree)
-        if tree[0] == 'parse':
-            return Parse.parse(tree)
-        if tree[0] == 'quoted':
-            return Atom(Node.parse(tree[1]))
-        if tree[0] == 'eval':
-            return Eval.parse(tree)
-        if tree[0] == 'read':
-            return Read.parse(tree)
-        if len(tree) == 1:
-            if tree[0].startswith('^'):
-                tree[0] = tree[0][1:]
+            return parse_atom(tree)
+        head = tree[0] if tree else None
+        if type(head) is str:
+            form = SPECIAL_FORMS.get(head)
+            if form is not None:
+                return form(tree)
+            if head.startswith('^'):
+                tree[0] = head[1:]
                 return TailCall.parse(tree)
             return Call.parse(tree)
-        if isinstance(tree[0], str):
-            if len(tree) > 1:
-                if tree[0].startswith('^'):
-                    tree[0] = tree[0][1:]
-                    return TailCall.parse(tree)
-                return Call.parse(tree)
-            return Var(tree[0])
+        if all(isinstance(x, list) for x in tree):
+            return Suite.parse(tree)
         return NotImplemented.parse(tree)
 
+NUM_RE = compile(r'(?:\+|-)?\d*\.?\d*')
+
+def parse_atom(token):
+    if NUM_RE.fullmatch(token):
+        return Atom(current_numeric()(token))
+    if token.startswith('"') and token.endswith('"'):
+        if len(token) > 1 and '\\' not in token:
+            # NOTE: only escapes need literal_eval
+            return Atom(token[1:-1])
+        return Atom(literal_eval(token))
+    constant = CONSTANTS.get(token)
+    if constant is not None:
+        return constant
+    return Var(token)
+
 class NotImplemented(Node):
     @classmethod
     def parse(cls, tree):
@@ -199,6 +160,24 @@ class Set(Node):
         yield PopVar(self.name.value)
         yield PushVar(self.name.value)
 
+class SetLocal(Set):
+    def __init__(self, name, value, slot):
+        Node.__init__(self, name, value, slot)
+    slot = property(lambda self: self.children[2])
+    def __iter__(self):
+        yield from self.value
+        yield PopLocalVar(self.name.value, self.slot)
+        yield PushLocalVar(self.name.value, self.slot)
+
+class SetCell(Set):
+    def __init__(self, name, value, slot):
+        Node.__init__(self, name, value, slot)
+    slot = property(lambda self: self.children[2])
+    def __iter__(self):
+        yield from self.value
+        yield PopCellVar(self.name.value, self.slot)
+        yield PushCellVar(self.name.value, self.slot)
+
 class Setg(Node):
     @debug
     def __call__(self, env):
@@ -226,7 +205,7 @@ class Setc(Node):
     def __call__(self, env):
         name, value = self.name(env), self.value(env)
         if isinstance(env, ChainMap):
-            env.maps[1][name.value] = value
+            enclosing(env, name.value)[name.value] = value
         else:
             env[name.value] = value
         return value
@@ -243,6 +222,15 @@ class Setc(Node):
         yield PopClosureVar(self.name.value)
         yield PushClosureVar(self.name.value)
 
+class SetClosure(Setc):
+    def __init__(self, name, value, index):
+        Node.__init__(self, name, value, index)
+    index = property(lambda self: self.children[2])
+    def __iter__(self):
+        yield from self.value
+        yield PopClosureVar(self.name.value, self.index)
+        yield PushClosureVar(self.name.value, self.index)
+
 class Ret(Node):
     @debug
     def __call__(self, env):
@@ -261,12 +249,7 @@ class Ret(Node):
 class List(Node):
     @debug
     def __call__(self, env):
-        values = [val(env) for val in self.values]
-        values.reverse()
-        rv = Cell(values[0], Nil)
-        for v in values[1:]:
-            rv = Cell(v, rv)
-        return rv
+        return build(*[val(env) for val in self.values], tail=Nil)
     def __init__(self, car, *cdr):
         super().__init__(car, *cdr)
     values = property(lambda self: self.children)
@@ -274,18 +257,11 @@ class List(Node):
     def parse(cls, tree):
         _, *tree = tree
         return cls(*[Node.parse(x) for x in tree])
-    @staticmethod
-    def build(*vals):
-        values = [v for v in vals]
-        values.reverse()
-        rv = values[0], None
-        for v in values[1:]:
-            rv = v, rv
-        return rv
+    build = staticmethod(build)
     def __iter__(self):
         for val in reversed(self.values):
             yield from val
-        yield CallPyFunc(self.build, len(self.values))
+        yield MakeList(len(self.values))
 
 class Params(Node):
     def __call__(self, env):
@@ -302,7 +278,7 @@ class Cons(Node):
     @debug
     def __call__(self, env):
         car, cdr = self.car(env), self.cdr(env)
-        return Cell(car, cdr)
+        return Pair(car, cdr)
     def __init__(self, car, cdr):
         super().__init__(car, cdr)
     car = property(lambda self: self.children[0])
@@ -314,7 +290,7 @@ class Cons(Node):
     def __iter__(self):
         yield from self.cdr
         yield from self.car
-        yield CallPyFunc(lambda car, cdr: (car, cdr), 2)
+        yield MakePair()
 
 class Car(Node):
     @debug
@@ -329,7 +305,7 @@ class Car(Node):
         return cls(Node.parse(cons))
     def __iter__(self):
         yield from self.cons
-        yield CallPyFunc(lambda x: x[0], 1)
+        yield PairCar()
 
 class Cdr(Node):
     @debug
@@ -344,21 +320,255 @@ class Cdr(Node):
         return cls(Node.parse(cons))
     def __iter__(self):
         yield from self.cons
-        yield CallPyFunc(lambda x: x[1], 1)
+        yield PairCdr()
 
-class Cell(Node):
+class Null(Node):
     @debug
     def __call__(self, env):
-        return self
-    def __init__(self, car, cdr):
-        super().__init__(car, cdr)
-    car   = property(lambda self: self.children[0])
-    cdr   = property(lambda self: self.children[1])
-    value = property(lambda self: (self.car.value, self.cdr.value))
+        return Atom(is_nil(self.list(env)))
+    def __init__(self, list):
+        super().__init__(list)
+    list = property(lambda self: self.children[0])
+    @classmethod
+    def parse(cls, tree):
+        _, list = tree
+        return cls(Node.parse(list))
+    def __iter__(self):
+        yield from self.list
+        yield IsNil()
+
+class Length(Node):
+    @debug
+    def __call__(self, env):
+        return Atom(length(self.list(env)))
+    def __init__(self, list):
+        super().__init__(list)
+    list = property(lambda self: self.children[0])
+    @classmethod
+    def parse(cls, tree):
+        _, list = tree
+        return cls(Node.parse(list))
+    def __iter__(self):
+        yield from self.list
+        yield ListLength()
+
+class Reverse(Node):
+    @debug
+    def __call__(self, env):
+        return reverse(self.list(env))
+    def __init__(self, list):
+        super().__init__(list)
+    list = property(lambda self: self.children[0])
+    @classmethod
+    def parse(cls, tree):
+        _, list = tree
+        return cls(Node.parse(list))
+    def __iter__(self):
+        yield from self.list
+        yield ListReverse()
+
+class Append(Node):
+    @debug
+    def __call__(self, env):
+        left, right = self.left(env), self.right(env)
+        return append(left, right)
+    def __init__(self, left, right):
+        super().__init__(left, right)
+    left  = property(lambda self: self.children[0])
+    right = property(lambda self: self.children[1])
+    @classmethod
+    def parse(cls, tree):
+        _, left, right = tree
+        return cls(Node.parse(left), Node.parse(right))
+    def __iter__(self):
+        yield from self.right
+        yield from self.left
+        yield ListAppend()
+
+class Nth(Node):
+    @debug
+    def __call__(self, env):
+        list, index = self.list(env), self.index(env)
+        return nth(list, index.value)
+    def __init__(self, list, index):
+        super().__init__(list, index)
+    list  = property(lambda self: self.children[0])
+    index = property(lambda self: self.children[1])
+    @classmethod
+    def parse(cls, tree):
+        _, list, index = tree
+        return cls(Node.parse(list), Node.parse(index))
+    def __iter__(self):
+        yield from self.index
+        yield from self.list
+        yield ListNth()
+
+def function_of(node, env):
+    # NOTE: in the tree-walker, a variable evaluates to a call of its value
+    return env[node.name] if isinstance(node, Var) else node(env)
+
+def elements(xs):
+    # NOTE: the tree-walker ends a list in the Nil node
+    return xs if xs.__class__ is Pair else ()
+
+class Map(Node):
+    @debug
+    def __call__(self, env):
+        func = function_of(self.func, env)
+        return build(*[func(x)(env) for x in elements(self.list(env))], tail=Nil)
+    def __init__(self, func, list):
+        super().__init__(func, list)
+    func = property(lambda self: self.children[0])
+    list = property(lambda self: self.children[1])
+    @classmethod
+    def parse(cls, tree):
+        _, func, list = tree
+        return cls(Node.parse(func), Node.parse(list))
+    def __iter__(self):
+        yield from self.list
+        yield from self.func
+        yield MapList(self.func.name if isinstance(self.func, Var) else None)
+
+class Filter(Map):
+    @debug
+    def __call__(self, env):
+        func = function_of(self.func, env)
+        return build(*[x for x in elements(self.list(env)) if func(x)(env).value], tail=Nil)
+    def __iter__(self):
+        yield from self.list
+        yield from self.func
+        yield FilterList(self.func.name if isinstance(self.func, Var) else None)
+
+class Fold(Node):
+    @debug
+    def __call__(self, env):
+        func, acc = function_of(self.func, env), self.init(env)
+        for x in elements(self.list(env)):
+            acc = func(acc, x)(env)
+        return acc
+    def __init__(self, func, init, list):
+        super().__init__(func, init, list)
+    func = property(lambda self: self.children[0])
+    init = property(lambda self: self.children[1])
+    list = property(lambda self: self.children[2])
+    @classmethod
+    def parse(cls, tree):
+        _, func, init, list = tree
+        return cls(Node.parse(func), Node.parse(init), Node.parse(list))
+    def __iter__(self):
+        yield from self.list
+        yield from self.init
+        yield from self.func
+        yield FoldList(self.func.name if isinstance(self.func, Var) else None)
+
+class Range(Node):
+    @debug
+    def __call__(self, env):
+        args = [arg(env).value for arg in self.args]
+        return build(*[Atom(x) for x in make_range(*args) or ()], tail=Nil)
+    def __init__(self, *args):
+        super().__init__(*args)
+    args = property(lambda self: self.children)
+    @classmethod
+    def parse(cls, tree):
+        _, *args = tree
+        if not 1 <= len(args) <= 3:
+            raise ProgramError(f'range takes 1 to 3 arguments, not {len(args)}')
+        return cls(*[Node.parse(x) for x in args])
+    def __iter__(self):
+        for arg in reversed(self.args):
+            yield from arg
+        yield ListRange(len(self.args))
+
+# NOTE: in the tree-walker, the keys of a HashMap are values and its
+#       values are nodes, like the elements of a Pair
+class DictNew(Node):
+    @debug
+    def __call__(self, env):
+        items = [x(env) for x in self.items]
+        return HashMap(zip([k.value for k in items[::2]], items[1::2]))
+    def __init__(self, *items):
+        super().__init__(*items)
+    items = property(lambda self: self.children)
+    @classmethod
+    def parse(cls, tree):
+        _, *items = tree
+        if len(items) % 2:
+            raise ProgramError('dict-new takes keys and values in pairs')
+        return cls(*[Node.parse(x) for x in items])
+    def __iter__(self):
+        for item in reversed(self.items):
+            yield from item
+        yield MakeHashMap(len(self.items))
+
+class DictGet(Node):
+    @debug
+    def __call__(self, env):
+        d, key = self.dict(env), self.key(env)
+        return d.get(key.value, Nil)
+    def __init__(self, dict, key):
+        super().__init__(dict, key)
+    dict = property(lambda self: self.children[0])
+    key  = property(lambda self: self.children[1])
+    @classmethod
+    def parse(cls, tree):
+        _, dict, key = tree
+        return cls(Node.parse(dict), Node.parse(key))
+    def __iter__(self):
+        yield from self.key
+        yield from self.dict
+        yield HashMapGet()
+
+class DictHas(DictGet):
+    @debug
+    def __call__(self, env):
+        d, key = self.dict(env), self.key(env)
+        return Atom(key.value in d)
+    def __iter__(self):
+        yield from self.key
+        yield from self.dict
+        yield HashMapHas()
+
+class DictSet(Node):
+    @debug
+    def __call__(self, env):
+        d, key, value = self.dict(env), self.key(env), self.value(env)
+        d[key.value] = value
+        return value
+    def __init__(self, dict, key, value):
+        super().__init__(dict, key, value)
+    dict  = property(lambda self: self.children[0])
+    key   = property(lambda self: self.children[1])
+    value = property(lambda self: self.children[2])
+    @classmethod
+    def parse(cls, tree):
+        _, dict, key, value = tree
+        return cls(Node.parse(dict), Node.parse(key), Node.parse(value))
+    def __iter__(self):
+        yield from self.value
+        yield from self.key
+        yield from self.dict
+        yield HashMapSet()
+
+class DictKeys(Node):
+    @debug
+    def __call__(self, env):
+        return build(*[Atom(k) for k in self.dict(env)], tail=Nil)
+    def __init__(self, dict):
+        super().__init__(dict)
+    dict = property(lambda self: self.children[0])
+    @classmethod
+    def parse(cls, tree):
+        _, dict = tree
+        return cls(Node.parse(dict))
+    def __iter__(self):
+        yield from self.dict
+        yield HashMapKeys()
 
 class ProgramError(Exception):
     pass
 
+@builtin('assert')
 def check_assert(cond, msg):
     if not cond:
         raise ProgramError(msg)
@@ -388,6 +598,7 @@ def create_binop(name, op):
     code = dedent(f'''
     def create_op(op):
         class {name}(Node):
+            function = staticmethod(op)
             @debug
             def __call__(self, env):
                 left, right = self.left(env), self.right(env)
@@ -409,13 +620,14 @@ def create_binop(name, op):
     ''')
     ns = {}
     exec(code, globals(), ns)
-    return ns['create_op'](op)
+    return ns['create_op'](builtin(name.lower(), op))
 
 def create_unop(name, op):
     # XXX
     code = dedent(f'''
     def create_op(op):
         class {name}(Node):
+            function = staticmethod(op)
             @debug
             def __call__(self, env):
                 arg = self.arg(env)
@@ -435,13 +647,16 @@ def create_unop(name, op):
     ''')
     ns = {}
     exec(code, globals(), ns)
-    return ns['create_op'](op)
+    return ns['create_op'](builtin(name.lower(), op))
 
 from operator import pos, neg
 Pos = create_unop('Pos', pos)
 Neg = create_unop('Neg', neg)
 
-UNOPS = Pos, Neg
+from operator import not_
+Not = create_unop('Not', not_)
+
+UNOPS = Pos, Neg, Not
 
 from operator import eq, ne, lt, gt, le, ge
 Eq = create_binop('Eq', eq)
@@ -459,19 +674,19 @@ Div = create_binop('Div', truediv)
 Mod = create_binop('Mod', mod)
 Pow = create_binop('Pow', pow)
 
-from operator import and_, or_, not_, xor, is_
+from operator import and_, or_, xor, is_
 And = create_binop('And', and_)
 Or  = create_binop('Or',  or_)
-Not = create_binop('Not', not_)
 Xor = create_binop('Xor', xor)
 Is  = create_binop('Is',  is_)
 
-BINOPS = Eq, Ne, Lt, Gt, Le, Ge, Add, Sub, Mul, Div, Mod, Pow, And, Or, Not, Xor, Is
+BINOPS = Eq, Ne, Lt, Gt, Le, Ge, Add, Sub, Mul, Div, Mod, Pow, And, Or, Xor, Is
 
 def create_pyfunc(name, func):
     code = dedent(f'''
     def create_func(func):
         class {name}(Node):
+            function = staticmethod(func)
             @debug
             def __call__(self, env):
                 args = [arg(env) for arg in self.args]
@@ -493,13 +708,39 @@ def create_pyfunc(name, func):
     ''')
     ns = {}
     exec(code, globals(), ns)
-    return ns['create_func'](func)
+    return ns['create_func'](builtin(name.lower(), func))
 
 Print   = create_pyfunc('Print',   lambda *args: print(*args, flush=True))
 Format  = create_pyfunc('Format',  format)
 Printf  = create_pyfunc('Printf',  lambda fmt, *args:      print(fmt.format(*args), end='', flush=True))
 Printfs = create_pyfunc('Printfs', lambda fmt, sep, *args: print(fmt.format(*args), sep=sep, end='', flush=True))
 
+MakeVector   = create_pyfunc('MakeVector',   make_vector)
+VectorFill   = create_pyfunc('VectorFill',   vector_fill)
+ListToVector = create_pyfunc('ListToVector', list_to_vector)
+VectorRef    = create_pyfunc('VectorRef',    vector_ref)
+VectorSlice  = create_pyfunc('VectorSlice',  vector_slice)
+VectorLength = create_pyfunc('VectorLength', vector_length)
+VectorSum    = create_pyfunc('VectorSum',    vector_sum)
+
+class VectorToList(Node):
+    @debug
+    def __call__(self, env):
+        values = vector_to_list(self.vector(env).value)
+        return build(*[Atom(x) for x in elements(values)], tail=Nil)
+    def __init__(self, vector):
+        super().__init__(vector)
+    vector = property(lambda self: self.children[0])
+    @classmethod
+    def parse(cls, tree):
+        _, vector = tree
+        return cls(Node.parse(vector))
+    def __iter__(self):
+        yield from self.vector
+        yield CallPyFunc(builtin('vectortolist', vector_to_list), 1)
+
+VECTOR_FUNCS = MakeVector, VectorFill, ListToVector, VectorRef, VectorSlice, VectorLength, VectorSum
+
 class Name(Node):
     @debug
     def __call__(self, env):
@@ -526,6 +767,31 @@ class Var(Node):
     def __iter__(self):
         yield PushVar(self.name)
 
+class LocalVar(Var):
+    def __init__(self, name, slot):
+        Node.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __iter__(self):
+        yield PushLocalVar(self.name, self.slot)
+
+class CellVar(Var):
+    def __init__(self, name, slot):
+        Node.__init__(self, name, slot)
+    slot = property(lambda self: self.children[1])
+    def __iter__(self):
+        yield PushCellVar(self.name, self.slot)
+
+class ClosureVar(Var):
+    def __init__(self, name, index):
+        Node.__init__(self, name, index)
+    index = property(lambda self: self.children[1])
+    def __iter__(self):
+        yield PushClosureVar(self.name, self.index)
+
+class GlobalVar(Var):
+    def __iter__(self):
+        yield PushGlobalVar(self.name)
+
 class Atom(Node):
     @debug
     def __call__(self, env):
@@ -649,6 +915,56 @@ class TailCall(Call):
             yield from arg
         yield PushTailFunc(self.name.value)
 
+class StackCall(Call):
+    '''
+    a call of a function held in a local or closure variable, whose
+    resolved variable node takes the place of the name
+    '''
+    @debug
+    def __call__(self, env):
+        args = [arg(env) for arg in self.args]
+        try:
+            node = env[self.name.name](*args)
+        except KeyError as e:
+            raise ProgramError(f'unknown name {self.name.name!r}') from e
+        return node(env)
+    def __iter__(self):
+        for arg in reversed(self.args):
+            yield from arg
+        yield from self.name
+        yield PushStackFunc(self.name.name)
+
+class StackTailCall(StackCall):
+    def __iter__(self):
+        for arg in reversed(self.args):
+            yield from arg
+        yield from self.name
+        yield PushStackTailFunc(self.name.name)
+
+class Inline(Node):
+    '''
+    the body of an inlined function, evaluated after its bindings, the Sets
+    of its renamed parameters to the arguments; see optimizer.inline_functions
+    '''
+    @debug
+    def __call__(self, env):
+        for binding in reversed(self.bindings):
+            binding(env)
+        return self.body(env)
+    def __init__(self, name, body, *bindings):
+        super().__init__(name, body, *bindings)
+    name     = property(lambda self: self.children[0])
+    body     = property(lambda self: self.children[1])
+    bindings = property(lambda self: self.children[2:])
+    def __iter__(self):
+        # NOTE: like for a call, the arguments are evaluated from right to
+        #       left and leave nothing on the stack, so a binding is its Set
+        #       without the final push of the value
+        for binding in reversed(self.bindings):
+            *insts, _ = binding
+            yield from insts
+        yield from self.body
+
 class UfuncBase(Node):
     # XXX
     pass
@@ -681,16 +997,33 @@ class Lambda(Node):
             args  = property(lambda self: self.children)
             value = property(lambda self: self)
         return Ufunc
-    def __init__(self, params, body):
-        super().__init__(params, body)
+    def __init__(self, params, body, layout=None, native=None):
+        super().__init__(params, body, layout, native)
     params = property(lambda self: self.children[0])
     body   = property(lambda self: self.children[1])
+    layout = property(lambda self: self.children[2])
+    native = property(lambda self: self.children[3])
     @classmethod
     def parse(cls, tree):
         _, params, body = tree
         return cls(Params.parse(params), Node.parse(body))
     def __iter__(self):
-        yield CreateFunc(self.params.value, self.body)
+        yield CreateFunc(self.params.value, self.body, self.layout, self.native, Profile(self))
+
+class Native(Node):
+    '''
+    statements compiled to a Python function by codegen.compile_native;
+    the tree-walker evaluates the original statements
+    '''
+    @debug
+    def __call__(self, env):
+        return self.node(env)
+    def __init__(self, func, node):
+        super().__init__(func, node)
+    func = property(lambda self: self.children[0])
+    node = property(lambda self: self.children[1])
+    def __iter__(self):
+        yield CallNative(self.func)
 
 class Read(Node):
     @debug
@@ -712,7 +1045,7 @@ class Parse(Node):
     def __call__(self, env):
         expr = self.expr
         code = expr(env).value
-        node = parse(code)
+        node = cached_parse(code)
         return Atom(node)
     def __init__(self, expr):
         super().__init__(expr)
@@ -722,8 +1055,11 @@ class Parse(Node):
         _, expr = tree
         return cls(Node.parse(expr))
     def __iter__(self):
+        # NOTE: not folded for a constant string, which would be read in
+        #       the numeric mode of compile time; cached_parse memoizes it
+        #       by the mode of the run instead
         yield from self.expr
-        yield CallPyFunc(parse, 1)
+        yield CallPyFunc(cached_parse, 1)
 
 class Eval(Node):
     @debug
@@ -742,16 +1078,73 @@ class Eval(Node):
         yield from self.expr
         yield Evaluate()
 
+# NOTE: the parser of every special form and builtin, by the head of its
+#       list, e.g. SPECIAL_FORMS['set'] is Set.parse; any other list with a
+#       name at its head is a call
+SPECIAL_FORMS = {}
+
+def special_form(head, form=None):
+    '''
+    register form to parse the lists starting with head: a Node subclass,
+    whose parse classmethod is used, or a function of the list; e.g.
+    special_form('square', create_pyfunc('Square', lambda x: x * x))
+    or @special_form(head) as a class decorator
+    '''
+    if form is None:
+        return lambda form: special_form(head, form)
+    SPECIAL_FORMS[head] = form.parse if isinstance(form, type) else form
+    return form
+
+def by_arity(arities):
+    '''
+    a form parsed by the class for its number of arguments, e.g. (- x) by
+    Neg and (- x y) by Sub with by_arity({1: Neg, 2: Sub})
+    '''
+    def parse(tree):
+        return arities[len(tree) - 1].parse(tree)
+    return parse
+
+def parse_quoted(tree):
+    return Atom(Node.parse(tree[1]))
+
+CONSTANTS = {'nil': Nil, 'true': True_, 'false': False_}
+
+for head, form in {
+    'set': Set, 'setg': Setg, 'setc': Setc, 'ret': Ret, 'lambda': Lambda,
+    '==': Eq, '<>': Ne, '<': Lt, '>': Gt, '<=': Le, '>=': Ge,
+    '+': by_arity({1: Pos, 2: Add}), '-': by_arity({1: Neg, 2: Sub}),
+    '*': Mul, '/': Div, '%': Mod, '**': Pow,
+    'and': And, 'or': Or, 'not': Not, 'xor': Xor,
+    'print': Print, 'printf': Printf, 'printfs': Printfs, 'format': Format,
+    'assert': Assert, 'list': List, 'cons': Cons, 'car': Car, 'cdr': Cdr,
+    'nil?': Null, 'length': Length, 'append': Append, 'reverse': Reverse, 'nth': Nth,
+    'map': Map, 'filter': Filter, 'fold': Fold, 'reduce': Fold, 'range': Range,
+    'vector': MakeVector, 'make-vector': VectorFill, 'list->vector': ListToVector,
+    'vector->list': VectorToList, 'vector-ref': VectorRef, 'vector-slice': VectorSlice,
+    'vector-length': VectorLength, 'vector-sum': VectorSum,
+    'dict-new': DictNew, 'dict-get': DictGet, 'dict-set': DictSet, 'dict-has': DictHas,
+    'dict-keys': DictKeys,
+    'if': IfElse, 'while': While, 'parse': Parse, 'quoted': parse_quoted,
+    'eval': Eval, 'read': Read,
+}.items():
+    special_form(head, form)
+
 __all__ = [
-    'Node', 'NotImplemented', 'Comment', 'Suite', 'Set', 'Setg', 'Setc',
-    'Ret', 'List', 'Params', 'Cons', 'Car', 'Cdr', 'Cell', 'ProgramError',
+    'Node', 'NotImplemented', 'Comment', 'Suite', 'Set', 'SetLocal', 'SetCell', 'Setg', 'Setc',
+    'SetClosure',
+    'Ret', 'List', 'Params', 'Cons', 'Car', 'Cdr', 'Pair', 'ProgramError',
+    'Null', 'Length', 'Append', 'Reverse', 'Nth', 'Map', 'Filter', 'Fold', 'Range',
     'Assert', 'Pos', 'Neg', 'Eq', 'Ne', 'Lt', 'Gt', 'Le', 'Ge', 'Add', 'Sub',
     'Mul', 'Div', 'Mod', 'Pow', 'And', 'Or', 'Not', 'Xor', 'Is',
     'Print', 'Format', 'Printf', 'Printfs', 'Name',
-    'Var', 'Atom', 'Nil', 'True_', 'False_', 'While', 'IfElse', 'Call',
-    'TailCall', 'UfuncBase', 'Scoping', 'Lambda', 'Read', 'Parse', 'Eval',
+    'MakeVector', 'VectorFill', 'ListToVector', 'VectorToList', 'VectorRef', 'VectorSlice',
+    'VectorLength', 'VectorSum', 'Vector',
+    'DictNew', 'DictGet', 'DictSet', 'DictHas', 'DictKeys', 'HashMap',
+    'Var', 'LocalVar', 'CellVar', 'ClosureVar', 'GlobalVar', 'Atom', 'Nil', 'True_', 'False_', 'While', 'IfElse', 'Call',
+    'TailCall', 'StackCall', 'StackTailCall', 'Inline', 'UfuncBase', 'Scoping', 'Lambda', 'Native', 'Read', 'Parse', 'Eval',
 
-    'BINOPS', 'UNOPS',
+    'BINOPS', 'UNOPS', 'VECTOR_FUNCS',
 
     'create_pyfunc',
+    'special_form', 'SPECIAL_FORMS',
 ]
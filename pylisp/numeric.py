@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+from re import compile
+from decimal import Decimal, Context, localcontext
+from contextlib import contextmanager, nullcontext
+from logging import getLogger
+logger = getLogger(__name__)
+
+INT_RE = compile(r'(?:\+|-)?\d+')
+
+def decimal_literal(token):
+    return Decimal(token)
+
+def fast_literal(token):
+    return int(token) if INT_RE.fullmatch(token) else float(token)
+
+def auto_literal(token):
+    return int(token) if INT_RE.fullmatch(token) else Decimal(token)
+
+class Numeric:
+    '''
+    a numeric mode: the type numeric literals are read as and the decimal
+    context that arithmetic on Decimals runs in (None for the current one)
+    '''
+    def __init__(self, name, literal, context=None):
+        self.name = name
+        self.literal = literal
+        self.context = context
+    def __repr__(self):
+        return f'Numeric({self.name!r}, context={self.context!r})'
+    def __call__(self, token):
+        return self.literal(token)
+    def localcontext(self):
+        return nullcontext() if self.context is None else localcontext(self.context)
+
+# NOTE: 'decimal': every literal is a Decimal
+#       'fast':    exact ints, floats for literals with a fraction
+#       'auto':    exact ints, Decimals for literals with a fraction;
+#                  like in Python, dividing two ints gives a float
+NUMERIC = {
+    'decimal': Numeric('decimal', decimal_literal),
+    'fast':    Numeric('fast',    fast_literal),
+    'auto':    Numeric('auto',    auto_literal),
+}
+
+def get_numeric(mode, context=None, **kwargs):
+    '''
+    the Numeric for a mode name, e.g. get_numeric('decimal', prec=50);
+    context or the keyword arguments (see decimal.Context) set its
+    decimal context
+    '''
+    if isinstance(mode, Numeric):
+        numeric = mode
+    else:
+        try:
+            numeric = NUMERIC[mode]
+        except KeyError as e:
+            raise ValueError(f'unknown numeric mode {mode!r}') from e
+    if kwargs:
+        context = Context(**kwargs)
+    if context is not None:
+        numeric = Numeric(numeric.name, numeric.literal, context)
+    return numeric
+
+# NOT thread-safe!!
+__numeric__ = NUMERIC['decimal']
+
+def current_numeric():
+    return __numeric__
+
+@contextmanager
+def use_numeric(mode):
+    '''
+    parse literals with and run Decimal arithmetic in the given mode
+    '''
+    global __numeric__
+    saved, __numeric__ = __numeric__, get_numeric(mode)
+    try:
+        with __numeric__.localcontext():
+            yield __numeric__
+    finally:
+        __numeric__ = saved
+
+__all__ = [
+    'Numeric',
+    'NUMERIC',
+    'get_numeric',
+    'current_numeric',
+    'use_numeric',
+]
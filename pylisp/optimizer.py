@@ -1,8 +1,14 @@
 #!/usr/bin/env python3
 from .nodes import *
 from .insts import *
+from .frame import Layout
+from .cfg import *
+from .cfg import jump_of, transfer
+from .closures import compile_closure
+from .numeric import use_numeric
 
-from copy import deepcopy
+from itertools import count
+from collections import Counter, defaultdict
 from logging import getLogger
 logger = getLogger(__name__)
 
@@ -18,40 +24,359 @@ def traverse(tree, func=None):
     for child in tree.children:
         yield from traverse(child, func)
 
-def constant_folding(tree):
-    tree = deepcopy(tree)
-    while True:
-        did_optimization = False
-        for node, _ in traverse(tree):
-            if isinstance(node, UNOPS) \
-                and not isinstance(node.arg, Var):
-                new_node = node(env={})
-                node.replace(new_node)
-                did_optimization = True
-        for node, _ in traverse(tree):
-            if isinstance(node, BINOPS) \
-                and not isinstance(node.left,  Var) \
-                and not isinstance(node.right, Var):
-                new_node = node(env={})
-                node.replace(new_node)
-                did_optimization = True
-        if not did_optimization:
-            break
+LITERALS = Atom, type(Nil), type(True_), type(False_)
+
+def fold(node):
+    '''
+    the constant a node with folded children evaluates to, or the node
+    '''
+    if isinstance(node, (UNOPS, BINOPS)) \
+        and all(isinstance(x, LITERALS) for x in node.children):
+        try:
+            # NOTE: evaluated by the closure compiler, not the instrumented
+            #       tree-walker, which would also count it in nodes.stats
+            return Atom(compile_closure(node)({}))
+        except (ArithmeticError, TypeError, ValueError):
+            # NOTE: e.g. a division by zero still raises at runtime
+            return node
+    if isinstance(node, IfElse) and isinstance(node.cond, LITERALS):
+        if node.cond.value:
+            return node.ifbody
+        # NOTE: an empty Suite, like an if without else, pushes nothing
+        return node.elsebody if node.elsebody else Suite()
+    return node
+
+def fold_tree(node, inplace):
+    if not isinstance(node, Node) or isinstance(node, Atom):
+        # NOTE: a quoted AST is data
+        return node
+    children = tuple(fold_tree(x, inplace) for x in node.children)
+    if any(new is not old for new, old in zip(children, node.children)):
+        if inplace:
+            node.children = children
+        else:
+            node = type(node)(*children)
+    return fold(node)
+
+def constant_folding(tree, inplace=False):
+    '''
+    fold the operators whose operands are all literals and the ifs with a
+    literal condition, in a single bottom-up pass; unless inplace, only
+    the nodes on the path to a folded node are copied and the rest of the
+    tree is shared with the input
+    '''
+    return fold_tree(tree, inplace)
+
+def tail_position(node):
+    '''
+    node with the calls whose value it returns turned into tail calls:
+    the last statement of a suite, both branches of an if and the value
+    of a ret are in tail position
+    '''
+    if type(node) is Call:
+        return TailCall(*node.children)
+    if isinstance(node, Suite) and node.children:
+        return Suite(*node.children[:-1], tail_position(node.children[-1]))
+    if isinstance(node, IfElse):
+        elsebody = tail_position(node.elsebody) if node.elsebody else node.elsebody
+        return IfElse(node.cond, tail_position(node.ifbody), elsebody)
+    if type(node) is Ret:
+        return Ret(tail_position(node.value))
+    return node
+
+def identify_tail_calls(tree, in_func=False):
+    '''
+    turn every call in tail position of a function into a tail call, which
+    reuses the frame of the caller; the body of a function and the value
+    of every ret inside of it are in tail position
+    '''
+    if not isinstance(tree, Node) or isinstance(tree, Atom) or not tree.children:
+        return tree
+    if isinstance(tree, Lambda):
+        body = tail_position(identify_tail_calls(tree.body, True))
+        return type(tree)(tree.params, body, *tree.children[2:])
+    children = tuple(identify_tail_calls(x, in_func) for x in tree.children)
+    if any(new is not old for new, old in zip(children, tree.children)):
+        tree = type(tree)(*children)
+    if in_func and type(tree) is Ret:
+        return tail_position(tree)
     return tree
 
-def identify_tail_calls(tree):
-    tree = deepcopy(tree)
+# NOTE: the largest body, in nodes, of a function inlined by inline_functions
+INLINE_BUDGET = 16
+# NOTE: the nodes an inlined body may not contain: a body must be a single
+#       expression, since every statement leaves its value on the stack,
+#       whose variables all are its parameters or globals
+NOT_INLINED = Lambda, While, Ret, TailCall, Set, Setg, Setc, Suite, Eval, Native
+# NOT thread-safe!!
+INLINED = count()
+
+def returned(body):
+    '''
+    the expression a function body returns, with the Rets in tail
+    position removed, or None if it is not a single expression
+    '''
+    if isinstance(body, Suite):
+        return returned(body.children[0]) if len(body.children) == 1 else None
+    if type(body) is Ret:
+        return body.value
+    if isinstance(body, IfElse) and body.elsebody:
+        ifbody, elsebody = returned(body.ifbody), returned(body.elsebody)
+        if ifbody is not None and elsebody is not None:
+            return IfElse(body.cond, ifbody, elsebody)
+        return None
+    return body
+
+def expression_nodes(tree):
+    # NOTE: the bindings of an inlined call are part of the expression
+    if isinstance(tree, Inline):
+        yield tree
+        for node in (tree.body, *(x.value for x in tree.bindings)):
+            yield from expression_nodes(node)
+        return
+    if isinstance(tree, Node):
+        yield tree
+        if not isinstance(tree, Atom):
+            for child in tree.children:
+                yield from expression_nodes(child)
+
+def inline_candidate(name, func, budget):
+    '''
+    the parameters, the body and the free names of a function small enough
+    to inline, or None
+    '''
+    body = returned(func.body) if func.layout is None else None
+    if body is None:
+        return None
+    nodes = list(expression_nodes(body))
+    if len(nodes) > budget or any(isinstance(x, NOT_INLINED) for x in nodes):
+        return None
+    names = {x.name for x in nodes if type(x) is Var} \
+          | {x.name.value for x in nodes if type(x) is Call}
+    if name in names or any(isinstance(x, IfElse) and not x.elsebody for x in nodes):
+        # NOTE: recursive, or pushing nothing if the condition is false
+        return None
+    bound = {binding.name.value for x in nodes for binding in getattr(x, 'bindings', ())}
+    return func.params.value, body, names - set(func.params.value) - bound
 
-    for node, func in traverse(tree):
-        if isinstance(node, Ret) \
-            and isinstance(node.value, Call) \
-            and node.value.name.name == func.name:
-            new_node = Ret(TailCall(*node.value.children))
-            node.replace(new_node)
+def rename(tree, names):
+    if not isinstance(tree, Node) or isinstance(tree, Atom) or not tree.children:
+        return tree
+    if type(tree) in (Var, Name):
+        return type(tree)(names.get(tree.children[0], tree.children[0]))
+    return type(tree)(*[rename(x, names) for x in tree.children])
 
+def inline(name, params, body, args):
+    # NOTE: the parameters, and those of the calls inlined in the body, get
+    #       fresh names, so no argument or body captures a caller's variable
+    n = next(INLINED)
+    names = {x: f'{name}.{x}.{n}' for x in params}
+    for node in expression_nodes(body):
+        for binding in getattr(node, 'bindings', ()):
+            names[binding.name.value] = f'{binding.name.value}.{n}'
+    bindings = [Set(Name(names[x]), arg) for x, arg in zip(params, args)]
+    return Inline(Name(name), rename(body, names), *bindings)
+
+def bound_names(func):
+    # NOTE: every name a function or its nested functions may bind locally
+    names = set(func.params.value)
+    for node, _ in traverse(func.body):
+        if isinstance(node, (Set, Setc)):
+            names.add(node.name.value)
+        elif isinstance(node, Lambda):
+            names.update(node.params.value)
+    return names
+
+def inline_calls(tree, candidates, bound, in_func=False):
+    if not isinstance(tree, Node) or isinstance(tree, Atom) or not tree.children:
+        return tree
+    if isinstance(tree, Lambda):
+        bound, in_func = bound | bound_names(tree), True
+    children = tuple(inline_calls(x, candidates, bound, in_func) for x in tree.children)
+    if any(new is not old for new, old in zip(children, tree.children)):
+        tree = type(tree)(*children)
+    # NOTE: the bindings of a call inlined at top level would be globals,
+    #       left behind in the env and changing the Namespace on every call
+    if in_func and type(tree) is Call and tree.name.value in candidates and tree.name.value not in bound:
+        params, body, free = candidates[tree.name.value]
+        if len(tree.args) == len(params) and not free & bound:
+            return inline(tree.name.value, params, body, tree.args)
     return tree
 
-def optimize_ast(tree, optimizations=(constant_folding, identify_tail_calls)):
+def inline_functions(tree, budget=None):
+    '''
+    replace the calls of small, non-recursive functions by their bodies:
+    a function is inlined if a top-level set binds it once and for all and
+    its body is a single expression of at most budget (by default
+    INLINE_BUDGET) nodes; only the calls in functions, after its definition
+    and outside of functions binding a name it uses, are inlined
+    '''
+    from . import nodes
+    if nodes.__scoping__ is Scoping.DYNAMIC or not isinstance(tree, Suite):
+        return tree
+    if budget is None:
+        budget = INLINE_BUDGET
+    # NOTE: a function redefined by eval at runtime is not noticed
+    assigned = Counter(node.name.value for node, _ in traverse(tree)
+                       if isinstance(node, (Set, Setg, Setc)))
+    candidates, children = {}, []
+    for statement in tree.children:
+        statement = inline_calls(statement, candidates, frozenset())
+        children.append(statement)
+        if type(statement) in (Set, Setg) and isinstance(statement.value, Lambda) \
+            and assigned[statement.name.value] == 1:
+            candidate = inline_candidate(statement.name.value, statement.value, budget)
+            if candidate is not None:
+                candidates[statement.name.value] = candidate
+    logger.info('inlining %r', sorted(candidates))
+    return Suite(*children)
+
+class Scope:
+    def __init__(self, params, parent=None):
+        self.params   = tuple(params)
+        self.parent   = parent
+        self.assigned = [*self.params]
+        self.reads    = set()
+        self.setcs    = set()
+        self.children = []
+        if parent is not None:
+            parent.children.append(self)
+    def descendants(self):
+        for child in self.children:
+            yield child
+            yield from child.descendants()
+    def target(self, name):
+        '''
+        the scope a setc of name in this scope writes to: the nearest
+        enclosing function binding name, or else the enclosing function
+        '''
+        scope = self.parent
+        while scope is not None:
+            if name in scope.assigned:
+                return scope
+            scope = scope.parent
+        return self.parent
+    def locals(self):
+        names = dict.fromkeys(self.assigned)
+        for scope in self.descendants():
+            names.update(dict.fromkeys(n for n in sorted(scope.setcs) if scope.target(n) is self))
+        return tuple(names)
+    def free(self):
+        names = self.reads | self.setcs
+        for child in self.children:
+            names |= child.free()
+        return names - set(self.locals())
+    def resolve(self):
+        '''
+        assign a slot to every local variable, turn the locals captured
+        by nested functions into cells, and find the cells to capture from
+        the enclosing function
+        '''
+        self.slots = self.locals()
+        captured = set()
+        for child in self.children:
+            captured |= child.free()
+        self.cells = tuple(n for n in self.slots if n in captured)
+        self.freevars = tuple(sorted(n for n in self.free()
+                                     if self.parent is not None
+                                     and not self.parent.is_global(n)))
+        capture = []
+        for n in self.freevars:
+            if n in self.parent.slots:
+                capture.append((n, False, self.parent.slots.index(n)))
+            else:
+                capture.append((n, True, self.parent.freevars.index(n)))
+        self.layout = Layout(self.params, self.slots, self.cells, capture)
+        for child in self.children:
+            child.resolve()
+    def is_global(self, name):
+        scope = self
+        while scope is not None:
+            if name in scope.locals():
+                return False
+            scope = scope.parent
+        return True
+    def var(self, name):
+        if name in self.cells:
+            return CellVar(name, self.slots.index(name))
+        if name in self.slots:
+            return LocalVar(name, self.slots.index(name))
+        if name in self.freevars:
+            return ClosureVar(name, self.freevars.index(name))
+        return GlobalVar(name)
+
+def collect_scopes(tree, scope=None, scopes=None):
+    if scopes is None:
+        scopes = {}
+    if not isinstance(tree, Node) or isinstance(tree, Atom):
+        return scopes
+    if isinstance(tree, Lambda):
+        scope = scopes[id(tree)] = Scope(tree.params.value, scope)
+        return collect_scopes(tree.body, scope, scopes)
+    if scope is not None:
+        if isinstance(tree, Setc):
+            scope.setcs.add(tree.name.value)
+        elif isinstance(tree, Set):
+            scope.assigned.append(tree.name.value)
+        elif isinstance(tree, Var):
+            scope.reads.add(tree.name)
+        elif isinstance(tree, Call):
+            scope.reads.add(tree.name.value)
+    for child in tree.children:
+        collect_scopes(child, scope, scopes)
+    return scopes
+
+def rewrite_scopes(tree, scopes, scope=None):
+    if not isinstance(tree, Node) or isinstance(tree, Atom) or not tree.children:
+        return tree
+    if isinstance(tree, Lambda):
+        scope = scopes[id(tree)]
+        body = rewrite_scopes(tree.body, scopes, scope)
+        return Lambda(tree.params, body, scope.layout)
+    if scope is None:
+        return type(tree)(*[rewrite_scopes(x, scopes, scope) for x in tree.children])
+    if type(tree) is Var:
+        return scope.var(tree.name)
+    if type(tree) in (Set, Setc):
+        var = scope.var(tree.name.value)
+        value = rewrite_scopes(tree.value, scopes, scope)
+        if isinstance(var, CellVar):
+            return SetCell(tree.name, value, var.slot)
+        if isinstance(var, LocalVar):
+            return SetLocal(tree.name, value, var.slot)
+        if isinstance(var, ClosureVar):
+            return SetClosure(tree.name, value, var.index)
+        return type(tree)(tree.name, value)
+    if type(tree) in (Call, TailCall):
+        var = scope.var(tree.name.value)
+        args = [rewrite_scopes(x, scopes, scope) for x in tree.args]
+        if isinstance(var, GlobalVar):
+            return type(tree)(tree.name, *args)
+        if type(tree) is TailCall:
+            return StackTailCall(var, *args)
+        return StackCall(var, *args)
+    return type(tree)(*[rewrite_scopes(x, scopes, scope) for x in tree.children])
+
+def resolve_scopes(tree):
+    '''
+    classify variables inside of lambdas as local, closure or global:
+    locals are accessed by slot, closure variables through shared cells
+    and globals directly in the global env
+    '''
+    from . import nodes
+    if nodes.__scoping__ is Scoping.DYNAMIC:
+        return tree
+    scopes = collect_scopes(tree)
+    for scope in scopes.values():
+        if scope.parent is None:
+            scope.resolve()
+    return rewrite_scopes(tree, scopes)
+
+def optimize_ast(tree, optimizations=(inline_functions, constant_folding, identify_tail_calls, resolve_scopes), numeric=None):
+    if numeric is not None:
+        # NOTE: constant folding must compute like the evaluation
+        with use_numeric(numeric):
+            return optimize_ast(tree, optimizations)
     for opt in optimizations:
         tree = opt(tree)
     return tree
@@ -59,36 +384,287 @@ def optimize_ast(tree, optimizations=(constant_folding, identify_tail_calls)):
 def window(xs, size):
     return zip(*(xs[i:] for i in range(size)))
 
+STORES = {
+    (PopVar, PushVar): StoreVar,
+    (PopLocalVar, PushLocalVar): StoreLocalVar,
+    (PopCellVar, PushCellVar): StoreCellVar,
+    (PopClosureVar, PushClosureVar): StoreClosureVar,
+}
+
+STORE_POPS = {store: pop for (pop, _), store in STORES.items()}
+
+# NOTE: the default rules of the peephole pass, in the order they are
+#       tried; see peephole_rule
+PEEPHOLE_RULES = []
+# NOT thread-safe!!
+PEEPHOLE_HITS = Counter()
+
+def peephole_rule(*pattern):
+    '''
+    register the decorated function as a peephole rule for a window of
+    instructions of the types in pattern, each a class or a tuple of
+    classes; it takes the window and the instruction after every label
+    and returns the replacement instructions, or None to keep the window
+    '''
+    pattern = tuple(x if isinstance(x, tuple) else (x,) for x in pattern)
+    def register(func):
+        func.pattern = pattern
+        PEEPHOLE_RULES.append(func)
+        return func
+    return register
+
+@peephole_rule(tuple(pop for pop, _ in STORES), tuple(push for _, push in STORES))
+def store(window, targets):
+    # NOTE: (PopVar x) (PushVar x) => (StoreVar x)
+    pop, push = window
+    cls = STORES.get((type(pop), type(push)))
+    if cls is not None and pop.children == push.children:
+        return [cls(*pop.children)]
+
+@peephole_rule(tuple(STORE_POPS), tuple(STORE_POPS.values()))
+def store_pop(window, targets):
+    # NOTE: (StoreVar x) (PopVar x) => (PopVar x)
+    store, pop = window
+    if STORE_POPS[type(store)] is type(pop) and store.children == pop.children:
+        return [pop]
+
+@peephole_rule(Noop)
+def noop(window, targets):
+    return []
+
+@peephole_rule(PushImm, Pop)
+def discard(window, targets):
+    # NOTE: e.g. an unused argument of an inlined call, whose dead
+    #       PopLocalVar remove_dead_stores turned into a Pop
+    return []
+
+@peephole_rule(PushImm, (JumpIfFalse, JumpIfTrue))
+def constant_branch(window, targets):
+    # NOTE: the branch pops the constant it tests
+    push, branch = window
+    if bool(push.value) == isinstance(branch, JumpIfTrue):
+        return [JumpAlways(branch.label)]
+    return []
+
+@peephole_rule((JumpIfFalse, JumpIfTrue), JumpAlways, Label)
+def invert_branch(window, targets):
+    # NOTE: (JumpIfFalse a) (JumpAlways b) a: => (JumpIfTrue b) a:
+    branch, jump, label = window
+    if branch.label == label.name:
+        inverse = JumpIfTrue if isinstance(branch, JumpIfFalse) else JumpIfFalse
+        return [inverse(jump.label), label]
+
+@peephole_rule((JumpAlways, JumpIfFalse, JumpIfTrue, ProfiledJump))
+def thread_jump(window, targets):
+    # NOTE: a jump to a JumpAlways goes to its target directly; a
+    #       ProfiledJump is not skipped, it counts the back-edges
+    jump, = window
+    label, seen = jump.label, {jump.label}
+    while type(targets.get(label)) is JumpAlways and targets[label].label not in seen:
+        label = targets[label].label
+        seen.add(label)
+    if label != jump.label:
+        return [type(jump)(label, *jump.children[1:])]
+
+def optimize_body(inst, opt):
+    # NOTE: the body of a function is optimized like top-level code
+    if isinstance(inst, CreateFunc):
+        return CreateFunc(inst.params, opt(inst.body), inst.layout, inst.native, inst.profile)
+    return inst
+
+def unlink(insts):
+    '''
+    put a Label, named by its PC, before every target of linked jumps
+    '''
+    targets = {jump.label for jump in map(jump_of, insts)
+               if jump is not None and isinstance(jump.label, int)}
+    rv = []
+    for pc, inst in enumerate(insts):
+        if pc in targets:
+            rv.append(Label(pc))
+        rv.append(inst)
+    if len(insts) in targets:
+        rv.append(Label(len(insts)))
+    return rv
+
+def relink(insts):
+    # NOTE: like link, but also for the jumps of superinstructions
+    labels, pc = {}, 0
+    for inst in insts:
+        if isinstance(inst, Label):
+            labels[inst.name] = pc
+        else:
+            pc += 1
+    return [retarget(inst, labels) for inst in insts if not isinstance(inst, Label)]
+
+def peephole(bytecodes, rules=None):
+    '''
+    rewrite windows of instructions with the peephole rules, by default
+    PEEPHOLE_RULES, in a single pass: every instruction is appended to
+    the output and the rules ending in its type are tried on the tail of
+    the output; a replacement is pushed back onto the input, so rewrites
+    cascade; function bodies are rewritten as well; the hits of every rule
+    are added to PEEPHOLE_HITS
+    '''
+    if rules is None:
+        rules = PEEPHOLE_RULES
+    index = defaultdict(list)
+    for rule in rules:
+        for cls in rule.pattern[-1]:
+            index[cls].append(rule)
+    insts = unlink(bytecodes)
+    targets, following = {}, None
+    for inst in reversed(insts):
+        if isinstance(inst, Label):
+            targets[inst.name] = following
+        else:
+            following = inst
+
+    hits = Counter()
+    work = [optimize_body(inst, lambda body: peephole(body, rules)) for inst in reversed(insts)]
+    rv = []
+    while work:
+        rv.append(work.pop())
+        for rule in index.get(type(rv[-1]), ()):
+            size = len(rule.pattern)
+            window = rv[-size:]
+            if len(window) < size \
+                or not all(type(x) in classes for x, classes in zip(window, rule.pattern)):
+                continue
+            replacement = rule(window, targets)
+            if replacement is not None:
+                hits[rule.__name__] += 1
+                del rv[-size:]
+                work.extend(reversed(replacement))
+                break
+    logger.info('peephole hits: %r', hits)
+    PEEPHOLE_HITS.update(hits)
+    return relink(rv)
+
 def remove_redundant_stack_ops(bytecodes):
-    bytecodes = deepcopy(bytecodes)
-    while True:
-        did_optimizations = False
+    return peephole(bytecodes, (store,))
 
-        replacements = {}
-        for idx, (inst, next_inst) in enumerate(window(bytecodes, 2)):
-            if isinstance(inst, PopVar) \
-                and isinstance(next_inst, PushVar) \
-                and inst.name== next_inst.name:
-                replacements[idx, idx+2] = [StoreVar(inst.name)]
-                did_optimizations = True
+def remove_unreachable(bytecodes):
+    '''
+    drop the blocks no path from the entry reaches, e.g. the code after a
+    (ret x) or the branch of a constant condition; function bodies are
+    pruned as well
+    '''
+    cfg = CFG(bytecodes)
+    reachable = cfg.reachable()
+    rv, pcs = [], []
+    for block in cfg:
+        for inst in cfg.block_insts(block):
+            pcs.append(len(rv))
+            if block in reachable:
+                rv.append(optimize_body(inst, remove_unreachable))
+    pcs.append(len(rv))
+    logger.info('removed %d unreachable instructions', len(cfg.insts) - len(rv))
+    return [retarget(inst, pcs) for inst in rv]
 
-        for (from_idx, to_idx), insts in sorted(replacements.items(), reverse=True):
-            bytecodes[from_idx:to_idx] = insts
+def remove_dead_stores(bytecodes):
+    '''
+    drop the StoreLocalVars and turn the PopLocalVars into Pops whose
+    slot is not live afterwards; stores to other variables are kept,
+    since callees, closures or eval may read them
+    '''
+    cfg = CFG(bytecodes)
+    _, live_out = liveness(cfg)
+    dead = set()
+    for block in cfg:
+        live = live_out[block]
+        for pc in reversed(range(block.start, block.end)):
+            inst = cfg.insts[pc]
+            if type(inst) in (PopLocalVar, StoreLocalVar) and inst.slot not in live:
+                dead.add(pc)
+            live = transfer(inst, live)
+    rv, pcs = [], []
+    for pc, inst in enumerate(cfg.insts):
+        pcs.append(len(rv))
+        if pc not in dead:
+            rv.append(optimize_body(inst, remove_dead_stores))
+        elif type(inst) is PopLocalVar:
+            rv.append(Pop())
+    pcs.append(len(rv))
+    logger.info('removed %d dead stores', len(dead))
+    return [retarget(inst, pcs) for inst in rv]
 
-        if not did_optimizations:
-            break
+def generic_type(cls):
+    # NOTE: quickened instructions fuse like the generic CallPyFunc
+    return CallPyFunc if issubclass(cls, CallPyFunc) else cls
 
-    return bytecodes
+def choose_fusions(pairs, threshold=0.01):
+    '''
+    choose the superinstructions worth fusing from a Stats.pairs histogram:
+    those whose every pair of adjacent instructions makes up at least
+    threshold of all of the executed pairs
+    '''
+    counts = Counter()
+    for (inst, next_inst), n in pairs.items():
+        counts[generic_type(inst), generic_type(next_inst)] += n
+    total = sum(counts.values())
+    return {pattern for pattern in SUPERINSTRUCTIONS
+            if total and min(counts[x] for x in window(pattern, 2)) >= threshold * total}
+
+def retarget(inst, pcs):
+    if isinstance(inst, JUMPS):
+        return type(inst)(pcs[inst.label], *inst.children[1:])
+    if jump_of(inst) is not None:
+        return type(inst)(*inst.parts[:-1], retarget(inst.parts[-1], pcs))
+    return inst
+
+def fuse_superinstructions(bytecodes, fusions=None):
+    '''
+    replace the pushes of the operands of a binary CallPyFunc, the call
+    and the instruction consuming the result with a single Superinst;
+    fusions restricts the patterns to fuse, e.g. to those chosen by
+    choose_fusions, and function bodies are fused as well
+    '''
+    if fusions is None:
+        fusions = SUPERINSTRUCTIONS
+    # NOTE: fuse linked instructions, so that superinstructions carry
+    #       absolute jump targets, and never fuse across a jump target
+    bytecodes = link(bytecodes)
+    targets = {jump.label for jump in map(jump_of, bytecodes) if jump is not None}
+    rv, pcs, pc = [], [], 0
+    while pc < len(bytecodes):
+        for size in 4, 3:
+            parts = bytecodes[pc:pc+size]
+            pattern = tuple(generic_type(type(x)) for x in parts)
+            if pattern in fusions and parts[2].args == 2 \
+                and not targets.intersection(range(pc+1, pc+size)):
+                break
+        else:
+            parts = bytecodes[pc:pc+1]
+        inst = parts[0] if len(parts) == 1 else SUPERINSTRUCTIONS[pattern](*parts)
+        inst = optimize_body(inst, lambda body: fuse_superinstructions(body, fusions))
+        pcs.extend([len(rv)] * len(parts))
+        rv.append(inst)
+        pc += len(parts)
+    pcs.append(len(rv))
+    return [retarget(inst, pcs) for inst in rv]
 
-def optimize_bytecodes(bytecodes, optimizations=(remove_redundant_stack_ops,)):
+# NOTE: the peephole pass runs again after remove_dead_stores, which
+#       leaves Pops for it to discard
+def optimize_bytecodes(bytecodes, optimizations=(peephole, remove_unreachable, remove_dead_stores, peephole, fuse_superinstructions)):
     for opt in optimizations:
         bytecodes = opt(bytecodes)
     return bytecodes
 
 __all__ = [
     'constant_folding',
+    'inline_functions',
     'identify_tail_calls',
+    'resolve_scopes',
     'optimize_ast',
     'remove_redundant_stack_ops',
+    'peephole',
+    'peephole_rule',
+    'PEEPHOLE_RULES',
+    'PEEPHOLE_HITS',
+    'remove_unreachable',
+    'remove_dead_stores',
+    'choose_fusions',
+    'fuse_superinstructions',
     'optimize_bytecodes',
 ]
@@ -1,27 +1,71 @@
 #!/usr/bin/env python3
+from .numeric import use_numeric, current_numeric
+from .frame import LRU
+from .builtins import builtin
+
 from re import escape, compile
+from io import StringIO
 from pprint import pformat
-from logging import getLogger
+from logging import getLogger, INFO
 logger = getLogger(__name__)
 
 NAME     = '[^"\'() \n\t]+'
 QUOTED   = r'"(?:[^"\\]|\\.)*"'
 LPAREN   = "'?" + escape('(')
+# NOTE: #(x ...) is the literal of (vector x ...)
+VPAREN   = escape('#(')
 RPAREN   = escape(')')
 LCOMMENT = escape('/*')
 RCOMMENT = escape('*/')
-TOKEN    = f'({LCOMMENT}|{RCOMMENT}|{NAME}|{QUOTED}|{LPAREN}|{RPAREN})'
+TOKEN    = f'({LCOMMENT}|{RCOMMENT}|{VPAREN}|{NAME}|{QUOTED}|{LPAREN}|{RPAREN})'
 TOKEN_RE = compile(TOKEN)
+CHUNK_SIZE = 64 * 1024
+
+def scan(text, final=True):
+    '''
+    the tokens of text and the rest of it that is left unscanned, since
+    unless final, it may continue in the next chunk: a token or text that
+    is no token touching the end, or an unterminated string
+    '''
+    tokens, pos = [], 0
+    for m in TOKEN_RE.finditer(text):
+        gap = text[pos:m.start()]
+        if gap.strip():
+            # NOTE: a quote that starts no string has no closing quote up
+            #       to the end of text; any other gap, e.g. the ' of a word
+            #       in a comment, cannot grow and is a token of its own
+            if not final and '"' in gap:
+                return tokens, text[pos:]
+            tokens.append(gap)
+        if m.end() == len(text) and not final:
+            return tokens, text[m.start():]
+        tokens.append(m.group())
+        pos = m.end()
+    rest = text[pos:]
+    if rest.strip():
+        if not final:
+            return tokens, rest
+        tokens.append(rest)
+    return tokens, ''
 
 def tokenize(s):
-    for token in TOKEN_RE.split(s):
-        if token.strip():
-            yield token
-    return
+    yield from scan(s)[0]
 
-def build_tree(tokens):
-    rv = []
-    current = [rv]
+def tokenize_stream(stream, chunk_size=CHUNK_SIZE):
+    rest = ''
+    while True:
+        chunk = stream.read(chunk_size)
+        tokens, rest = scan(rest + chunk, final=not chunk)
+        yield from tokens
+        if not chunk:
+            return
+
+def build_forms(tokens):
+    '''
+    build the tree of every top-level form, yielding it as soon as its
+    parentheses balance
+    '''
+    form, current = None, []
     comment_depth = 0
     for value in tokens:
         if value == '/*':
@@ -30,19 +74,30 @@ def build_tree(tokens):
             comment_depth -= 1
         elif comment_depth:
             continue
-        elif value == '(':
-            t = []
-            current[-1].append(t)
-            current.append(t)
-        elif value == "'(":
-            t = ['quoted', []]
-            current[-1].append(t)
-            current.append(t[-1])
+        elif value in ('(', "'(", '#('):
+            t = {'(': [], "'(": ['quoted', []], '#(': ['vector']}[value]
+            if current:
+                current[-1].append(t)
+            else:
+                form = t
+            current.append(t[-1] if value == "'(" else t)
         elif value == ')':
+            if not current:
+                logger.warning('ignoring unbalanced )')
+                continue
             current.pop()
-        else:
+            if not current:
+                yield form
+        elif current:
             current[-1].append(value)
-    return rv
+        else:
+            yield value
+    if current:
+        # NOTE: an unterminated form is still parsed as far as it goes
+        yield form
+
+def build_tree(tokens):
+    return list(build_forms(tokens))
 
 def build_nodes(tree):
     from .nodes import Node
@@ -50,15 +105,55 @@ def build_nodes(tree):
 
 def build_ast(tokens):
     tree = build_tree(tokens)
-    logger.info('tree:\n%s', pformat(tree))
+    # NOTE: pformat is O(n) even when the message is not logged
+    if logger.isEnabledFor(INFO):
+        logger.info('tree:\n%s', pformat(tree))
     nodes = build_nodes(tree)
-    logger.info('nodes:\n%s', pformat(nodes))
+    if logger.isEnabledFor(INFO):
+        logger.info('nodes:\n%s', pformat(nodes))
     return nodes
 
-def parse(s):
+def parse(s, numeric=None):
+    '''
+    parse s into an AST; numeric selects the numeric mode of its literals
+    (see numeric.NUMERIC), by default the current one
+    '''
+    if numeric is not None:
+        with use_numeric(numeric):
+            return parse(s)
     tokens = list(tokenize(s))
-    logger.info('tokens\n%s', pformat(tokens))
+    if logger.isEnabledFor(INFO):
+        logger.info('tokens\n%s', pformat(tokens))
     ast = build_ast(tokens)
     return ast
 
-__all__ = 'parse',
+# NOTE: the ASTs of the strings parsed by (parse s) at runtime, by the
+#       string and the numeric mode; see PARSE_CACHE.resize
+PARSE_CACHE = LRU()
+
+@builtin('parse')
+def cached_parse(s):
+    '''
+    parse(s), memoized; the AST is shared, so it must not be modified
+    '''
+    return PARSE_CACHE.lookup((s, current_numeric()), lambda: parse(s))
+
+def parse_forms(stream, numeric=None, chunk_size=CHUNK_SIZE):
+    '''
+    parse a text stream (or a str) one top-level form at a time, reading
+    it in chunks of chunk_size characters: the AST of every form is
+    yielded as soon as its parentheses balance, so it can run before the
+    rest of the stream is read
+    '''
+    if isinstance(stream, str):
+        stream = StringIO(stream)
+    for form in build_forms(tokenize_stream(stream, chunk_size)):
+        if numeric is not None:
+            # NOTE: not around the yield, the consumer runs in its own mode
+            with use_numeric(numeric):
+                node = build_nodes(form)
+        else:
+            node = build_nodes(form)
+        yield node
+
+__all__ = 'parse', 'parse_forms', 'cached_parse', 'PARSE_CACHE'
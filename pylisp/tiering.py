@@ -0,0 +1,44 @@
+#!/usr/bin/env python3
+from .insts import CreateFunc, PopFunc
+from .optimizer import identify_tail_calls, resolve_scopes, optimize_ast, optimize_bytecodes
+from .codegen import compile_lambda
+
+from time import perf_counter
+from logging import getLogger
+logger = getLogger(__name__)
+
+# NOTE: a function is promoted once its calls plus its loops' back-edges
+#       reach THRESHOLD (None disables tiering); there is no on-stack
+#       replacement, so a promoted function runs its new tier from its
+#       next call on
+THRESHOLD = 1000
+PASSES = identify_tail_calls, resolve_scopes
+
+def promote(profile, frames):
+    '''
+    re-optimize a hot function: run the AST passes and the bytecode
+    optimizations on its Lambda and compile it to Python where possible
+    '''
+    before = perf_counter()
+    node = profile.node
+    passes = PASSES
+    if node.layout is not None or not profile.toplevel:
+        # NOTE: resolving scopes needs the enclosing functions; only the
+        #       scopes of unresolved top-level functions are resolved here
+        passes = tuple(p for p in passes if p is not resolve_scopes)
+    node = optimize_ast(node, passes)
+    create = CreateFunc(node.params.value, optimize_bytecodes(list(node.body) + [PopFunc()]), node.layout)
+    native = compile_lambda(node, profile.name)
+
+    tier = profile.tier
+    # NOTE: see Profile.code for the body of the compact engine
+    profile.body, profile.layout, profile.native = create.body, node.layout, native
+    profile.assembled = None
+    profile.tier = 'native' if native is not None else 'optimized'
+    seconds = perf_counter() - before
+    frames[-1].stats.transitions.append((profile.name, tier, profile.tier, seconds))
+    logger.info('promoted %s from %s to %s in %.6fs', profile.name, tier, profile.tier, seconds)
+
+__all__ = [
+    'promote',
+]
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+from .builtins import Pair, build
+from .numeric import current_numeric
+
+from array import array
+from math import fsum
+from numbers import Number
+from itertools import repeat
+from operator import add, sub, mul, truediv, mod, pow, eq, ne, lt, gt, le, ge, neg, pos
+from logging import getLogger
+logger = getLogger(__name__)
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+# NOTE: the storage of new vectors: 'numpy' arrays if numpy is installed,
+#       'array' (array.array('d')) otherwise; both hold doubles
+BACKEND = 'array' if numpy is None else 'numpy'
+
+def storage(values):
+    if BACKEND == 'numpy':
+        return numpy.fromiter(map(float, values), dtype=float)
+    return array('d', map(float, values))
+
+class Vector:
+    '''
+    a fixed-length vector of doubles; arithmetic and comparisons with a
+    vector operand are element-wise and run in a single C loop, a scalar
+    operand being broadcast to every element
+    '''
+    __slots__ = 'data',
+    def __init__(self, values=()):
+        self.data = values if isinstance(values, array) or type(values).__module__ == 'numpy' \
+            else storage(values)
+    def __len__(self):
+        return len(self.data)
+    def __iter__(self):
+        return map(float, self.data)
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return Vector(self.data[index])
+        return float(self.data[index])
+    def __repr__(self):
+        return f'#({" ".join(repr(x) for x in self)})'
+    def __bool__(self):
+        # NOTE: true if every element is, e.g. (assert (== v w) ...)
+        return all(self.data)
+    __hash__ = None
+
+def operand(x):
+    if x.__class__ is Vector:
+        return x.data
+    if isinstance(x, Number):
+        return float(x)
+    return None
+
+def broadcast(op, left, right):
+    '''
+    the vector of op of the elements of left and right, of which at least
+    one is a Vector and the other a Vector of the same length or a number
+    '''
+    l, r = operand(left), operand(right)
+    if l is None or r is None:
+        return NotImplemented
+    if isinstance(l, array) and isinstance(r, array):
+        if len(l) != len(r):
+            raise ValueError(f'vectors of different lengths: {len(l)} and {len(r)}')
+        return Vector(array('d', map(op, l, r)))
+    if isinstance(l, array) and isinstance(r, float):
+        return Vector(array('d', map(op, l, repeat(r, len(l)))))
+    if isinstance(l, float) and isinstance(r, array):
+        return Vector(array('d', map(op, repeat(l, len(r)), r)))
+    # NOTE: numpy broadcasts by itself, and its comparisons give booleans
+    return Vector(numpy.asarray(op(l, r), dtype=float))
+
+def unary(op, arg):
+    if isinstance(arg.data, array):
+        return Vector(array('d', map(op, arg.data)))
+    return Vector(op(arg.data))
+
+def create_kernels():
+    for name, op in [('add', add), ('sub', sub), ('mul', mul), ('truediv', truediv),
+                     ('mod', mod), ('pow', pow)]:
+        setattr(Vector, f'__{name}__', lambda self, other, op=op: broadcast(op, self, other))
+        setattr(Vector, f'__r{name}__', lambda self, other, op=op: broadcast(op, other, self))
+    # NOTE: Python reflects a comparison with a number on the left itself
+    for name, op in [('eq', eq), ('ne', ne), ('lt', lt), ('gt', gt), ('le', le), ('ge', ge)]:
+        setattr(Vector, f'__{name}__', lambda self, other, op=op: broadcast(op, self, other))
+    for name, op in [('neg', neg), ('pos', pos)]:
+        setattr(Vector, f'__{name}__', lambda self, op=op: unary(op, self))
+create_kernels()
+
+def scalar(x):
+    # NOTE: an element read from a vector is a number of the numeric mode,
+    #       so it mixes with the literals of the program
+    numeric = current_numeric()
+    return x if numeric.name == 'fast' else numeric(repr(x))
+
+def make_vector(*values):
+    return Vector(values)
+
+def vector_fill(n, value):
+    return Vector(repeat(value, int(n)))
+
+def list_to_vector(xs):
+    return Vector(xs if xs.__class__ is Pair else ())
+
+def vector_to_list(v):
+    return build(*map(scalar, v))
+
+def vector_ref(v, index):
+    return scalar(v[int(index)])
+
+def vector_slice(v, start, stop=None):
+    return v[int(start):None if stop is None else int(stop)]
+
+def vector_length(v):
+    return len(v)
+
+def vector_sum(v):
+    return scalar(fsum(v.data))
+
+__all__ = [
+    'Vector',
+    'BACKEND',
+]
@@ -1,10 +1,20 @@
 #!/usr/bin/env python3
 from pylisp import *
+import pylisp.tiering as tiering
+import pylisp.nodes as nodes
+from pylisp.builtins import car, cdr, cons, build, length, reverse, nth
+from pylisp.parser import scan
+from pylisp.builtins import dict_new, dict_get, dict_set, dict_has, dict_keys
 from textwrap import dedent
 from operator import lt, add, mul
 from random import randint
 from io import StringIO
+from contextlib import redirect_stdout
+from os import listdir
+from tempfile import TemporaryDirectory
+from decimal import Decimal
 from argparse import ArgumentParser
+from collections import defaultdict
 from logging import getLogger, basicConfig, DEBUG, INFO, ERROR
 logger = getLogger(__name__)
 
@@ -575,10 +585,10 @@ def test_bytecode2():
         (f2 10) -> 12
         (f3 10) -> 13
         Closure 2
-        (f11 10) -> (Decimal('1'), (Decimal('1'), (Decimal('10'), None)))
-        (f12 10) -> (Decimal('1'), (Decimal('2'), (Decimal('10'), None)))
-        (f21 10) -> (Decimal('2'), (Decimal('1'), (Decimal('10'), None)))
-        (f22 10) -> (Decimal('2'), (Decimal('2'), (Decimal('10'), None)))
+        (f11 10) -> (Decimal('1') Decimal('1') Decimal('10'))
+        (f12 10) -> (Decimal('1') Decimal('2') Decimal('10'))
+        (f21 10) -> (Decimal('2') Decimal('1') Decimal('10'))
+        (f22 10) -> (Decimal('2') Decimal('2') Decimal('10'))
     ''')
     if buf.getvalue().strip() != expected.strip():
         raise ProgramError('eval(...) failed!')
@@ -739,6 +749,995 @@ def test_functionality():
     bytecodes = optimize_bytecodes(list(suite))
     evaluate(bytecodes)
 
+def test_locals():
+    code = r'''
+        (set y 10)
+        (set f (lambda (x) (
+            (assert (== y 10) "global read before local set failed!")
+            (set y (* x 2))
+            (set adder (lambda (z) (+ x z)))
+            (set x (+ x 1))
+            (ret (list x y (adder 100)))
+        )))
+        (set rv (f 1))
+        (assert (== rv (list 2 2 102)) "(f 1) failed!")
+        (assert (== y 10) "global modified by local set!")
+    '''
+    suite = resolve_scopes(parse(code))
+    body = list(suite)[3].body
+    if not any(isinstance(inst, PushLocalVar) for inst in body):
+        raise ProgramError('resolve_scopes(...) did not produce slot locals!')
+    if not any(isinstance(inst, PushCellVar) and inst.name == 'x' for inst in body):
+        raise ProgramError('resolve_scopes(...) did not put a captured variable in a cell!')
+    for mode in ENGINES:
+        evaluate(optimize_bytecodes(list(suite)), mode=mode)
+    print('Slot-indexed locals test passed.')
+
+def test_closures():
+    code = r'''
+        (set make-counter (lambda () (
+            (set n 0)
+            (lambda () (
+                (setc n (+ n 1))
+                (ret n)
+            ))
+        )))
+        (set c1 (make-counter))
+        (set c2 (make-counter))
+        (c1)
+        (assert (== (c1) 2) "(c1) failed!")
+        (assert (== (c2) 1) "(c2) failed!")
+
+        (set outer (lambda (k) (
+            (set loop (lambda (i acc) (
+                (if (< i 1)
+                    (ret acc)
+                    (ret (loop (- i 1) (+ acc k)))
+                )
+            )))
+            (ret (loop 5 0))
+        )))
+        (assert (== (outer 3) 15) "(outer 3) failed!")
+
+        (set f (lambda (x) (
+            (lambda (y) (
+                (lambda (z) (list x y z))
+            ))
+        )))
+        (set f1 (f 1))
+        (set f12 (f1 2))
+        (assert (== (f12 3) (list 1 2 3)) "(((f 1) 2) 3) failed!")
+
+        (set g (lambda () (
+            (set x 1)
+            (set mid (lambda () (
+                (set inner (lambda () (setc x (+ x 10))))
+                (inner)
+                (ret x)
+            )))
+            (set y (mid))
+            (ret (list x y))
+        )))
+        (assert (== (g) (list 11 11)) "(setc x ...) two functions deep failed!")
+    '''
+    parse(code)(env={})
+    suite = optimize_ast(parse(code), (identify_tail_calls,))
+    for mode in ENGINES:
+        for tree in suite, resolve_scopes(suite):
+            evaluate(list(tree), mode=mode)
+    create_closure = [inst for inst in list(resolve_scopes(suite))[0].body
+                      if isinstance(inst, CreateFunc)]
+    if [n for n, *_ in create_closure[0].layout.freevars] != ['n']:
+        raise ProgramError('resolve_scopes(...) captured the wrong variables!')
+    print('Closures test passed.')
+
+def test_globals():
+    code = r'''
+        (set helper (lambda (x) (+ x 1)))
+        (set call-helper (lambda (x) (helper x)))
+        (assert (== (call-helper 1) 2) "(call-helper 1) failed!")
+        (set helper (lambda (x) (* x 10)))
+        (assert (== (call-helper 1) 10) "(call-helper 1) after redefinition failed!")
+
+        (set g 1)
+        (set read-g (lambda () (ret g)))
+        (assert (== (read-g) 1) "(read-g) failed!")
+        (set write-g (lambda () (setg g 5)))
+        (write-g)
+        (assert (== (read-g) 5) "(read-g) after setg failed!")
+    '''
+    suite = parse(code)
+    for mode in ENGINES:
+        for tree in suite, resolve_scopes(suite):
+            bytecode = list(tree)
+            evaluate(bytecode, mode=mode)
+    call_helper = bytecode[3]
+    if call_helper.body[-2].version is None:
+        raise ProgramError('PushFunc(...) did not cache its lookup!')
+    print('Global inline cache test passed.')
+
+def test_quickening():
+    code = r'''
+        (set add2 (lambda (x y) (+ x y)))
+        (set i 0)
+        (while (< i 20) (set i (add2 i 1)))
+        (assert (== (add2 "a" "b") "ab") "(add2 a b) after quickening failed!")
+        (set xs (list 1 2 3))
+        (set n 0)
+        (while (<> xs nil) (
+            (set n (+ n (car xs)))
+            (set xs (cdr xs))
+        ))
+        (assert (== n 6) "sum of (list 1 2 3) failed!")
+    '''
+    for mode in ENGINES:
+        bytecode = list(resolve_scopes(parse(code)))
+        stats = evaluate(bytecode, mode=mode)
+        logger.info('%s: %r', mode, stats)
+        if not (stats.quickened and stats.quicken_hits and stats.quicken_misses):
+            raise ProgramError(f'quickening failed: {stats!r}')
+    if type(bytecode[0].body[2]) is not CallPyFunc:
+        raise ProgramError('(+ x y) did not deopt!')
+    print('Quickening test passed.')
+
+def test_link():
+    code = r'''
+        (set count (lambda (n) (
+            (set i 0)
+            (while (< i n) (set i (+ i 1)))
+            (ret i)
+        )))
+        (assert (== (count 10) 10) "(count 10) failed!")
+    '''
+    bytecode = link(list(parse(code)))
+    funcs = [inst for inst in bytecode if isinstance(inst, CreateFunc)]
+    for insts in [bytecode, *(f.body for f in funcs)]:
+        if any(isinstance(inst, Label) for inst in insts):
+            raise ProgramError('link(...) left a label behind!')
+        for inst in insts:
+            if isinstance(inst, JUMPS) and not (0 <= inst.label <= len(insts)):
+                raise ProgramError(f'link(...) produced a bad jump {inst!r}!')
+    if link(bytecode) is not bytecode:
+        raise ProgramError('link(...) is not idempotent!')
+    evaluate(bytecode, mode='fast')
+    print('Link test passed.')
+
+def test_superinstructions():
+    code = r'''
+        (set count (lambda (n) (
+            (set i 0)
+            (set acc 0)
+            (while (< i n) (
+                (if (== (% i 3) 0) (set acc (+ acc i)))
+                (set i (+ i 1))
+            ))
+            (ret acc)
+        )))
+        (set rv (count 30))
+    '''
+    suite = optimize_ast(parse(code), (identify_tail_calls, resolve_scopes))
+    env = {}
+    stats = evaluate(list(suite), env)
+    fusions = choose_fusions(stats.pairs)
+    if not fusions:
+        raise ProgramError('choose_fusions(...) chose nothing for a hot loop!')
+    bytecode = fuse_superinstructions(list(suite), fusions)
+    body = next(inst for inst in bytecode if isinstance(inst, CreateFunc)).body
+    if not any(isinstance(inst, Superinst) and isinstance(inst.parts[-1], JumpIfFalse) for inst in body):
+        raise ProgramError('fuse_superinstructions(...) did not fuse the loop condition!')
+    for inst in body:
+        if isinstance(inst, JUMPS) and not (0 <= inst.label <= len(body)):
+            raise ProgramError(f'fuse_superinstructions(...) produced a bad jump {inst!r}!')
+    for mode in ENGINES:
+        fused_env = {}
+        fused_stats = evaluate(bytecode, fused_env, mode=mode)
+        if fused_env['rv'] != env['rv']:
+            raise ProgramError(f'fused {mode} evaluation failed: {fused_env["rv"]} != {env["rv"]}')
+        if not fused_stats.num_insts < stats.num_insts:
+            raise ProgramError('fuse_superinstructions(...) did not cut the dispatch count!')
+    print('Superinstructions test passed.')
+
+def test_numeric():
+    code = r'''
+        (set count (lambda (n) (
+            (set i 0)
+            (while (< i n) (set i (+ i 1)))
+            (ret i)
+        )))
+        (set rv (count 10))
+        (set third (/ 1 3))
+        (set half 0.5)
+    '''
+    types = {'decimal': (Decimal, Decimal), 'fast': (int, float), 'auto': (int, Decimal)}
+    for name, (int_type, frac_type) in types.items():
+        for mode in ENGINES:
+            env = {}
+            evaluate(list(optimize_ast(parse(code, numeric=name))), env, mode=mode)
+            if type(env['rv']) is not int_type or env['rv'] != 10:
+                raise ProgramError(f'{name} count failed: {env["rv"]!r}')
+            if type(env['half']) is not frac_type:
+                raise ProgramError(f'{name} literal failed: {env["half"]!r}')
+    # NOTE: constant folding must round like the evaluation does
+    numeric = get_numeric('decimal', prec=5)
+    for optimizations in (), (constant_folding,):
+        env = {}
+        suite = optimize_ast(parse(code, numeric=numeric), optimizations, numeric=numeric)
+        evaluate(list(suite), env, numeric=numeric)
+        if env['third'] != Decimal('0.33333'):
+            raise ProgramError(f'decimal context ignored: {env["third"]!r}')
+    print('Numeric modes test passed.')
+
+def test_codegen():
+    code = r'''
+        (set count (lambda (n) (
+            (set i 0)
+            (set acc 0)
+            (while (< i n) (
+                (if (== (% i 3) 0) (set acc (+ acc i)))
+                (set i (+ i 1))
+            ))
+            (ret acc)
+        )))
+        (set sum-to (lambda (n acc) (
+            (if (== n 0)
+                (ret acc)
+                (ret (sum-to (- n 1) (+ acc n))))
+        )))
+        (set sum-rec (lambda (n) (
+            (if (== n 0)
+                (ret 0)
+                (ret (+ n (sum-rec (- n 1)))))
+        )))
+        (set x 0)
+        (set total 0)
+        (while (< x 10) (
+            (set total (+ total x))
+            (set x (+ x 1))
+        ))
+        (assert (== (count 30) 135) "(count 30) failed!")
+        (assert (== (sum-to 5000 0) 12502500) "(sum-to 5000 0) failed!")
+        (assert (== (sum-rec 5000) 12502500) "(sum-rec 5000) failed!")
+        (assert (== total 45) "top-level loop failed!")
+    '''
+    suite = compile_native(optimize_ast(parse(code), (identify_tail_calls, resolve_scopes)))
+    funcs = {node.name.value: node.value for node in suite.children
+             if isinstance(node, Set) and isinstance(node.value, Lambda)}
+    if funcs['count'].native is None or funcs['sum-to'].native is None:
+        raise ProgramError('compile_native(...) did not compile a loop or a self tail call!')
+    if funcs['sum-rec'].native is not None:
+        raise ProgramError('compile_native(...) compiled non-tail recursion!')
+    if not any(isinstance(node, Native) for node in suite.children):
+        raise ProgramError('compile_native(...) did not compile the top-level loop!')
+    for mode in ENGINES:
+        evaluate(list(suite), mode=mode)
+    # NOTE: a function returns the value its last statement leaves on the
+    #       stack, which an if without else or a loop may not replace
+    leftovers = r'''
+        (set f (lambda (n) ((set a (* n 2)) (if (< n 0) (ret 5)))))
+        (set g (lambda (n) ((set a (+ n 1)) (while (< n 0) (set n (+ n 1))) ())))
+        (set h (lambda (n) ((set a (- n 1)) (if (> n 0) (set a n)) /* a */)))
+        (set rv (list (f 3) (f -1) (g 4) (g -2) (h 7) (h -7)))
+    '''
+    results = []
+    for native in False, True:
+        suite = optimize_ast(parse(leftovers), (identify_tail_calls, resolve_scopes))
+        if native:
+            suite = compile_native(suite)
+            if any(node.value.native is None for node in suite.children
+                   if isinstance(node, Set) and isinstance(node.value, Lambda)):
+                raise ProgramError('compile_native(...) did not compile the leftover values!')
+        env = {}
+        evaluate(list(suite), env)
+        results.append(env['rv'])
+    if results[0] != results[1]:
+        raise ProgramError(f'native functions return other values than the VM: {results!r}')
+    print('Code generation test passed.')
+
+def test_tiering():
+    code = r'''
+        (set square (lambda (x) (* x x)))
+        (set fib (lambda (n) (
+            (if (< n 2)
+                (ret n)
+                (ret (+ (fib (- n 1)) (fib (- n 2))))
+            )
+        )))
+        (set i 0)
+        (set acc 0)
+        (while (< i 50) (
+            (set acc (+ acc (square i)))
+            (set i (+ i 1))
+        ))
+        (assert (== acc 40425) "(square i) failed!")
+        (assert (== (fib 10) 55) "(fib 10) failed!")
+    '''
+    saved, tiering.THRESHOLD = tiering.THRESHOLD, 20
+    try:
+        for mode in ENGINES:
+            stats = evaluate(list(parse(code)), mode=mode)
+            tiers = {name: to for name, _, to, _ in stats.transitions}
+            if tiers != {'square': 'native', 'fib': 'optimized'}:
+                raise ProgramError(f'unexpected tier transitions: {stats.transitions!r}')
+            if not stats.num_frames < stats.func_calls:
+                raise ProgramError('native tier did not run without frames!')
+        # NOTE: the profiles of linked bytecode outlive an evaluate() call,
+        #       so a function promoted by one engine is called by the other
+        for modes in ('compact', 'fast'), ('fast', 'compact'):
+            bytecode = link(list(parse(code)))
+            for mode in modes:
+                evaluate(bytecode, mode=mode)
+            profiles = [inst.profile for inst in bytecode if isinstance(inst, CreateFunc)]
+            assembled = [x.assembled for x in profiles]
+            evaluate(bytecode, mode='compact')
+            if None in assembled or assembled != [x.assembled for x in profiles]:
+                raise ProgramError(f'{modes!r}: promoted bodies not assembled once: {profiles!r}')
+    finally:
+        tiering.THRESHOLD = saved
+    print('Tiering test passed.')
+
+def test_cache():
+    code = r'''
+        (set fact (lambda (n acc) (
+            (if (== n 0)
+                (ret acc)
+                (ret (fact (- n 1) (* acc n))))
+        )))
+        (set xs (list 1 2 3))
+        (set ys (cons 0 xs))
+        (set i 0)
+        (while (< i 3) (
+            (set ys (cdr ys))
+            (set i (+ i 1))
+        ))
+        (assert (== (car ys) 3) "(car ys) failed!")
+        (assert (== (fact 10 1) 3628800) "(fact 10 1) failed!")
+        (set s (format 1.5 ".2f"))
+    '''
+    with TemporaryDirectory() as cache_dir:
+        insts = cached_compile(code, cache_dir)
+        if len(listdir(cache_dir)) != 1:
+            raise ProgramError('cached_compile(...) did not write the cache!')
+        cached = cached_compile(code, cache_dir)
+        if cached is insts or repr(cached) != repr(insts):
+            raise ProgramError('cached_compile(...) did not load the same bytecode!')
+        cached_compile(code, cache_dir, numeric='fast')
+        if len(listdir(cache_dir)) != 2:
+            raise ProgramError('the cache key does not cover the numeric mode!')
+        for mode in ENGINES:
+            env = {}
+            evaluate(cached_compile(code, cache_dir), env, mode=mode)
+            if env['s'] != '1.50':
+                raise ProgramError(f'cached bytecode computed {env["s"]!r}!')
+    suite = compile_native(resolve_scopes(identify_tail_calls(parse(code))))
+    for mode in ENGINES:
+        evaluate(loads(dumps(list(suite))), mode=mode)
+    try:
+        loads(b'garbage')
+    except CacheError:
+        pass
+    else:
+        raise ProgramError('loads(...) accepted a bad header!')
+    print('Cache test passed.')
+
+def test_streaming():
+    code = r'''
+        /* a (block) comment "with a string" */
+        (set greeting "hello (world) \"quoted\"")
+        (set xs '(1 2 3))
+        (set total 0)
+        (while (< total 10) (set total (+ total 1.5)))
+        (assert (== total 10.5) "total failed!")
+    '''
+    for chunk_size in 1, 3, 7, len(code):
+        forms = list(parse_forms(StringIO(code), chunk_size=chunk_size))
+        if repr(Suite(*forms)) != repr(parse(code)):
+            raise ProgramError(f'parse_forms(..., chunk_size={chunk_size}) differs from parse(...)!')
+    if list(parse_forms(code, numeric='fast'))[3].children[1].children[1].right.value != 1.5:
+        raise ProgramError('parse_forms(..., numeric=...) ignored the numeric mode!')
+
+    stream, reads = StringIO(code), []
+    read = stream.read
+    stream.read = lambda size: reads.append(size) or read(size)
+    env, forms = Namespace(), parse_forms(stream, chunk_size=16)
+    evaluate(list(next(forms)), env, mode='fast')
+    if sum(reads) >= len(code):
+        raise ProgramError('parse_forms(...) read the whole stream before the first form!')
+    for form in forms:
+        evaluate(list(form), env, mode='fast')
+    if env['xs'] is None or env['greeting'] != 'hello (world) "quoted"':
+        raise ProgramError('streamed evaluation failed!')
+
+    # NOTE: a ' that starts no quoted list is a token, not the start of
+    #       text carried over to every later chunk
+    source = "/* don't */" + '(set x 1)' * 1000
+    _, rest = scan(source[:64], final=False)
+    if len(rest) >= len('(set x 1)'):
+        raise ProgramError(f"scan(...) carried over the text after a ': {rest!r}")
+    stream, reads = StringIO(source), []
+    read = stream.read
+    stream.read = lambda size: reads.append(size) or read(size)
+    forms = parse_forms(stream, chunk_size=64)
+    for _ in range(10):
+        next(forms)
+    if sum(reads) >= len(source) or len(list(forms)) != 990:
+        raise ProgramError("parse_forms(...) held back the forms after a ' !")
+    print('Streaming parser test passed.')
+
+def test_special_forms():
+    if SPECIAL_FORMS['set'] != Set.parse or SPECIAL_FORMS['while'] != While.parse:
+        raise ProgramError('SPECIAL_FORMS does not map heads to their node classes!')
+    suite = parse('(set a (- 1)) (set b (- 3 1)) (set c false) (set d "x y")')
+    if [type(node.value) for node in suite.children] != [Neg, Sub, type(False_), Atom]:
+        raise ProgramError(f'unexpected nodes: {suite!r}')
+
+    Square = special_form('square', create_pyfunc('Square', lambda x: x * x))
+    try:
+        code = '(set x (square (+ 1 2)))'
+        if not isinstance(parse(code).children[0].value, Square):
+            raise ProgramError('special_form(...) did not register (square ...)!')
+        for mode in ENGINES:
+            env = {}
+            evaluate(list(parse(code)), env, mode=mode)
+            if env['x'] != 9:
+                raise ProgramError(f'(square (+ 1 2)) returned {env["x"]!r}!')
+        if type(parse(code)(env={})) is not Atom:
+            raise ProgramError('(square ...) does not run on the tree-walker!')
+    finally:
+        del SPECIAL_FORMS['square']
+    if not isinstance(parse(code).children[0].value, Call):
+        raise ProgramError('(square ...) is still registered!')
+    print('Special forms test passed.')
+
+def test_memo():
+    code = r'''
+        (set rules (list "(+ x 2)" "(* x 1)" "(- x 1)"))
+        (set x 0)
+        (set i 0)
+        (while (< i 30) (
+            (set rs rules)
+            (while (<> rs nil) (
+                (set x (eval (parse (car rs))))
+                (set rs (cdr rs))
+            ))
+            (set i (+ i 1))
+        ))
+        (set y (eval (parse "(+ x 100)")))
+    '''
+    # NOTE: a constant string reads its literals in the numeric mode of
+    #       the run, like any other string
+    numbers = '(set s "(/ 7 2)") (set y (eval (parse "(/ 7 2)"))) (set z (eval (parse s)))'
+    for mode in ENGINES:
+        env = {}
+        evaluate(compile_source(numbers), env, mode=mode, numeric='fast')
+        if type(env['y']) is not float or env['y'] != env['z']:
+            raise ProgramError(f'(parse "...") ignored the numeric mode: {env["y"]!r}, {env["z"]!r}!')
+    run, env = compile_closure(parse(numbers)), {}
+    with use_numeric('fast'):
+        run(env)
+    if type(env['y']) is not float:
+        raise ProgramError(f'(parse "...") ignored the numeric mode of the closures: {env["y"]!r}!')
+    saved = PARSE_CACHE.maxsize, COMPILE_CACHE.maxsize
+    try:
+        for mode in ENGINES:
+            PARSE_CACHE.clear()
+            COMPILE_CACHE.clear()
+            env = {}
+            evaluate(list(parse(code)), env, mode=mode)
+            if env['x'] != 30 or env['y'] != 130:
+                raise ProgramError(f'(eval (parse ...)) computed {env["x"]!r}, {env["y"]!r}!')
+            # NOTE: 90 parses of 3 rules and the one of the constant string
+            if (PARSE_CACHE.hits, PARSE_CACHE.misses) != (87, 4):
+                raise ProgramError(f'unexpected parse cache counters: {PARSE_CACHE!r}')
+            if (COMPILE_CACHE.hits, COMPILE_CACHE.misses) != (87, 4):
+                raise ProgramError(f'unexpected compile cache counters: {COMPILE_CACHE!r}')
+        PARSE_CACHE.resize(2)
+        COMPILE_CACHE.resize(0)
+        if len(PARSE_CACHE) != 2 or len(COMPILE_CACHE) != 0:
+            raise ProgramError('resize(...) did not evict!')
+        evaluate(list(parse(code)), mode='fast')
+        if len(PARSE_CACHE) > 2 or len(COMPILE_CACHE):
+            raise ProgramError('the caches outgrew their maxsize!')
+    finally:
+        PARSE_CACHE.resize(saved[0])
+        COMPILE_CACHE.resize(saved[1])
+    print('Parse and compile cache test passed.')
+
+def test_folding():
+    code = r'''
+        (set f (lambda (n) (ret (+ n (* 2 3)))))
+        (set a (f (- 10 (+ 1 2))))
+        (set b (if (< 1 2) "yes" "no"))
+        (set c (and true (or false true)))
+        (set d (if (== 1 2) 1))
+        (set e '(+ 1 2))
+    '''
+    tree = parse(code)
+    folded = constant_folding(tree)
+    expected = parse(r'''
+        (set f (lambda (n) (ret (+ n 6))))
+        (set a (f 7))
+        (set b "yes")
+        (set c 1)
+        (set d ())
+        (set e '(+ 1 2))
+    ''')
+    expected.children[3].children = (Name('c'), Atom(True))
+    if repr(folded) != repr(expected):
+        raise ProgramError(f'constant_folding(...) failed: {folded!r}')
+    if repr(tree) != repr(parse(code)):
+        raise ProgramError('constant_folding(...) modified its input!')
+    if folded.children[5] is not tree.children[5]:
+        raise ProgramError('constant_folding(...) copied an unchanged subtree!')
+    if constant_folding(tree, inplace=True) is not tree or repr(tree) != repr(folded):
+        raise ProgramError('constant_folding(..., inplace=True) did not fold in place!')
+    for mode in ENGINES:
+        plain, optimized = {}, {}
+        evaluate(list(parse(code)), plain, mode=mode)
+        evaluate(list(optimize_ast(parse(code))), optimized, mode=mode)
+        if [plain[x] for x in 'abc'] != [optimized[x] for x in 'abc']:
+            raise ProgramError('folded and unfolded programs disagree!')
+
+    deep = '(set x ' + '(+ 1 ' * 200 + '0' + ')' * 200 + ')'
+    if constant_folding(parse(deep)).children[0].value.value != 200:
+        raise ProgramError('constant_folding(...) did not fold a deep expression!')
+    if not isinstance(constant_folding(parse('(set x (/ 1 0))')).children[0].value, Div):
+        raise ProgramError('constant_folding(...) folded a division by zero!')
+    if repr(constant_folding(parse('(set y (not true))')).children[0].value) != repr(Atom(False)):
+        raise ProgramError('constant_folding(...) did not fold (not true)!')
+    negated = {}
+    for mode in ENGINES:
+        env = {}
+        evaluate(list(parse('(set x 0) (set y (not x))')), env, mode=mode)
+        negated[mode] = env['y']
+    if set(negated.values()) != {True}:
+        raise ProgramError(f'(not x) disagrees between the engines: {negated!r}')
+    print('Constant folding test passed.')
+
+def test_peephole():
+    code = r'''
+        (set count (lambda (n) (
+            (set i 0)
+            (while true (
+                (if (< i n) () (ret i))
+                (set i (+ i 1))
+            ))
+        )))
+        (set x 1)
+        (set y (set y 1))
+        (while (< x 20) (
+            (if (== (% x 2) 0) (set y (+ y x)) (set y y))
+            (set x (+ x 1))
+            (if (> x 50) (set x 0))
+        ))
+        (assert (== y 91) "y failed!")
+        (assert (== (count 7) 7) "(count 7) failed!")
+    '''
+    suite = Suite(Comment('comments compile to Noop'), *resolve_scopes(parse(code)).children)
+    PEEPHOLE_HITS.clear()
+    optimized = peephole(list(suite))
+    # NOTE: the unused argument of the inlined call leaves a Pop after
+    #       remove_dead_stores, which the second peephole pass discards
+    inlined = optimize_bytecodes(list(optimize_ast(parse(r'''
+        (set k (lambda (a b) (ret a)))
+        (set f (lambda (x) (ret (k x 7))))
+    '''))))
+    bodies = [inst.body for inst in inlined if isinstance(inst, CreateFunc)]
+    if any(isinstance(inst, Pop) for body in bodies for inst in body):
+        raise ProgramError(f'optimize_bytecodes(...) left a Pop: {bodies!r}')
+    for rule in PEEPHOLE_RULES:
+        if not PEEPHOLE_HITS[rule.__name__]:
+            raise ProgramError(f'peephole rule {rule.__name__} never hit: {PEEPHOLE_HITS!r}')
+    if any(isinstance(inst, (Noop, Label)) for inst in optimized):
+        raise ProgramError('peephole(...) left a Noop or a Label!')
+    body = next(inst for inst in optimized if isinstance(inst, CreateFunc)).body
+    if any(isinstance(inst, PushImm) and inst.value is True for inst in body):
+        raise ProgramError('peephole(...) did not rewrite a function body!')
+    for mode in ENGINES:
+        plain, optimized_stats = evaluate(list(suite), mode=mode), evaluate(optimized, mode=mode)
+        if optimized_stats.num_insts >= plain.num_insts:
+            raise ProgramError('peephole(...) did not save any instruction!')
+
+    @peephole_rule(PushImm, PopVar)
+    def trace(window, targets):
+        return None
+    try:
+        if PEEPHOLE_RULES[-1] is not trace or trace.pattern != ((PushImm,), (PopVar,)):
+            raise ProgramError('peephole_rule(...) did not register a rule!')
+        if repr(peephole(list(suite), PEEPHOLE_RULES[:1])) != repr(remove_redundant_stack_ops(list(suite))):
+            raise ProgramError('peephole(..., rules) did not restrict the rules!')
+    finally:
+        PEEPHOLE_RULES.remove(trace)
+    print('Peephole test passed.')
+
+def test_dataflow():
+    insts = [
+        PushImm(1), PopLocalVar('a', 0),
+        Label('loop'), PushLocalVar('b', 1), JumpIfFalse('end'),
+        PushImm(2), StoreLocalVar('b', 1), JumpAlways('loop'),
+        PushImm('unreachable'), StoreLocalVar('a', 0),
+        Label('end'), PushLocalVar('b', 1), PopFunc(),
+    ]
+    cfg = CFG(insts)
+    if [(b.start, b.end, [s.start for s in b.succs]) for b in cfg] \
+        != [(0, 2, [2]), (2, 4, [9, 4]), (4, 7, [2]), (7, 9, [9]), (9, 11, [])]:
+        raise ProgramError(f'CFG(...) failed: {cfg!r}')
+    if {b.start for b in cfg.reachable()} != {0, 2, 4, 9}:
+        raise ProgramError('CFG.reachable() failed!')
+    live_in, live_out = liveness(cfg)
+    if [live_in[b] for b in cfg] != [{1}, {1}, set(), {1}, {1}]:
+        raise ProgramError(f'liveness(...) failed: {live_in!r}')
+    reach = reaching_definitions(cfg, entry={(1, None)})
+    if reach[cfg.blocks[4]] != {(0, 1), (0, 8), (1, None), (1, 5)}:
+        raise ProgramError(f'reaching_definitions(...) failed: {reach!r}')
+    optimized = remove_dead_stores(remove_unreachable(insts))
+    if repr(optimized) != repr([PushImm(1), Pop(), PushLocalVar('b', 1), JumpIfFalse(7),
+                                PushImm(2), StoreLocalVar('b', 1), JumpAlways(2),
+                                PushLocalVar('b', 1), PopFunc()]):
+        raise ProgramError(f'dead code elimination failed: {optimized!r}')
+
+    code = r"""
+        (set sum (lambda (n) (
+            (set unused (* n 2))
+            (set i 0)
+            (set acc 0)
+            (while (< i n) (
+                (set acc (+ acc i))
+                (set i (+ i 1))
+            ))
+            (ret acc)
+            (print "unreachable")
+        )))
+        (assert (== (sum 10) 45) "(sum 10) failed!")
+    """
+    suite = optimize_ast(parse(code), (identify_tail_calls, resolve_scopes))
+    bytecode = peephole(list(suite))
+    optimized = remove_dead_stores(remove_unreachable(bytecode))
+    body = next(inst for inst in optimized if isinstance(inst, CreateFunc)).body
+    if any(isinstance(inst, StoreLocalVar) and inst.name == 'unused' for inst in body) \
+        or any(isinstance(inst, CallPyFunc) and inst.args == 1 for inst in body):
+        raise ProgramError('dead code elimination did not rewrite the function body!')
+    if sum(isinstance(inst, StoreLocalVar) for inst in body) != 4:
+        raise ProgramError('remove_dead_stores(...) removed a live store!')
+    for mode in ENGINES:
+        before, after = evaluate(bytecode, mode=mode), evaluate(optimized, mode=mode)
+        if after.num_insts >= before.num_insts:
+            raise ProgramError('dead code elimination did not save any instruction!')
+    print('Dataflow analysis test passed.')
+
+def test_inlining():
+    code = r"""
+        (set k 10)
+        (set sq (lambda (x) (ret (* x x))))
+        (set abs (lambda (x) ((if (< x 0) (ret (- x)) (ret x)))))
+        (set hyp (lambda (a b) (ret (+ (sq a) (sq b)))))
+        (set scale (lambda (x) (ret (* x k))))
+        (set fact (lambda (n) ((if (< n 2) (ret 1) (ret (* n (fact (- n 1))))))))
+        (set twice (lambda (x) (ret (* 2 x))))
+        (set twice (lambda (x) (ret (+ x x))))
+        (set f (lambda (x) (
+            (set k 1)
+            (set acc 0)
+            (while (> x 0) (
+                (set acc (+ acc (hyp x (abs (- 3 x)))))
+                (set acc (+ acc (scale x)))
+                (set x (- x 1))
+            ))
+            (ret acc)
+        )))
+        (set g (lambda (x) (ret (scale x))))
+        (assert (== (sq (sq 3)) 81) "(sq (sq 3)) failed!")
+        (assert (== (f 4) 136) "(f 4) failed!")
+        (assert (== (fact 5) 120) "(fact 5) failed!")
+        (assert (== (twice 4) 8) "(twice 4) failed!")
+        (assert (== (scale 2) 20) "(scale 2) failed!")
+        (assert (== (g 3) 30) "(g 3) failed!")
+    """
+    def inlined(tree):
+        if isinstance(tree, Inline):
+            yield tree.name.value
+        for child in getattr(tree, 'children', ()):
+            yield from inlined(child)
+    tree = inline_functions(parse(code))
+    if set(inlined(tree)) != {'sq', 'abs', 'hyp', 'scale'}:
+        raise ProgramError(f'inline_functions(...) failed: {tree!r}')
+    f = next(x.value for x in tree.children if isinstance(x, Set) and x.name.value == 'f')
+    if 'scale' in inlined(f):
+        raise ProgramError('inline_functions(...) captured a local of the caller!')
+    if any(set(inlined(x)) for x in tree.children
+           if not (isinstance(x, Set) and isinstance(x.value, Lambda))):
+        raise ProgramError('inline_functions(...) inlined a call at top level!')
+    if set(inlined(inline_functions(parse(code), budget=4))) != {'sq', 'scale'}:
+        raise ProgramError('inline_functions(..., budget) did not restrict the size!')
+    for mode in ENGINES:
+        passes = identify_tail_calls, resolve_scopes
+        plain = evaluate(optimize_bytecodes(list(optimize_ast(parse(code), passes))), mode=mode)
+        stats = evaluate(optimize_bytecodes(list(optimize_ast(parse(code)))), mode=mode)
+        if stats.func_calls >= plain.func_calls:
+            raise ProgramError('inline_functions(...) did not save any call!')
+        for passes in (inline_functions,), (inline_functions, identify_tail_calls, resolve_scopes):
+            env = {}
+            evaluate(list(optimize_ast(parse(code), passes)), env, mode=mode)
+            if any('.' in name for name in env):
+                raise ProgramError(f'inlined bindings leaked into the env: {sorted(env)!r}')
+    print('Inlining test passed.')
+
+def test_tail_calls():
+    code = r"""
+        (set even (lambda (n) (if (== n 0) (ret true) (ret (odd (- n 1))))))
+        (set odd (lambda (n) (
+            (set m (- n 1))
+            (if (== n 0) false (even m))
+        )))
+        (set count (lambda (n acc) (
+            (if (== n 0) (ret acc))
+            (set acc (+ acc 1))
+            (count (- n 1) acc)
+        )))
+        (set sum (lambda (n) (if (== n 0) 0 (+ n (sum (- n 1))))))
+        (set apply (lambda (f x) (ret (f x))))
+        (assert (== (even {n}) true) "(even n) failed!")
+        (assert (== (odd {n}) false) "(odd n) failed!")
+        (assert (== (count {n} 0) {n}) "(count n 0) failed!")
+        (assert (== (sum 10) 55) "(sum 10) failed!")
+        (assert (== (apply even 7) false) "(apply even 7) failed!")
+    """
+    tree = identify_tail_calls(parse(code.format(n=5)))
+    def calls(tree, cls):
+        if type(tree) is cls:
+            yield tree.name.value
+        for child in getattr(tree, 'children', ()):
+            yield from calls(child, cls)
+    if sorted(calls(tree, TailCall)) != ['count', 'even', 'f', 'odd'] \
+        or sorted(calls(tree, Call)) != ['apply', 'count', 'even', 'odd', 'sum', 'sum']:
+        raise ProgramError(f'identify_tail_calls(...) failed: {tree!r}')
+
+    n = 2_000
+    for mode in ENGINES:
+        for passes in (identify_tail_calls, resolve_scopes), (identify_tail_calls,):
+            saved, tiering.THRESHOLD = tiering.THRESHOLD, None
+            try:
+                suite = optimize_ast(parse(code.format(n=n)), passes)
+                stats = evaluate(optimize_bytecodes(list(suite)), mode=mode)
+            finally:
+                tiering.THRESHOLD = saved
+            # NOTE: only (sum 10) nests frames
+            if stats.max_frame_depth > 12 or stats.frames_saved < 3 * n:
+                raise ProgramError(f'tail calls pushed frames: {stats!r}')
+    print('Tail calls test passed.')
+
+def test_lists():
+    code = r'''
+        (set xs (list 1 2 3))
+        (set ys (cons 0 xs))
+        (assert (== (length ys) 4) "(length ys) failed!")
+        (assert (== (length nil) 0) "(length nil) failed!")
+        (assert (== (nth ys 3) 3) "(nth ys 3) failed!")
+        (assert (== (reverse xs) (list 3 2 1)) "(reverse xs) failed!")
+        (assert (== (reverse nil) nil) "(reverse nil) failed!")
+        (assert (== (append xs ys) (list 1 2 3 0 1 2 3)) "(append xs ys) failed!")
+        (assert (== (append nil xs) xs) "(append nil xs) failed!")
+        (assert (nil? (cdr (cdr (cdr xs)))) "(nil? ...) failed!")
+        (assert (== (nil? xs) false) "(nil? xs) failed!")
+        (assert (== (car (nth (list xs ys) 1)) 0) "nested lists failed!")
+    '''
+    parse(code)(env={})
+    bytecode = list(parse(code))
+    if any(isinstance(inst, CallPyFunc) and inst.func in (car, cdr, cons, build) for inst in bytecode):
+        raise ProgramError('list operations still call Python functions!')
+    for mode in ENGINES:
+        evaluate(compile_source(code), mode=mode)
+        evaluate(bytecode, mode=mode)
+    suite = compile_native(optimize_ast(parse(r'''
+        (set f (lambda (xs) (
+            (set ys (append xs (reverse xs)))
+            (if (nil? (cdr ys)) (ret 0))
+            (ret (+ (length ys) (nth (cons (car ys) (cdr ys)) 1)))
+        )))
+        (assert (== (f (list 1 2)) 6) "(f (list 1 2)) failed!")
+    '''), (identify_tail_calls, resolve_scopes)))
+    if suite.children[0].value.native is None:
+        raise ProgramError('compile_native(...) did not compile the list operations!')
+    evaluate(list(suite))
+
+    xs = build(*range(10_000))
+    if length(xs) != 10_000 or nth(reverse(xs), 0) != 9_999 or list(xs) != list(range(10_000)) \
+        or repr(build(1, 2)) != '(1 2)' or repr(Pair(1, 2)) != '(1 . 2)':
+        raise ProgramError('native list functions failed!')
+    try:
+        nth(xs, 10_000)
+    except IndexError:
+        pass
+    else:
+        raise ProgramError('(nth xs n) past the end did not raise!')
+    print('Lists test passed.')
+
+def test_sequences():
+    code = r'''
+        (set double (lambda (x) (* x 2)))
+        (set add (lambda (acc x) (+ acc x)))
+        (set xs (range 10))
+        (assert (== (map double xs) (list 0 2 4 6 8 10 12 14 16 18)) "(map double xs) failed!")
+        (assert (== (filter (lambda (x) (== (% x 2) 0)) xs) (list 0 2 4 6 8)) "(filter ...) failed!")
+        (assert (== (fold add 0 xs) 45) "(fold add 0 xs) failed!")
+        (assert (== (reduce add 100 (range 1 4)) 106) "(reduce add 100 ...) failed!")
+        (assert (== (range 5 0 -2) (list 5 3 1)) "(range 5 0 -2) failed!")
+        (assert (== (map double nil) nil) "(map double nil) failed!")
+        (set k 3)
+        (assert (== (map (lambda (x) (+ x k)) (list 1 2)) (list 4 5)) "(map (lambda ...) ...) failed!")
+        (set sums (lambda (n) (fold add 0 (map double (range n)))))
+        (assert (== (map sums (range 4)) (list 0 0 2 6)) "nested (map ...) failed!")
+        (assert (== (length (map double (range {n}))) {n}) "(map double (range n)) failed!")
+    '''
+    parse(code.format(n=100))(env={})
+    n = 20_000
+    for mode in ENGINES:
+        for passes in (), (identify_tail_calls, resolve_scopes):
+            saved, tiering.THRESHOLD = tiering.THRESHOLD, None
+            try:
+                stats = evaluate(list(optimize_ast(parse(code.format(n=n)), passes)), mode=mode)
+            finally:
+                tiering.THRESHOLD = saved
+            logger.info('%s: %r', mode, stats)
+            # NOTE: every call of a map, filter or fold runs in its one frame
+            if stats.max_frame_depth > 3 or stats.num_frames > 20 or stats.func_calls < n:
+                raise ProgramError(f'(map ...) pushed frames: {stats!r}')
+    print('Sequences test passed.')
+
+def test_vectors():
+    code = r'''
+        (set v #(1 2 3))
+        (set w (vector 10 20 30))
+        (assert (== (+ v w) #(11 22 33)) "(+ v w) failed!")
+        (assert (== (* v 2) #(2 4 6)) "(* v 2) failed!")
+        (assert (== (- 10 v) #(9 8 7)) "(- 10 v) failed!")
+        (assert (== (/ w v) #(10 10 10)) "(/ w v) failed!")
+        (assert (== (- v) #(-1 -2 -3)) "(- v) failed!")
+        (assert (== (< v 2) #(1 0 0)) "(< v 2) failed!")
+        (assert (== (vector-ref v 1) 2) "(vector-ref v 1) failed!")
+        (assert (== (vector-slice v 1) #(2 3)) "(vector-slice v 1) failed!")
+        (assert (== (vector-slice w 0 2) #(10 20)) "(vector-slice w 0 2) failed!")
+        (assert (== (vector-length (make-vector 5 0)) 5) "(make-vector 5 0) failed!")
+        (assert (== (vector-sum (* w w)) 1400) "(vector-sum (* w w)) failed!")
+        (assert (== (vector->list v) (list 1 2 3)) "(vector->list v) failed!")
+        (assert (== (list->vector (range 3)) #(0 1 2)) "(list->vector (range 3)) failed!")
+    '''
+    if parse('#(1 2)').children[0].__class__ is not MakeVector:
+        raise ProgramError('#(...) is not a vector literal!')
+    parse(code)(env={})
+    for numeric in NUMERIC:
+        for mode in ENGINES:
+            evaluate(compile_source(code, numeric=numeric), mode=mode, numeric=numeric)
+    try:
+        Vector([1, 2]) + Vector([1, 2, 3])
+    except ValueError:
+        pass
+    else:
+        raise ProgramError('vectors of different lengths did not raise!')
+    if Vector([1, 2]) == None or repr(Vector([1, 2.5])) != '#(1.0 2.5)':
+        raise ProgramError('vector comparison or repr failed!')
+    print('Vectors test passed.')
+
+def test_hash_maps():
+    code = r'''
+        (set d (dict-new "a" 1 "b" 2))
+        (assert (== (dict-get d "a") 1) "(dict-get d a) failed!")
+        (assert (== (dict-get d "z") nil) "(dict-get d z) failed!")
+        (assert (== (dict-set d "c" 3) 3) "(dict-set d c 3) failed!")
+        (assert (dict-has d "c") "(dict-has d c) failed!")
+        (assert (== (dict-has d "z") false) "(dict-has d z) failed!")
+        (assert (== (dict-keys d) (list "a" "b" "c")) "(dict-keys d) failed!")
+        (set count (lambda (xs) (
+            (set seen (dict-new))
+            (while (== (nil? xs) false) (
+                (set x (car xs))
+                (dict-set seen x (+ 1 (if (dict-has seen x) (dict-get seen x) 0)))
+                (set xs (cdr xs))
+            ))
+            (ret seen)
+        )))
+        (set seen (count (list 1 2 1 1)))
+        (assert (== (dict-get seen 1) 3) "(count ...) failed!")
+        (assert (== (length (dict-keys seen)) 2) "(dict-keys (count ...)) failed!")
+    '''
+    parse(code)(env={})
+    bytecode = list(parse(code))
+    if any(isinstance(inst, CallPyFunc) and inst.func in (dict_new, dict_get, dict_set, dict_has, dict_keys)
+           for inst in bytecode):
+        raise ProgramError('dict forms still call Python functions!')
+    suite = compile_native(optimize_ast(parse(code), (identify_tail_calls, resolve_scopes)))
+    count = next(node.value for node in suite.children if isinstance(node, Set) and node.name.value == 'count')
+    if count.native is None:
+        raise ProgramError('compile_native(...) did not compile the dict forms!')
+    for mode in ENGINES:
+        evaluate(bytecode, mode=mode)
+        evaluate(compile_source(code), mode=mode)
+        evaluate(list(suite), mode=mode)
+    print('Hash maps test passed.')
+
+def test_closure_compiler():
+    code = r'''
+        (set fib (lambda (n) (
+            (if (< n 2)
+                (ret n)
+                (ret (+ (fib (- n 1)) (fib (- n 2))))
+            )
+        )))
+        (set adder (lambda (k) (lambda (x) (+ x k))))
+        (set add2 (adder 2))
+        (set count 0)
+        (set bump (lambda () (setg count (+ count 1))))
+        (set x 0)
+        (while (< x 5) (
+            (printf "(fib {}) = {} {}\n" x (fib x) (add2 x))
+            (bump)
+            (set x (+ x 1))
+        ))
+        (set xs (map (lambda (x) (* x x)) (range 5)))
+        (set d (dict-new "a" 1))
+        (dict-set d "b" (fold (lambda (acc x) (+ acc x)) 0 xs))
+        (printf "{} {} {} {}\n" (length xs) (dict-get d "b") (nth (reverse xs) 0) count)
+        (printf "{} => {}\n" "(+ 1 1)" (eval (parse "(+ 1 1)")))
+        (assert (== (vector-sum (* #(1 2) 2)) 6) "(vector-sum ...) failed!")
+    '''
+    def output(run):
+        buf = StringIO()
+        with redirect_stdout(buf):
+            run()
+        return buf.getvalue()
+    outputs = {'tree-walker': output(lambda: parse(code)(env={}))}
+    before = repr(nodes.stats)
+    for passes in (), (identify_tail_calls, resolve_scopes), (inline_functions, constant_folding):
+        run = compile_closure(optimize_ast(parse(code), passes))
+        outputs[passes] = output(lambda: run({}))
+    outputs['bytecode'] = output(lambda: evaluate(compile_source(code)))
+    if len(set(outputs.values())) != 1:
+        raise ProgramError(f'closure compiler disagrees: {outputs!r}')
+    if repr(nodes.stats) != before:
+        raise ProgramError('closure compiler counted stats!')
+    counts = {'func-calls': defaultdict(int), 'ufunc-calls': defaultdict(int)}
+    output(lambda: compile_closure(parse(code), counts)({}))
+    # NOTE: (fib n) calls fib 2 * (fib (+ n 1)) - 1 times
+    if counts['ufunc-calls']['fib'] != sum(2 * fib - 1 for fib in (1, 1, 2, 3, 5)) \
+        or counts['func-calls']['Lambda'] != 6 or counts['ufunc-calls']['bump'] != 5:
+        raise ProgramError(f'closure compiler stats failed: {counts!r}')
+    try:
+        compile_closure(NotImplemented([]))
+    except Uncompilable:
+        pass
+    else:
+        raise ProgramError('compile_closure(NotImplemented(...)) did not raise!')
+    print('Closure compiler test passed.')
+
+def test_engines():
+    code = r'''
+        (set fib (lambda (n) (
+            (if (< n 2)
+                (ret n)
+                (ret (+ (fib (- n 1)) (fib (- n 2))))
+            )
+        )))
+        (set x 0)
+        (while (< x 5) (
+            (printf "(fib {}) = {}\n" x (fib x))
+            (set x (+ x 1))
+        ))
+        (printf "{} => {}\n" "(+ 1 1)" (eval (parse "(+ 1 1)")))
+    '''
+    outputs, all_stats = {}, {}
+    for mode in ENGINES:
+        suite = optimize_ast(parse(code), (identify_tail_calls, resolve_scopes))
+        bytecode = optimize_bytecodes(list(suite))
+        buf = StringIO()
+        with redirect_stdout(buf):
+            all_stats[mode] = evaluate(bytecode, mode=mode)
+        outputs[mode] = buf.getvalue()
+        logger.info('%s: %r', mode, all_stats[mode])
+    if len(set(outputs.values())) != 1:
+        raise ProgramError(f'engines disagree: {outputs!r}')
+    if len({repr(x) for x in all_stats.values()}) != 1:
+        raise ProgramError(f'engines disagree: {all_stats!r}')
+    print('Evaluation engines test passed.')
+
 parser = ArgumentParser()
 parser.add_argument('-v', '--verbose', action='count')
 parser.add_argument('-s', '--stats', action='store_true', default=False)
@@ -809,6 +1808,78 @@ if __name__ == '__main__':
     if 'functionality' in args.tests or not args.tests:
         test_functionality()
 
+    if 'locals' in args.tests or not args.tests:
+        test_locals()
+
+    if 'closures' in args.tests or not args.tests:
+        test_closures()
+
+    if 'globals' in args.tests or not args.tests:
+        test_globals()
+
+    if 'quickening' in args.tests or not args.tests:
+        test_quickening()
+
+    if 'link' in args.tests or not args.tests:
+        test_link()
+
+    if 'superinstructions' in args.tests or not args.tests:
+        test_superinstructions()
+
+    if 'numeric' in args.tests or not args.tests:
+        test_numeric()
+
+    if 'codegen' in args.tests or not args.tests:
+        test_codegen()
+
+    if 'tiering' in args.tests or not args.tests:
+        test_tiering()
+
+    if 'cache' in args.tests or not args.tests:
+        test_cache()
+
+    if 'streaming' in args.tests or not args.tests:
+        test_streaming()
+
+    if 'special_forms' in args.tests or not args.tests:
+        test_special_forms()
+
+    if 'memo' in args.tests or not args.tests:
+        test_memo()
+
+    if 'folding' in args.tests or not args.tests:
+        test_folding()
+
+    if 'peephole' in args.tests or not args.tests:
+        test_peephole()
+
+    if 'dataflow' in args.tests or not args.tests:
+        test_dataflow()
+
+    if 'inlining' in args.tests or not args.tests:
+        test_inlining()
+
+    if 'tail_calls' in args.tests or not args.tests:
+        test_tail_calls()
+
+    if 'lists' in args.tests or not args.tests:
+        test_lists()
+
+    if 'sequences' in args.tests or not args.tests:
+        test_sequences()
+
+    if 'vectors' in args.tests or not args.tests:
+        test_vectors()
+
+    if 'hash_maps' in args.tests or not args.tests:
+        test_hash_maps()
+
+    if 'closure_compiler' in args.tests or not args.tests:
+        test_closure_compiler()
+
+    if 'engines' in args.tests or not args.tests:
+        test_engines()
+
     print('All tests passed!')
 
     if args.stats: